@@ -0,0 +1,321 @@
+#!/usr/bin/env -S uv run --script --quiet
+# -*- coding: utf-8 -*-
+# vim: set autoindent smartindent softtabstop=4 tabstop=4 shiftwidth=4 expandtab:
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "isbnlib>=3.10",
+#     "RapidFuzz>=3.14",
+#     "numpy>=2.0",
+#     "scipy>=1.13",
+# ]
+# ///
+from __future__ import (
+    print_function,
+    with_statement,
+    unicode_literals,
+    division,
+    absolute_import,
+)
+
+__author__ = "Oliver Schneider"
+__copyright__ = "2024, 2025 Oliver Schneider (assarbad.net), under the terms of the UNLICENSE"
+__version__ = "0.1.0"
+__compatible__ = (
+    (3, 12),
+    (3, 13),
+    (3, 14),
+)
+__doc__ = """
+========================
+ Abgleich-Benchmark
+========================
+
+Läßt den Abgleich (bestandslistenabgleich.abgleich()) mit jedem angegebenen Verfahren über dieselben Listen laufen, mißt die
+Laufzeiten je Abschnitt und prüft, ob alle Verfahren dieselben Zuordnungen liefern wie das erste.
+
+Mit --tippfehler wird ein Teil der Titel in der eigenen Liste verfälscht, so daß diese nicht mehr exakt, sondern nur noch
+unscharf zugeordnet werden können; das ist der teure Fall.
+
+Mit --kandidaten wird zusätzlich die Vorauswahl per Trigramm-Index (bestandslistenabgleich.py --kandidaten) für jedes
+angegebene K geprüft: neben den Abweichungen von der Referenz (K=0, also Vergleich mit allen Karteikarten) wird die
+Trefferquote ausgegeben, d.h. welcher Anteil der Zuordnungen der Referenz auch mit K gefunden wird ("Zuordnungen") und
+welcher Anteil aller Paare aus Buch und Karteikarte mit einem Wert ab dem Schwellwert unter den Kandidaten ist ("Paare").
+
+Mit --zuordnung gierig,optimal werden zudem beide Arten der Zuordnung (bestandslistenabgleich.py --zuordnung) verglichen.
+Da sie absichtlich verschieden zuordnen, ist für jede Zuordnung ihr erster Lauf die Referenz; ausgegeben wird auch die
+Summe der Werte aller unscharfen Zuordnungen ("Gesamtwert").
+"""
+import argparse  # noqa: F401
+import csv
+import json
+import logging
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import bestandslistenabgleich
+
+# Checking for compatibility with Python version
+if sys.version_info[:2] not in __compatible__:
+    sys.exit(
+        "Dieses Skript ist nur mit folgenden Pythonversionen kompatibel: %s" % (", ".join(["%d.%d" % (z[0], z[1]) for z in __compatible__]))
+    )  # pragma: no cover
+
+
+def kandidatenliste(wert: str) -> str:
+    """\
+    Prüft die kommagetrennten Anzahlen für --kandidaten.
+    """
+    for anzahl in wert.split(","):
+        bestandslistenabgleich.anzahl_kandidaten(anzahl)
+    return wert
+
+
+def parse_args(args=None):
+    """\
+    Argumente parsen
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=Path(__file__).name)
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="outfile",
+        metavar="JSONFILE",
+        type=Path,
+        default=None,
+        help="Schreibe die Ergebnisse zusätzlich als JSON in diese Datei.",
+    )
+    parser.add_argument(
+        "-s",
+        "--sba",
+        dest="sbalist",
+        metavar="SBALISTE",
+        type=Path,
+        default=Path(__file__).parent.parent / "sbasuche/output.json",
+        help="Pfad zur SBA-Liste (siehe bestandslistenabgleich.py -s).",
+    )
+    parser.add_argument(
+        "-c",
+        "--cutoff-score",
+        dest="cutoff",
+        metavar="PROZENTWERT",
+        type=int,
+        default=95,
+        help="Schwellwert des unscharfen Abgleichs (Vorgabe: %(default)s).",
+    )
+    parser.add_argument(
+        "--unscharf",
+        dest="unscharf",
+        metavar="VERFAHREN[,VERFAHREN...]",
+        default="matrix,klassisch",
+        help="Zu vergleichende Verfahren des unscharfen Abgleichs (Vorgabe: %(default)s); das erste ist die Referenz.",
+    )
+    parser.add_argument(
+        "-k",
+        "--kandidaten",
+        dest="kandidaten",
+        metavar="K[,K...]",
+        type=kandidatenliste,
+        default="0",
+        help="Zu prüfende Anzahlen von Kandidaten je Buch für das Verfahren matrix (Vorgabe: %(default)s, also alle Karteikarten).",
+    )
+    parser.add_argument(
+        "--zuordnung",
+        dest="zuordnung",
+        metavar="ZUORDNUNG[,ZUORDNUNG...]",
+        default="gierig",
+        help="Zu vergleichende Arten der Zuordnung (Vorgabe: %(default)s).",
+    )
+    parser.add_argument(
+        "--tippfehler",
+        dest="tippfehler",
+        metavar="ANTEIL",
+        type=float,
+        default=0.0,
+        help="Anteil (0..1) der Titel der eigenen Liste, in die ein Tippfehler eingebaut wird (Vorgabe: 0).",
+    )
+    parser.add_argument(
+        "--seed",
+        dest="seed",
+        metavar="N",
+        type=int,
+        default=1,
+        help="Startwert des Zufallsgenerators für --tippfehler (Vorgabe: %(default)s).",
+    )
+    parser.add_argument(
+        "-n",
+        "--runs",
+        dest="runs",
+        metavar="N",
+        type=int,
+        default=3,
+        help="Anzahl der Läufe je Verfahren; ausgegeben wird jeweils der Median (Vorgabe: %(default)s).",
+    )
+    parser.add_argument(
+        action="store",
+        dest="ownlist",
+        metavar="EIGENELISTE",
+        type=Path,
+        help="Pfad zur CSV-Liste die aus unserem Excel-Sheet erstellt wurde.",
+    )
+    return parser.parse_args(args)
+
+
+def reset_logging():
+    """\
+    Entfernt die von bestandslistenabgleich.setup_logging() eingerichteten Log-Handler, damit sich diese bei mehreren Läufen nicht stapeln.
+    """
+    logger = logging.getLogger(str(Path(bestandslistenabgleich.__file__).resolve()))
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def tippfehler_einbauen(quelle: Path, ziel: Path, anteil: float, seed: int) -> int:
+    """\
+    Kopiert die eigene Liste und vertauscht dabei in einem Anteil der Buchtitel zwei benachbarte Buchstaben.
+    """
+    zufall = random.Random(seed)
+    geändert = 0
+    with open(quelle, "r", newline="") as eingabe, open(ziel, "w", newline="") as ausgabe:
+        writer = csv.writer(ausgabe, dialect="excel")
+        for nummer, row in enumerate(csv.reader(eingabe, dialect="excel")):
+            titel = row[2] if len(row) > 2 else ""
+            if nummer > 0 and len(titel) > 3 and zufall.random() < anteil:
+                stelle = zufall.randrange(len(titel) - 1)
+                row[2] = titel[:stelle] + titel[stelle + 1] + titel[stelle] + titel[stelle + 2 :]
+                geändert += row[2] != titel
+            writer.writerow(row)
+    return geändert
+
+
+def median(werte: list) -> float:
+    return bestandslistenabgleich.perzentil(werte, 50)
+
+
+def paare_ab_schwellwert(matrix, bücher, cutoff: int) -> set:
+    """\
+    Alle Paare (Buch-Nr., Karteinummer) der Bewertungsmatrix mit einem Wert von mindestens cutoff.
+    """
+    return {(nummer, karteinummer) for nummer, buch in enumerate(bücher) for karteinummer, _ in matrix.kandidaten_ab(buch, cutoff)}
+
+
+def paar_trefferquoten(sbalist: Path, ownlist: Path, cutoff: int, anzahlen: list) -> dict:
+    """\
+    Anteil der Paare mit einem Wert ab cutoff (aller Bücher mit einem Exemplar gegen die ganze Kartei), die sich auch unter
+    den per Trigramm-Index vorausgewählten Kandidaten finden, je Anzahl K. Ohne solche Paare ist die Quote 1.
+    """
+    bücher = [buch for buch in bestandslistenabgleich.lies_katalog(sbalist) if len(buch["copies"]) == 1]
+    with open(ownlist, "r") as owncsv:
+        kartei, _, _ = bestandslistenabgleich.read_own_format(owncsv)
+    alle = paare_ab_schwellwert(bestandslistenabgleich.Bewertungsmatrix(bücher, kartei, cutoff), bücher, cutoff)
+    quoten = {}
+    for k in anzahlen:
+        gefunden = paare_ab_schwellwert(bestandslistenabgleich.Bewertungsmatrix(bücher, kartei, cutoff, k), bücher, cutoff)
+        quoten[k] = len(alle & gefunden) / len(alle) if alle else 1.0
+    return quoten
+
+
+def abgleich_messen(sbalist: Path, ownlist: Path, cutoff: int, runs: int, **optionen) -> dict:
+    """\
+    Läßt den Abgleich runs-mal laufen und liefert Median der Laufzeiten, Zähler und Zuordnungen des letzten Laufs.
+    """
+    sekunden, abschnitte = [], {}
+    for _ in range(max(1, runs)):
+        metriken = bestandslistenabgleich.Metriken()
+        bestandslistenabgleich.metriken = metriken
+        start = time.perf_counter()
+        try:
+            bestandslistenabgleich.abgleich(sbalist=sbalist, ownlist=ownlist, cutoff=cutoff, **optionen)
+        finally:
+            sekunden.append(time.perf_counter() - start)
+            bestandslistenabgleich.metriken = None
+        for abschnitt, dauern in metriken.zeiten.items():
+            abschnitte.setdefault(abschnitt, []).append(sum(dauern))
+    zuordnungen = {karteinummer: buch["title"] for karteinummer, buch in bestandslistenabgleich.zugeordnete_karteinummern.items()}
+    gesamtwert = sum(buch.get("treffer_wahrscheinlichkeit", 0) for buch in bestandslistenabgleich.zugeordnete_karteinummern.values())
+    return {
+        "total_score": gesamtwert,
+        "seconds": median(sekunden),
+        "phases": {abschnitt: median(werte) for abschnitt, werte in abschnitte.items()},
+        "counters": dict(metriken.zähler),
+        "assignments": zuordnungen,
+    }
+
+
+def main(**kwargs):
+    """\
+    Die Hauptfunktion
+    """
+    bestandslistenabgleich.log = bestandslistenabgleich.setup_logging(0)
+    sbalist, ownlist, cutoff = kwargs.get("sbalist"), kwargs.get("ownlist"), kwargs.get("cutoff", 95)
+    results = []
+    try:
+        with tempfile.TemporaryDirectory(prefix="abgleichbench.") as tmpdir:
+            if kwargs.get("tippfehler", 0.0):
+                verfälscht = Path(tmpdir) / ownlist.name
+                geändert = tippfehler_einbauen(ownlist, verfälscht, kwargs.get("tippfehler"), kwargs.get("seed", 1))
+                print(f"{geändert} Titel in {ownlist} mit Tippfehler versehen", file=sys.stderr)
+                ownlist = verfälscht
+            anzahlen = [int(k) for k in kwargs.get("kandidaten", "0").split(",")]
+            # Die Vorauswahl gibt es nur für die Matrix, die übrigen Verfahren vergleichen immer mit allen Karteikarten
+            läufe = [(verfahren, k) for verfahren in kwargs.get("unscharf", "matrix").split(",") for k in (anzahlen if verfahren == "matrix" else [0])]
+            # Die optimale Zuordnung gibt es ebenfalls nur mit der Matrix
+            läufe = [
+                (zuordnung, verfahren, k)
+                for zuordnung in kwargs.get("zuordnung", "gierig").split(",")
+                for verfahren, k in läufe
+                if zuordnung == "gierig" or verfahren == "matrix"
+            ]
+            paarquoten = paar_trefferquoten(sbalist, ownlist, cutoff, [k for k in anzahlen if k]) if any(anzahlen) else {}
+            referenzen = {}
+            for zuordnung, verfahren, k in läufe:
+                ergebnis = abgleich_messen(sbalist, ownlist, cutoff, kwargs.get("runs", 3), unscharf=verfahren, kandidaten=k, zuordnung=zuordnung)
+                zuordnungen = ergebnis.pop("assignments")
+                referenz = referenzen.setdefault(zuordnung, zuordnungen)
+                abweichungen = sorted(set(referenz.items()) ^ set(zuordnungen.items()))
+                results.append(
+                    {
+                        "assignment": zuordnung,
+                        "unscharf": verfahren,
+                        "candidates": k,
+                        **ergebnis,
+                        "assigned": len(zuordnungen),
+                        "differences": len(abweichungen),
+                        "assignment_recall": len(set(referenz.items()) & set(zuordnungen.items())) / len(referenz) if referenz else 1.0,
+                        "pair_recall": paarquoten.get(k, 1.0),
+                        "ok": not abweichungen,
+                    }
+                )
+                if abweichungen:
+                    print(f"{zuordnung}/{verfahren} (K={k}): {len(abweichungen)} abweichende Zuordnung(en), bspw. {abweichungen[:5]!r}", file=sys.stderr)
+    finally:
+        reset_logging()
+    print(
+        f"{'Zuordnung':<10} {'Verfahren':<10} {'K':>5} {'Dauer/s':>9} {'Kandidaten/s':>13} {'Unscharf/s':>11} {'Vergleiche':>12} {'Zugeordnet':>11}"
+        f" {'Gesamtwert':>11} {'Abweichungen':>13} {'Zuordnungen':>12} {'Paare':>7}"
+    )
+    for result in results:
+        print(
+            f"{result['assignment']:<10} {result['unscharf']:<10} {result['candidates']:>5} {result['seconds']:>9.3f} {result['phases'].get('kandidaten', 0.0):>13.3f}"
+            f" {result['phases'].get('unscharf', 0.0):>11.3f} {result['counters'].get('unscharfe_vergleiche', 0):>12} {result['assigned']:>11}"
+            f" {result['total_score']:>11} {result['differences']:>13} {result['assignment_recall']:>12.2%} {result['pair_recall']:>7.2%}"
+        )
+    outfile = kwargs.get("outfile", None)
+    if outfile is not None:
+        with open(outfile, "w") as json_file:
+            json.dump({"version": bestandslistenabgleich.__version__, "cutoff": cutoff, "results": results}, json_file, indent=4)
+    return 0 if all(result["ok"] for result in results) else 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        sys.exit(main(**vars(args)))
+    except KeyboardInterrupt:
+        print("\nSIGINT", file=sys.stderr)
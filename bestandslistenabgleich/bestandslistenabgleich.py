@@ -6,6 +6,8 @@
 # dependencies = [
 #     "isbnlib>=3.10",
 #     "RapidFuzz>=3.14",
+#     "numpy>=2.0",
+#     "scipy>=1.13",
 # ]
 # ///
 from __future__ import (
@@ -33,13 +35,15 @@ import argparse  # noqa: F401
 import csv
 import json
 import logging
-import os  # noqa: F401
+import os
 import re
 import sys
+import time
+from bisect import bisect_right
 from collections.abc import Iterable
+from contextlib import contextmanager, nullcontext
 from functools import cache
 from pathlib import Path
-from rapidfuzz import fuzz, process, utils
 
 # Checking for compatibility with Python version
 if sys.version_info[:2] not in __compatible__:
@@ -51,6 +55,153 @@ if sys.version_info[:2] not in __compatible__:
 class ValidationError(ValueError): ...
 
 
+# Zähler und Laufzeiten des Abgleichs (Metriken), gesetzt per --metrics-json/--metrics-prom (siehe gemessen(), gezählt())
+metriken = None
+
+
+def perzentil(werte: list, prozent: float) -> float:
+    """\
+    Perzentil (0..100) per linearer Interpolation; 0.0 für eine leere Liste.
+    """
+    if not werte:
+        return 0.0
+    werte = sorted(werte)
+    pos = (len(werte) - 1) * prozent / 100
+    unten = int(pos)
+    oben = min(unten + 1, len(werte) - 1)
+    return werte[unten] + (werte[oben] - werte[unten]) * (pos - unten)
+
+
+class Metriken(object):
+    """\
+    Sammelt Zähler, einzelne Meßwerte und die Laufzeiten benannter Abschnitte (Sekunden je Aufruf) eines Abgleichs.
+
+    Am Ende lassen sich beide als JSON-Zusammenfassung oder im Textformat für den textfile collector des Prometheus
+    node_exporter ablegen (siehe schreibe()), genau wie bei sbasuche.py.
+    """
+
+    grenzen = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self):
+        self.zeiten = {}
+        self.zähler = {}
+        self.messwerte = {}
+        self.beginn = time.time()
+
+    def erfasse(self, abschnitt: str, dauer: float):
+        self.zeiten.setdefault(abschnitt, []).append(dauer)
+
+    def zähle(self, name: str, n: int = 1):
+        self.zähler[name] = self.zähler.get(name, 0) + n
+
+    def setze(self, name: str, wert: float):
+        self.messwerte[name] = wert
+
+    @contextmanager
+    def miss(self, abschnitt: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.erfasse(abschnitt, time.perf_counter() - start)
+
+    def zusammenfassung(self, erfolgreich: bool) -> dict:
+        return {
+            "version": __version__,
+            "started": self.beginn,
+            "seconds": time.time() - self.beginn,
+            "success": erfolgreich,
+            "counters": dict(sorted(self.zähler.items())),
+            "gauges": dict(sorted(self.messwerte.items())),
+            "phases": {
+                abschnitt: {
+                    "count": len(werte),
+                    "total_s": sum(werte),
+                    "p50_ms": perzentil(werte, 50) * 1000,
+                    "p95_ms": perzentil(werte, 95) * 1000,
+                    "max_ms": max(werte) * 1000,
+                }
+                for abschnitt, werte in sorted(self.zeiten.items())
+            },
+        }
+
+    def als_prometheus(self, präfix: str, erfolgreich: bool) -> str:
+        zusammenfassung = self.zusammenfassung(erfolgreich)
+        zeilen = []
+        for name, wert in zusammenfassung["counters"].items():
+            zeilen += [f"# TYPE {präfix}_{name}_total counter", f"{präfix}_{name}_total {wert}"]
+        for name, wert in zusammenfassung["gauges"].items():
+            zeilen += [f"# TYPE {präfix}_{name} gauge", f"{präfix}_{name} {wert}"]
+        zeilen.append(f"# TYPE {präfix}_abschnitt_dauer_seconds histogram")
+        for abschnitt, werte in sorted(self.zeiten.items()):
+            werte = sorted(werte)
+            for grenze in self.grenzen:
+                zeilen.append(f'{präfix}_abschnitt_dauer_seconds_bucket{{abschnitt="{abschnitt}",le="{grenze:g}"}} {bisect_right(werte, grenze)}')
+            zeilen.append(f'{präfix}_abschnitt_dauer_seconds_bucket{{abschnitt="{abschnitt}",le="+Inf"}} {len(werte)}')
+            zeilen.append(f'{präfix}_abschnitt_dauer_seconds_sum{{abschnitt="{abschnitt}"}} {sum(werte):.6f}')
+            zeilen.append(f'{präfix}_abschnitt_dauer_seconds_count{{abschnitt="{abschnitt}"}} {len(werte)}')
+        zeilen += [
+            f"# TYPE {präfix}_lauf_dauer_seconds gauge",
+            f"{präfix}_lauf_dauer_seconds {zusammenfassung['seconds']:.3f}",
+            f"# TYPE {präfix}_lauf_erfolgreich gauge",
+            f"{präfix}_lauf_erfolgreich {int(erfolgreich)}",
+            f"# TYPE {präfix}_lauf_ende_timestamp_seconds gauge",
+            f"{präfix}_lauf_ende_timestamp_seconds {time.time():.0f}",
+        ]
+        return "\n".join(zeilen) + "\n"
+
+    def schreibe(self, json_pfad: Path | None, prom_pfad: Path | None, präfix: str, erfolgreich: bool):
+        """\
+        Schreibt die JSON-Zusammenfassung und/oder die Datei für Prometheus (letztere per Umbenennung einer temporären Datei).
+        """
+        if json_pfad is not None:
+            with open(json_pfad, "w") as json_file:
+                json.dump(self.zusammenfassung(erfolgreich), json_file, ensure_ascii=False, indent=4)
+        if prom_pfad is not None:
+            tmp_pfad = prom_pfad.with_name(f".{prom_pfad.name}.{os.getpid()}.tmp")
+            with open(tmp_pfad, "w") as prom_file:
+                prom_file.write(self.als_prometheus(präfix, erfolgreich))
+            os.replace(tmp_pfad, prom_pfad)
+
+
+def gemessen(abschnitt: str):
+    """\
+    Kontextmanager, der die Laufzeit des Abschnitts erfaßt, sofern metriken gesetzt ist.
+    """
+    return nullcontext() if metriken is None else metriken.miss(abschnitt)
+
+
+def gezählt(name: str, n: int = 1):
+    """\
+    Erhöht den Zähler name um n, sofern metriken gesetzt ist.
+    """
+    if metriken is not None:
+        metriken.zähle(name, n)
+
+
+def gesetzt(name: str, wert: float):
+    """\
+    Setzt den Meßwert name auf wert, sofern metriken gesetzt ist.
+    """
+    if metriken is not None:
+        metriken.setze(name, wert)
+
+
+def anzahl_kandidaten(wert: str) -> int:
+    """\
+    Liest die Anzahl der Kandidaten je Buch für --kandidaten; 0 steht für alle Karteikarten.
+    """
+    from argparse import ArgumentTypeError
+
+    try:
+        anzahl = int(wert)
+    except ValueError:
+        raise ArgumentTypeError(f"keine ganze Zahl: {wert!r}")
+    if anzahl < 0:
+        raise ArgumentTypeError(f"muss mindestens 0 sein: {anzahl}")
+    return anzahl
+
+
 def parse_args():
     """ """
     from argparse import ArgumentParser
@@ -78,7 +229,7 @@ def parse_args():
         dest="sbalist",
         metavar="SBALISTE",
         type=Path,
-        help="Pfad zur SBA-Liste im JSON-Format, welche mit der 'sbasuche.py' erstellt wurde.",
+        help="Pfad zur SBA-Liste im JSON- oder JSON-Lines-Format bzw. als SQLite-Export (--export-sqlite), welche mit der 'sbasuche.py' erstellt wurde.",
         default=Path(__file__).parent.parent / "sbasuche/output.json",
     )
     parser.add_argument(
@@ -91,6 +242,29 @@ def parse_args():
         help="Der Schwellwert ab bis zu dem gewichtet ähnliche Treffer als identisch angenommen werden.",
         default=95,
     )
+    parser.add_argument(
+        "--unscharf",
+        dest="unscharf",
+        choices=["matrix", "klassisch"],
+        help="Verfahren des unscharfen Abgleichs: 'matrix' berechnet alle Ähnlichkeiten einmalig per rapidfuzz.process.cdist, 'klassisch' ist das ursprüngliche (langsamere) Verfahren mit process.extract je Buch und Schwellwert (Vorgabe: %(default)s)",
+        default="matrix",
+    )
+    parser.add_argument(
+        "--zuordnung",
+        dest="zuordnung",
+        choices=["gierig", "optimal"],
+        help="Zuordnung im unscharfen Abgleich: 'gierig' gibt jedem Buch in bis zu fünf Durchläufen eine Karteikarte, sofern sie bei ihrem höchsten Wert die einzige ist, 'optimal' ordnet alle Paare ab dem Schwellwert in einem Durchgang so zu, daß die Summe der Werte am größten ist (benötigt scipy; Vorgabe: %(default)s)",
+        default="gierig",
+    )
+    parser.add_argument(
+        "-k",
+        "--kandidaten",
+        dest="kandidaten",
+        metavar="K",
+        type=anzahl_kandidaten,
+        help="Vergleiche im unscharfen Abgleich jedes Buch nur mit den K Karteikarten, mit denen es die meisten (seltenen) Trigramme teilt, statt mit allen; für große Listen (Vorgabe: %(default)s, also mit allen; zur Wahl von K siehe abgleichbench.py)",
+        default=0,
+    )
     parser.add_argument(
         action="store",
         dest="ownlist",
@@ -98,6 +272,22 @@ def parse_args():
         type=Path,
         help="Pfad zur CSV-Liste die aus unserem Excel-Sheet erstellt wurde.",
     )
+    parser.add_argument(
+        "--metrics-json",
+        dest="metricsjson",
+        metavar="DATEI",
+        type=Path,
+        help="Schreibe am Ende des Abgleichs Zähler (Treffer, Vergleiche, ...) und Laufzeiten je Abschnitt als JSON in diese Datei.",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        dest="metricsprom",
+        metavar="DATEI",
+        type=Path,
+        help="Wie --metrics-json, aber im Textformat für den textfile collector des Prometheus node_exporter (Dateiendung .prom).",
+        default=None,
+    )
     parser.add_argument(
         "-v",
         "--verbose",
@@ -124,7 +314,8 @@ def setup_logging(verbosity: int):
     logger.setLevel(logging.DEBUG)
 
     conlog = logging.StreamHandler(sys.stderr)
-    filelog = logging.FileHandler(log_filepath)
+    # Die Logdatei wird erst beim ersten Eintrag geöffnet, damit --help und Fehlaufrufe nichts anlegen
+    filelog = logging.FileHandler(log_filepath, delay=True)
 
     conloglvl = logging.WARNING
     if verbosity > 1:
@@ -142,7 +333,6 @@ def setup_logging(verbosity: int):
     logger.addHandler(conlog)
     logger.addHandler(filelog)
 
-    logger.debug("Logging initialisiert")
     return logger
 
 
@@ -234,13 +424,391 @@ def read_own_format(inp):
     return kartei, waisen, duplikate
 
 
+# Spalten der Exemplartabelle im SQLite-Export der 'sbasuche.py' (--export-sqlite) und die zugehörigen Schlüssel
+SQLITE_EXEMPLAR_SPALTEN = {"Schulbibliothek": "schulbibliothek", "Standorte": "standorte", "Status": "status", "Rückgabedatum": "rueckgabedatum"}
+SQLITE_LISTEN_FELDER = ("authors", "isbn", "publisher", "responsibility", "series", "subject_type", "systematics")
+SQLITE_SCHEMAVERSION = 1
+
+# Rollen wie "(Verfasser)" und Füllwörter aus der Verantwortlichkeitsangabe ("Text: ... ; mit Bildern von ...") zählen nicht als Namen
+AUTOREN_ROLLE = re.compile(r"\([^)]*\)")
+AUTOREN_FÜLLWÖRTER = frozenset({"aus", "bilder", "bildern", "dem", "den", "der", "die", "ill", "illustrationen", "mit", "text", "und", "van", "von"})
+
+
+def lies_katalog_sqlite(pfad):
+    """\
+    Liest den SQLite-Export der 'sbasuche.py' (--export-sqlite) Datensatz für Datensatz.
+
+    Die Datenbank wird nur lesend und per mmap geöffnet; die Datensätze entsprechen jenen der JSON-Ausgabe.
+    """
+    import sqlite3
+
+    db = sqlite3.connect(f"{Path(pfad).resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        db.execute("PRAGMA mmap_size = 268435456")
+        (version,) = db.execute("PRAGMA user_version").fetchone()
+        if version != SQLITE_SCHEMAVERSION:
+            raise ValidationError(f"{pfad} hat die Schemaversion {version}, erwartet wird {SQLITE_SCHEMAVERSION}.")
+        exemplare = {}
+        for datensatz_id, _, *werte, extra in db.execute("SELECT * FROM copies ORDER BY record_id, nr"):
+            exemplar = {schlüssel: wert for schlüssel, wert in zip(SQLITE_EXEMPLAR_SPALTEN, werte) if wert is not None}
+            exemplar.update(json.loads(extra) if extra else {})
+            exemplare.setdefault(datensatz_id, []).append(exemplar)
+        for datensatz_id, match_index, match_total, match_entry, titel, beschreibung, auszug, jahr, *listen in db.execute("SELECT * FROM records ORDER BY id"):
+            buch = {
+                "match_index": match_index,
+                "match_total": match_total,
+                "match_entry": match_entry,
+                "title": titel,
+                "description": beschreibung,
+                "excerpt": auszug,
+                "publish_year": jahr,
+                "copies": exemplare.pop(datensatz_id, []),
+            }
+            buch.update((feld, None if wert is None else json.loads(wert)) for feld, wert in zip(SQLITE_LISTEN_FELDER, listen))
+            yield buch
+    finally:
+        db.close()
+
+
+def lies_katalog(pfad):
+    """\
+    Liest die Ausgabe der 'sbasuche.py' Datensatz für Datensatz, egal ob als JSON-Array, als JSON Lines (--format jsonl) oder
+    als SQLite-Export (--export-sqlite).
+
+    Bei JSON Lines wird die Datei zeilenweise gelesen, eine unvollständige letzte Zeile (Absturz beim Schreiben) wird übersprungen.
+    """
+    with open(pfad, "rb") as datei:
+        if datei.read(16) == b"SQLite format 3\x00":
+            yield from lies_katalog_sqlite(pfad)
+            return
+    with open(pfad, "r") as json_file:
+        if json_file.read(64).lstrip().startswith("["):
+            json_file.seek(0)
+            yield from json.load(json_file)
+            return
+        json_file.seek(0)
+        for zeilennummer, zeile in enumerate(json_file, 1):
+            if not zeile.strip():
+                continue
+            try:
+                yield json.loads(zeile)
+            except json.JSONDecodeError:
+                if zeile.endswith("\n"):
+                    raise ValidationError(f"Zeile {zeilennummer} in {pfad} ist kein gültiges JSON.")
+                log.warning("Unvollständige letzte Zeile %d in %s wird ignoriert", zeilennummer, pfad)
+
+
 @cache
 def der_große_gleichmacher(inp):
+    from rapidfuzz import utils
+
     return utils.default_process(inp)
 
 
+def titelindex_erstellen(kartei):
+    """\
+    Index vom normalisierten Titel (der_große_gleichmacher) auf die Karteinummern mit diesem Titel.
+
+    Die Karteinummern stehen in umgekehrter Reihenfolge der Kartei, so daß pop() die erste noch freie liefert.
+    """
+    titelindex = {}
+    for karteinummer, (buchtitel, _, _) in kartei.items():
+        titelindex.setdefault(der_große_gleichmacher(buchtitel), []).append(karteinummer)
+    for karteinummern in titelindex.values():
+        karteinummern.reverse()
+    return titelindex
+
+
+def mehrdeutige_titel_melden(katalogtitel, titelindex):
+    """\
+    Meldet Titel, die sich mehrere Einträge im Katalog oder in der Kartei teilen; bei diesen ist die exakte Zuordnung nur
+    eine von mehreren möglichen (die erste Karteikarte geht an das erste Buch). Übrig gebliebene Karteikarten bzw. Bücher
+    landen im unscharfen Abgleich.
+    """
+    mehrdeutig = 0
+    for titel, bücher in katalogtitel.items():
+        übrig = titelindex.get(titel, [])
+        zugeordnet = sum(1 for buch in bücher if "karteinummern" in buch)
+        if len(bücher) == 1 and zugeordnet + len(übrig) <= 1:
+            continue
+        mehrdeutig += 1
+        log.info(
+            "Mehrdeutiger Titel '%s': %d Einzelexemplar(e) im Katalog, %d Karteikarte(n); %d zugeordnet, %d Karteikarte(n) übrig (%s)",
+            bücher[0]["title"],
+            len(bücher),
+            zugeordnet + len(übrig),
+            zugeordnet,
+            len(übrig),
+            ", ".join(reversed(übrig)),
+        )
+    for titel, übrig in titelindex.items():
+        if len(übrig) > 1 and titel not in katalogtitel:
+            mehrdeutig += 1
+            log.info("Mehrdeutiger Titel '%s': %d Karteikarten ohne Einzelexemplar im Katalog (%s)", titel, len(übrig), ", ".join(reversed(übrig)))
+    if mehrdeutig:
+        log.warning("%d Titel teilen sich mehrere Einträge im Katalog bzw. in der Kartei (Einzelheiten mit -v)", mehrdeutig)
+    gezählt("mehrdeutige_titel", mehrdeutig)
+
+
+class TrigrammIndex(object):
+    """\
+    Invertierter Index von den Zeichen-Trigrammen der (normalisierten) Titel auf deren Position, zur Vorauswahl der
+    Kandidaten im unscharfen Abgleich (Blocking).
+
+    Kandidaten für einen Titel sind jene mit den meisten gemeinsamen Trigrammen, gewichtet nach deren Seltenheit (IDF).
+    Trigramme, die in mehr als dem Anteil häufig aller Titel vorkommen, werden dabei übergangen, sofern der Titel auch
+    seltenere hat; sie tragen kaum zur Unterscheidung bei, würden aber die meiste Arbeit verursachen.
+    """
+
+    häufig = 0.1
+
+    def __init__(self, titel: list):
+        import math
+
+        import numpy as np
+
+        positionen = {}
+        for position, einzeltitel in enumerate(titel):
+            for trigramm in self.trigramme(einzeltitel):
+                positionen.setdefault(trigramm, []).append(position)
+        self.anzahl = len(titel)
+        self.grenze = max(1, int(self.häufig * self.anzahl))
+        self.positionen = {trigramm: np.array(liste, dtype=np.int64) for trigramm, liste in positionen.items()}
+        self.gewichte = {trigramm: math.log(1 + self.anzahl / len(liste)) for trigramm, liste in positionen.items()}
+
+    @staticmethod
+    def trigramme(titel: str) -> set:
+        titel = f"  {titel} "
+        return {titel[i : i + 3] for i in range(len(titel) - 2)}
+
+    def kandidaten(self, titel: str, k: int):
+        """\
+        Positionen der (höchstens) k besten Kandidaten für titel, aufsteigend sortiert.
+        """
+        import numpy as np
+
+        assert k > 0, "Ohne Vorauswahl (k=0) wird der Index nicht gebraucht."
+
+        trigramme = [trigramm for trigramm in self.trigramme(titel) if trigramm in self.positionen]
+        trigramme = [trigramm for trigramm in trigramme if len(self.positionen[trigramm]) <= self.grenze] or trigramme
+        if not trigramme:
+            return np.empty(0, dtype=np.int64)
+        positionen = np.concatenate([self.positionen[trigramm] for trigramm in trigramme])
+        gewichte = np.concatenate([np.full(len(self.positionen[trigramm]), self.gewichte[trigramm]) for trigramm in trigramme])
+        treffer, rückverweis = np.unique(positionen, return_inverse=True)
+        if len(treffer) > k:
+            punkte = np.bincount(rückverweis, weights=gewichte)
+            treffer = np.sort(treffer[np.argpartition(-punkte, k - 1)[:k]])
+        return treffer
+
+
+class Bewertungsmatrix(object):
+    """\
+    Ähnlichkeit (WRatio) jedes Buchs zu jeder Karteikarte, einmalig per rapidfuzz.process.cdist auf allen Kernen berechnet.
+
+    Die Titel werden dazu vorab je einmal normalisiert (der_große_gleichmacher). Werte unter mindestwert werden (wie bei
+    process.extract mit score_cutoff) nicht genau berechnet, sondern als 0 geliefert; das spart den Großteil der Zeit.
+    Vergebene Karteikarten werden nur als solche markiert, die Matrix selbst bleibt unverändert.
+
+    Ist kandidaten_je_buch größer 0, wird jedes Buch nur mit so vielen per TrigrammIndex vorausgewählten Karteikarten
+    verglichen (per rapidfuzz.process.cpdist); alle übrigen gelten als unter dem Mindestwert. Der Aufwand wächst dann nur
+    noch linear mit der Zahl der Bücher, dafür kann eine passende Karteikarte (oder eine, die einen Treffer mehrdeutig
+    machen würde) übersehen werden, siehe abgleichbench.py.
+    """
+
+    def __init__(self, bücher, kartei, mindestwert, kandidaten_je_buch=0):
+        # numpy und rapidfuzz erst hier laden, sie tragen den Großteil der Startzeit bei
+        import numpy as np
+        from rapidfuzz import fuzz, process
+
+        self.mindestwert = mindestwert
+        self.bücher = list(bücher)
+        self.zeilen = {id(buch): zeile for zeile, buch in enumerate(self.bücher)}
+        self.karteinummern = list(kartei)
+        self.spalten = {karteinummer: spalte for spalte, karteinummer in enumerate(self.karteinummern)}
+        anfragen = [der_große_gleichmacher(buch["title"].strip()) for buch in bücher]
+        auswahl = [der_große_gleichmacher(kartei[karteinummer][0].strip()) for karteinummer in self.karteinummern]
+        self.frei = np.ones(len(self.karteinummern), dtype=bool)
+        self.dicht = None
+        if not kandidaten_je_buch or kandidaten_je_buch >= len(auswahl):
+            with gemessen("unscharf"):
+                # float64 wie bei process.extract, damit die Vergleiche mit den Schwellwerten exakt gleich ausgehen
+                self.dicht = process.cdist(anfragen, auswahl, scorer=fuzz.WRatio, processor=None, score_cutoff=mindestwert, dtype=np.float64, workers=-1)
+            self.alle_spalten = np.arange(len(auswahl))
+            gezählt("unscharfe_vergleiche", len(anfragen) * len(auswahl))
+            return
+        # Je Buch die Spalten seiner Kandidaten (self.kandidaten[self.zeiger[zeile]:self.zeiger[zeile + 1]]) und deren Werte
+        with gemessen("kandidaten"):
+            index = TrigrammIndex(auswahl)
+            kandidaten = [index.kandidaten(anfrage, kandidaten_je_buch) for anfrage in anfragen]
+            self.zeiger = np.zeros(len(anfragen) + 1, dtype=np.int64)
+            np.cumsum([len(spalten) for spalten in kandidaten], out=self.zeiger[1:])
+            self.kandidaten = np.concatenate(kandidaten) if kandidaten else np.empty(0, dtype=np.int64)
+        with gemessen("unscharf"):
+            paare_anfragen = [anfrage for anfrage, spalten in zip(anfragen, kandidaten) for _ in range(len(spalten))]
+            paare_auswahl = [auswahl[spalte] for spalte in self.kandidaten]
+            self.werte = process.cpdist(
+                paare_anfragen, paare_auswahl, scorer=fuzz.WRatio, processor=None, score_cutoff=mindestwert, dtype=np.float64, workers=-1
+            )
+        gezählt("unscharfe_vergleiche", len(self.kandidaten))
+
+    def vergeben(self, karteinummer):
+        self.frei[self.spalten[karteinummer]] = False
+
+    def zeile(self, buch):
+        """\
+        Spalten und Werte des Buchs (alle Karteikarten bzw. nur seine Kandidaten), bereits vergebene mit -1.
+        """
+        import numpy as np
+
+        zeile = self.zeilen[id(buch)]
+        if self.dicht is not None:
+            return self.alle_spalten, np.where(self.frei, self.dicht[zeile], -1.0)
+        spalten = self.kandidaten[self.zeiger[zeile] : self.zeiger[zeile + 1]]
+        return spalten, np.where(self.frei[spalten], self.werte[self.zeiger[zeile] : self.zeiger[zeile + 1]], -1.0)
+
+    def eindeutiger_treffer(self, buch, cutoff):
+        """\
+        Wie eindeutiger_treffer_klassisch(), aber aus der Matrix: der höchste Schwellwert (99 abwärts bis cutoff), ab dem
+        genau eine Karteikarte erreicht wird, ist bei den beiden besten Werten s1 >= s2 t = min(99, floor(s1)), sofern
+        t >= cutoff und s2 < t. Liefert (Karteinummer, t) oder None.
+        """
+        assert cutoff >= self.mindestwert, "Werte unter dem Mindestwert der Matrix sind nicht genau berechnet."
+        spalten, werte = self.zeile(buch)
+        if not werte.size:
+            return None
+        beste = int(werte.argmax())
+        schwelle = min(99, int(werte[beste]))  # Werte sind nicht negativ, int() rundet daher ab
+        werte[beste] = -1.0
+        if schwelle < cutoff or werte.max(initial=-1.0) >= schwelle:
+            return None
+        return self.karteinummern[spalten[beste]], schwelle
+
+    def kandidaten_ab(self, buch, schwelle):
+        """\
+        Alle freien Karteikarten mit einem Wert von mindestens schwelle als (Karteinummer, Wert).
+        """
+        import numpy as np
+
+        assert schwelle >= self.mindestwert, "Werte unter dem Mindestwert der Matrix sind nicht genau berechnet."
+        spalten, werte = self.zeile(buch)
+        return [(self.karteinummern[spalten[position]], float(werte[position])) for position in np.flatnonzero(werte >= schwelle)]
+
+    def paare_ab(self, schwelle):
+        """\
+        Alle Paare aus Buch und freier Karteikarte mit einem Wert von mindestens schwelle als Arrays (Zeilen, Spalten, Werte).
+        """
+        import numpy as np
+
+        assert schwelle >= self.mindestwert, "Werte unter dem Mindestwert der Matrix sind nicht genau berechnet."
+        if self.dicht is not None:
+            zeilen, spalten = np.nonzero((self.dicht >= schwelle) & self.frei)
+            return zeilen, spalten, self.dicht[zeilen, spalten]
+        zeilen = np.repeat(np.arange(len(self.bücher)), np.diff(self.zeiger))
+        auswahl = (self.werte >= schwelle) & self.frei[self.kandidaten]
+        return zeilen[auswahl], self.kandidaten[auswahl], self.werte[auswahl]
+
+
+def optimale_zuordnung(matrix, schwelle):
+    """\
+    Ordnet Bücher und Karteikarten (jeweils höchstens einmal) so einander zu, daß die Summe der Werte aller Paare ab
+    schwelle am größten ist. Dazu wird der Graph dieser Paare in Zusammenhangskomponenten zerlegt und jede für sich per
+    scipy.optimize.linear_sum_assignment gelöst; das Ergebnis hängt daher weder von der Reihenfolge der Bücher ab, noch
+    braucht es mehrere Durchläufe. Liefert (Buch, Karteinummer, Wert) in der Reihenfolge der Bücher.
+    """
+    import numpy as np
+    from scipy.optimize import linear_sum_assignment
+    from scipy.sparse import coo_array
+    from scipy.sparse.csgraph import connected_components
+
+    zeilen, spalten, werte = matrix.paare_ab(schwelle)
+    if not len(werte):
+        return []
+    # Bücher und Karteikarten als Knoten eines Graphen, die Karteikarten hinter den Büchern
+    anzahl_bücher = len(matrix.bücher)
+    knoten = anzahl_bücher + len(matrix.karteinummern)
+    graph = coo_array((np.ones(len(werte)), (zeilen, spalten + anzahl_bücher)), shape=(knoten, knoten))
+    _, komponente = connected_components(graph, directed=False)
+    reihenfolge = np.argsort(komponente[zeilen], kind="stable")
+    zeilen, spalten, werte = zeilen[reihenfolge], spalten[reihenfolge], werte[reihenfolge]
+    grenzen = np.flatnonzero(np.diff(komponente[zeilen])) + 1
+    paare = []
+    for teil_zeilen, teil_spalten, teil_werte in zip(np.split(zeilen, grenzen), np.split(spalten, grenzen), np.split(werte, grenzen)):
+        bücher, buch_index = np.unique(teil_zeilen, return_inverse=True)
+        karten, karten_index = np.unique(teil_spalten, return_inverse=True)
+        # Fehlende Paare als 0, d.h. schlechter als jedes echte Paar; werden sie doch gewählt, bleibt das Buch ohne Karteikarte
+        teilmatrix = np.zeros((len(bücher), len(karten)))
+        teilmatrix[buch_index, karten_index] = teil_werte
+        for buch, karte in zip(*linear_sum_assignment(teilmatrix, maximize=True)):
+            if teilmatrix[buch, karte] >= schwelle:
+                paare.append((int(bücher[buch]), int(karten[karte]), float(teilmatrix[buch, karte])))
+    gezählt("zuordnung_komponenten", len(grenzen) + 1)
+    log.debug(f"{len(grenzen) + 1} Komponente(n) aus {len(werte)} Paaren, die größte mit {max(np.diff(grenzen, prepend=0, append=len(werte)))} Paaren")
+    return [(matrix.bücher[zeile], matrix.karteinummern[spalte], wert) for zeile, spalte, wert in sorted(paare)]
+
+
+def eindeutiger_treffer_klassisch(buch, kartei_titel, schwellwerte):
+    """\
+    Sucht per process.extract je Schwellwert (absteigend) die Karteikarten mit mindestens diesem Wert, bis es genau eine
+    ist. Liefert (Karteinummer, Schwellwert) oder None. Das ursprüngliche Verfahren, siehe --unscharf.
+    """
+    from rapidfuzz import fuzz, process
+
+    for score_limit in schwellwerte:  # beginnend von der höchsten Wahrscheinlichkeit
+        with gemessen("unscharf"):
+            kandidaten = process.extract(buch["title"].strip(), kartei_titel, scorer=fuzz.WRatio, processor=der_große_gleichmacher, score_cutoff=score_limit)
+        gezählt("unscharfe_vergleiche", len(kartei_titel))
+        if kandidaten and len(kandidaten) == 1:
+            return kandidaten[0][2], score_limit
+    return None
+
+
+def autorennamen(*angaben) -> frozenset:
+    """\
+    Die (normalisierten) Namensbestandteile aus Autorenangaben beider Listen, ohne Rollen und Füllwörter.
+    """
+    namen = set()
+    for angabe in angaben:
+        namen.update(der_große_gleichmacher(AUTOREN_ROLLE.sub(" ", angabe or "")).split())
+    return frozenset(name for name in namen if len(name) > 2 and name not in AUTOREN_FÜLLWÖRTER)
+
+
+def kartei_gruppen_erstellen(kartei):
+    """\
+    Gruppiert die Karteinummern nach normalisiertem Titel und Verfasser: {Titel: {Autorennamen: [Karteinummern]}}, die
+    Karteinummern jeweils in der Reihenfolge der Kartei. Karteikarten ohne Verfasser bilden eine eigene Gruppe.
+    """
+    gruppen = {}
+    for karteinummer, (buchtitel, verfasser, _) in kartei.items():
+        gruppen.setdefault(der_große_gleichmacher(buchtitel), {}).setdefault(autorennamen(verfasser), []).append(karteinummer)
+    return gruppen
+
+
+def passende_gruppen(buch, gruppen):
+    """\
+    Die Gruppen (Listen von Karteinummern) aus kartei_gruppen_erstellen() zu einem Titel, deren Verfasser zum Buch passen:
+    zuerst jene mit gemeinsamen Namen, dann jene ohne Verfasser. Hat das Buch keine Autorenangaben, passen alle.
+    """
+    namen = autorennamen(*buch.get("authors", None) or [], *buch.get("responsibility", None) or [])
+    if not namen:
+        return list(gruppen.values())
+    mit_namen = [karteinummern for verfasser, karteinummern in gruppen.items() if verfasser & namen]
+    return mit_namen + [karteinummern for verfasser, karteinummern in gruppen.items() if not verfasser]
+
+
+def entfernen(liste: list, erledigt: list):
+    """\
+    Entfernt die Bücher aus erledigt (nach Identität) in einem Durchgang aus liste, statt je Buch per list.remove(),
+    welches die Liste jedes Mal durchsucht und dabei ganze Dictionaries vergleicht.
+    """
+    if erledigt:
+        erledigt = {id(buch) for buch in erledigt}
+        liste[:] = [buch for buch in liste if id(buch) not in erledigt]
+
+
 def abgleich_einzel_exemplare(katalog, kartei):
     global zugeordnete_karteinummern
+
     # Diese Fälle sind am einfachsten. Wir haben exakt ein Exemplar, welches wir eventuell zuordnen können
     einzel_exemplare = [x for x in katalog if len(x["copies"]) == 1]
     mehrfach_exemplare = [x for x in katalog if len(x["copies"]) != 1]
@@ -252,72 +820,86 @@ def abgleich_einzel_exemplare(katalog, kartei):
     neuer_katalog = []
     zu_löschen = []
     # Exakte Treffer zuerst, damit die Liste der verbleibenden Kandidaten schön "klein" wird
-    for buch in einzel_exemplare:
-        for karteinummer, (buchtitel, verfasser, _) in kartei.items():
-            if buch["title"].strip() != buch["title"]:
-                log.debug("UNSTRIPPED (katalog): '%s'", buch["title"])
-            if buchtitel.strip() != buchtitel:
-                log.debug("UNSTRIPPED (kartei): '%s'", buchtitel)
-            if der_große_gleichmacher(buch["title"]) == der_große_gleichmacher(buchtitel):
-                del kartei[karteinummer]
-                zu_löschen.append(buch)
-                buch["karteinummern"] = [karteinummer]
-                neuer_katalog.append(buch)
-                zugeordnete_karteinummern[karteinummer] = buch
-                break  # innere for-Schleife
+    with gemessen("exakt"):
+        titelindex = titelindex_erstellen(kartei)
+        katalogtitel = {}  # normalisierter Titel -> Bücher, für die Meldung mehrdeutiger Titel
+        for buch in einzel_exemplare:
+            titel = der_große_gleichmacher(buch["title"])
+            katalogtitel.setdefault(titel, []).append(buch)
+            karteinummern = titelindex.get(titel)
+            if not karteinummern:
+                continue
+            # Bei mehreren Karteikarten mit diesem Titel gewinnt die erste (in der Reihenfolge der Kartei)
+            karteinummer = karteinummern.pop()
+            del kartei[karteinummer]
+            zu_löschen.append(buch)
+            buch["karteinummern"] = [karteinummer]
+            neuer_katalog.append(buch)
+            zugeordnete_karteinummern[karteinummer] = buch
+        mehrdeutige_titel_melden(katalogtitel, titelindex)
+    gezählt("exakte_treffer", len(zu_löschen))
     # Ein paar Debugausgaben
     log.debug(f"{len(zu_löschen)=} (alter Katalog; Eingabedaten)")
     log.debug(f"{len(katalog)=} (sollte {gesamtzahl_exemplare=} entsprechen)")
     log.debug(f"{len(neuer_katalog)=} (mit hoher Sicherheit zugeordnete Exemplare)")
     # Katalogliste um jene Elemente bereinigen, die wir oben in neuer_katalog übernommen haben (dort inkl. Karteinummer)
-    for eintrag in zu_löschen:
-        katalog.remove(eintrag)
+    entfernen(katalog, zu_löschen)
     assert len(einzel_exemplare) + len(mehrfach_exemplare) == len(neuer_katalog) + len(
         katalog
     ), "Beide Listen zusammen müssen exakt die Anzahl Elemente der Quellliste enthalten."
     log.debug(f"{len(katalog)=} (NACH LÖSCHUNG von {len(zu_löschen)=} Elementen)")
     log.debug(f"{len(neuer_katalog)} + {len(katalog)} = {len(neuer_katalog)+len(katalog)} (sicher zugeordnet + verbleibend = gesamt)")
     # Nach der obigen Prüfung diese Elemente auch aus der Liste mit den Einzelexemplaren löschen
-    for eintrag in zu_löschen:
-        einzel_exemplare.remove(eintrag)
+    entfernen(einzel_exemplare, zu_löschen)
     log.debug(f"{len(einzel_exemplare)=} (NACH LÖSCHUNG von {len(zu_löschen)=} Elementen)")
     zu_löschen = []  # Liste leeren, da wir hier quasi von vorn beginnen
     # Schwellwertliste in umgekehrter Reihenfolge
     cutoff_thresholds = [cutoff]
     if cutoff < 100:
         cutoff_thresholds = sorted(range(cutoff, 100), reverse=True)
+    # Die Ähnlichkeiten aller verbleibenden Paare auf einmal, statt je Buch und Schwellwert über die ganze Kartei
+    matrix = None if unscharf_verfahren == "klassisch" else Bewertungsmatrix(einzel_exemplare, kartei, cutoff, kandidaten_je_buch)
+    if zuordnungsverfahren == "optimal":
+        # In einem Durchgang, die gierigen Durchläufe unten finden danach nichts mehr
+        with gemessen("zuordnung"):
+            paare = optimale_zuordnung(matrix, cutoff)
+        for buch, karteinummer, wert in paare:
+            del kartei[karteinummer]
+            matrix.vergeben(karteinummer)
+            buch["karteinummern"] = [karteinummer]
+            buch["treffer_wahrscheinlichkeit"] = min(99, int(wert))
+            neuer_katalog.append(buch)
+            zugeordnete_karteinummern[karteinummer] = buch
+        entfernen(katalog, [buch for buch, _, _ in paare])
+        entfernen(einzel_exemplare, [buch for buch, _, _ in paare])
+        gesamtwert = sum(wert for _, _, wert in paare)
+        gezählt("unscharfe_treffer", len(paare))
+        gesetzt("zuordnung_gesamtwert", round(gesamtwert, 2))
+        log.info(f"Optimale Zuordnung: {len(paare)} Paar(e) >={cutoff}% mit einem Gesamtwert von {gesamtwert:.2f}")
     # Top-Treffer (>=<cutoff>%) als nächste
     for attempt in range(5):
         kartei_titel = {k: x[0].strip() for k, x in kartei.items()}
         for buch in einzel_exemplare:
-            treffer = None
-            for karteinummer, titel in kartei_titel.items():
-                if karteinummer in zugeordnete_karteinummern:
-                    log.debug(f"LOGIKFEHLER: {karteinummer=} ist bereits zugeordnet und taucht dennoch in der Liste auf.")
-                if buch["title"].strip() != buch["title"]:
-                    log.debug("UNSTRIPPED (katalog): '%s'", buch["title"])
-                if buchtitel.strip() != buchtitel:
-                    log.debug("UNSTRIPPED (kartei): '%s'", buchtitel)
-            for score_limit in cutoff_thresholds:  # beginnend von der höchsten Wahrscheinlichkeit
-                kandidaten = process.extract(
-                    buch["title"].strip(), kartei_titel, scorer=fuzz.WRatio, processor=der_große_gleichmacher, score_cutoff=score_limit
-                )
-                if kandidaten and len(kandidaten) == 1:
-                    karteinummer = kandidaten[0][2]
-                    del kartei_titel[karteinummer]
-                    del kartei[karteinummer]
-                    zu_löschen.append(buch)
-                    buch["karteinummern"] = [karteinummer]
-                    buch["treffer_wahrscheinlichkeit"] = treffer = score_limit
-                    neuer_katalog.append(buch)
-                    zugeordnete_karteinummern[karteinummer] = buch
-                    break
-            if treffer:
+            if matrix is not None:
+                treffer = matrix.eindeutiger_treffer(buch, cutoff)
+            else:
+                treffer = eindeutiger_treffer_klassisch(buch, kartei_titel, cutoff_thresholds)
+            if treffer is None:
                 continue
+            karteinummer, score_limit = treffer
+            del kartei_titel[karteinummer]
+            del kartei[karteinummer]
+            if matrix is not None:
+                matrix.vergeben(karteinummer)
+            zu_löschen.append(buch)
+            buch["karteinummern"] = [karteinummer]
+            buch["treffer_wahrscheinlichkeit"] = score_limit
+            neuer_katalog.append(buch)
+            zugeordnete_karteinummern[karteinummer] = buch
+            gezählt("unscharfe_treffer")
         # Bereinigen
-        for eintrag in zu_löschen:
-            katalog.remove(eintrag)
-            einzel_exemplare.remove(eintrag)
+        entfernen(katalog, zu_löschen)
+        entfernen(einzel_exemplare, zu_löschen)
         for karteinummer in zugeordnete_karteinummern.keys():
             if karteinummer in kartei:
                 del kartei[karteinummer]
@@ -331,42 +913,133 @@ def abgleich_einzel_exemplare(katalog, kartei):
             zu_löschen = []  # Liste leeren, da wir hier quasi von vorn beginnen
             break
         zu_löschen = []  # Liste leeren, da wir hier quasi von vorn beginnen
-    # Plausible Treffer (>=80%) unter Zuhilfename der Autoreninformation
-    kartei_titel = {k: x[0].strip() for k, x in kartei.items()}
-    for buch in einzel_exemplare:
-        for karteinummer, titel in kartei_titel.items():
-            if karteinummer in zugeordnete_karteinummern:
-                log.debug(f"LOGIKFEHLER: {karteinummer=} ist bereits zugeordnet und taucht dennoch in der Liste auf.")
-            if buch["title"].strip() != buch["title"]:
-                log.debug("UNSTRIPPED (katalog): '%s'", buch["title"])
-            if buchtitel.strip() != buchtitel:
-                log.debug("UNSTRIPPED (kartei): '%s'", buchtitel)
-        kandidaten = process.extract(buch["title"].strip(), kartei_titel, scorer=fuzz.WRatio, processor=der_große_gleichmacher, score_cutoff=80)
-        if kandidaten:
-            for kandidat in kandidaten:
-                ...
-
-        # if kandidaten:
-        #     if len(kandidaten) == 1:
-        #         kandidat = kandidaten[0]
-        #         print(f"{kandidat=!r} -> '{buch["title"]}'")
-    for eintrag in zu_löschen:
-        katalog.remove(eintrag)
-        einzel_exemplare.remove(eintrag)
+    # Eine weitere Runde für plausible Treffer (>=80%) gibt es bewußt nicht: ohne Abgleich der Autoren wären sie zu
+    # unsicher, also werden dafür auch keine Kandidaten berechnet.
+    entfernen(katalog, zu_löschen)
+    entfernen(einzel_exemplare, zu_löschen)
     for karteinummer in zugeordnete_karteinummern.keys():
         if karteinummer in kartei:
             del kartei[karteinummer]
-    # DEBUGGING
-    outfile = Path(__file__).resolve().parent / "neu.json"
-    with open(outfile, "w") as json_file:
-        json.dump(neuer_katalog, json_file, allow_nan=False, ensure_ascii=False, sort_keys=True, indent=4)
+    return neuer_katalog
+
+
+def abgleich_mehrfach_exemplare(katalog, kartei):
+    """\
+    Gleicht Bücher mit mehreren Exemplaren ab: jedes bekommt bis zu so viele Karteinummern, wie es Exemplare hat.
+
+    Zuerst exakt, über die nach normalisiertem Titel und Verfasser gruppierte Kartei (kartei_gruppen_erstellen()), dann
+    für die noch fehlenden Exemplare unscharf über die Bewertungsmatrix: ein Buch bekommt die Karteikarten des Titels
+    mit dem höchsten Wert ab cutoff, unter dessen Karteikarten noch welche mit passendem Verfasser frei sind, sofern
+    kein anderer solcher Titel gleich gut abschneidet. Exemplare ohne Karteikarte und übrig gebliebene Karteikarten der
+    exakt gefundenen oder zugeordneten Titel (auch solche mit anderem Verfasser) werden gemeldet und gezählt.
+    """
+    mehrfach_exemplare = [x for x in katalog if len(x["copies"]) > 1]
+    gezählt("mehrfach_exemplare", len(mehrfach_exemplare))
+    neuer_katalog = []
+
+    def zuordnen(buch, karteinummern, wert=None):
+        if "karteinummern" not in buch:
+            buch["karteinummern"] = []
+            neuer_katalog.append(buch)
+        buch["karteinummern"] += karteinummern
+        if wert is not None:
+            buch["treffer_wahrscheinlichkeit"] = min(99, int(wert))
+        for karteinummer in karteinummern:
+            del kartei[karteinummer]
+            zugeordnete_karteinummern[karteinummer] = buch
+
+    with gemessen("mehrfach_exakt"):
+        gruppen = kartei_gruppen_erstellen(kartei)
+        betroffene_titel = set()
+        for buch in mehrfach_exemplare:
+            titel = der_große_gleichmacher(buch["title"])
+            if titel in gruppen:
+                betroffene_titel.add(titel)
+            for karteinummern in passende_gruppen(buch, gruppen.get(titel, {})):
+                fehlend = len(buch["copies"]) - len(buch.get("karteinummern", []))
+                if fehlend <= 0:
+                    break
+                zuordnen(buch, karteinummern[:fehlend])
+                del karteinummern[:fehlend]
+    gezählt("mehrfach_exakte_treffer", sum(len(buch.get("karteinummern", [])) for buch in mehrfach_exemplare))
+    # Noch fehlende Exemplare unscharf, die Karteikarten eines Titels haben dabei alle denselben Wert
+    offen = [buch for buch in mehrfach_exemplare if len(buch.get("karteinummern", [])) < len(buch["copies"])]
+    if offen and kartei:
+        matrix = Bewertungsmatrix(offen, kartei, cutoff, kandidaten_je_buch)
+        for buch in offen:
+            titelwerte = {}
+            for karteinummer, wert in matrix.kandidaten_ab(buch, cutoff):
+                titel = der_große_gleichmacher(kartei[karteinummer][0])
+                titelwerte[titel] = max(wert, titelwerte.get(titel, 0.0))
+            # Titel, unter denen für dieses Buch keine Karteikarte mit passendem Verfasser mehr frei ist, scheiden aus
+            rangfolge = [
+                (titel, wert)
+                for titel, wert in sorted(titelwerte.items(), key=lambda eintrag: eintrag[1], reverse=True)
+                if any(passende_gruppen(buch, gruppen[titel]))
+            ]
+            if not rangfolge or (len(rangfolge) > 1 and rangfolge[1][1] >= rangfolge[0][1]):
+                continue
+            titel, wert = rangfolge[0]
+            for karteinummern in passende_gruppen(buch, gruppen[titel]):
+                fehlend = len(buch["copies"]) - len(buch.get("karteinummern", []))
+                if fehlend <= 0:
+                    break
+                for karteinummer in karteinummern[:fehlend]:
+                    matrix.vergeben(karteinummer)
+                gezählt("mehrfach_unscharfe_treffer", len(karteinummern[:fehlend]))
+                zuordnen(buch, karteinummern[:fehlend], wert)
+                del karteinummern[:fehlend]
+                betroffene_titel.add(titel)
+    fehlende = 0
+    for buch in mehrfach_exemplare:
+        fehlend = len(buch["copies"]) - len(buch.get("karteinummern", []))
+        if fehlend:
+            fehlende += fehlend
+            log.info("Zu '%s' fehlen %d von %d Karteikarte(n)", buch["title"], fehlend, len(buch["copies"]))
+    entfernen(katalog, neuer_katalog)
+    überzählige = 0
+    for titel in sorted(betroffene_titel):
+        übrig = [karteinummer for karteinummern in gruppen[titel].values() for karteinummer in karteinummern if karteinummer in kartei]
+        if übrig:
+            überzählige += len(übrig)
+            log.info("Überzählige Karteikarte(n) zu '%s': %s", kartei[übrig[0]][0], ", ".join(übrig))
+    gezählt("fehlende_karteikarten", fehlende)
+    gezählt("ueberzaehlige_karteikarten", überzählige)
+    log.debug(f"{len(neuer_katalog)=} (Bücher mit mehreren Exemplaren, {fehlende=}, {überzählige=})")
+    return neuer_katalog
 
 
 def main(**kwargs):
     """ """
-    global log, cutoff
+    global log, cutoff, metriken
     log = setup_logging(kwargs.get("verbose", 0))
+    metricsjson, metricsprom = kwargs.get("metricsjson", None), kwargs.get("metricsprom", None)
+    if metricsjson is not None or metricsprom is not None:
+        metriken = Metriken()
+    erfolgreich = False
+    try:
+        abgleich(**kwargs)
+        erfolgreich = True
+    finally:
+        if metriken is not None:
+            metriken.schreibe(metricsjson, metricsprom, "bestandslistenabgleich", erfolgreich)
+    return 0
+
+
+def abgleich(**kwargs):
+    """\
+    Liest beide Listen ein und gleicht sie ab.
+    """
+    global cutoff, unscharf_verfahren, kandidaten_je_buch, zuordnungsverfahren
     cutoff = kwargs.get("cutoff")
+    unscharf_verfahren = kwargs.get("unscharf", None) or "matrix"
+    kandidaten_je_buch = kwargs.get("kandidaten", None) or 0
+    zuordnungsverfahren = kwargs.get("zuordnung", None) or "gierig"
+    if zuordnungsverfahren == "optimal" and unscharf_verfahren == "klassisch":
+        log.warning("--zuordnung optimal benötigt die Matrix, --unscharf klassisch wird ignoriert.")
+        unscharf_verfahren = "matrix"
+    if kandidaten_je_buch and unscharf_verfahren == "klassisch":
+        log.warning("--kandidaten wird mit --unscharf klassisch ignoriert.")
     if cutoff < 90:
         log.warning("Schwellwerte unter %d %% sind eher unangemessen. Rechne mit vielen falschen Treffern!", cutoff)
     if cutoff >= 100:
@@ -375,10 +1048,10 @@ def main(**kwargs):
     sbalist = kwargs.get("sbalist", None)
     ownlist = kwargs.get("ownlist", None)
     katalog, kartei, waisen, duplikate = None, None, None, None
-    with open(sbalist, "r") as json_file:
-        katalog = json.load(json_file)
+    with gemessen("katalog_lesen"):
+        katalog = list(lies_katalog(sbalist))
     log.info(f"{len(katalog)=} (SBA-seitig)")
-    with open(ownlist, "r") as owncsv:
+    with gemessen("kartei_lesen"), open(ownlist, "r") as owncsv:
         kartei, waisen, duplikate = read_own_format(owncsv)
     if katalog is None or not isinstance(katalog, Iterable):
         raise ValidationError("'katalog' (gelesen aus der JSON von sbasuche.py) ist ungültig.")
@@ -388,10 +1061,22 @@ def main(**kwargs):
         log.warning("Habe %d verwaiste Einträge", 0 if waisen is None else len(waisen))
     if duplikate:
         log.warning("Habe %d Duplikat(e)", 0 if duplikate is None else len(duplikate))
+    gezählt("katalog_eintraege", len(katalog))
+    gezählt("kartei_eintraege", len(kartei))
+    gezählt("waisen", len(waisen or []))
+    gezählt("duplikate", len(duplikate or []))
+    gezählt("korrekturen", korrektur_count)
     global zugeordnete_karteinummern
     zugeordnete_karteinummern = {}
-    abgleich_einzel_exemplare(katalog, kartei)
-    return 0
+    with gemessen("abgleich"):
+        neuer_katalog = abgleich_einzel_exemplare(katalog, kartei)
+        neuer_katalog += abgleich_mehrfach_exemplare(katalog, kartei)
+    gezählt("zugeordnet", len(zugeordnete_karteinummern))
+    gezählt("nicht_zugeordnet", len(kartei))
+    # DEBUGGING
+    outfile = Path(__file__).resolve().parent / "neu.json"
+    with open(outfile, "w") as json_file:
+        json.dump(neuer_katalog, json_file, allow_nan=False, ensure_ascii=False, sort_keys=True, indent=4)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,351 @@
+#!/usr/bin/env -S uv run --script --quiet
+# -*- coding: utf-8 -*-
+# vim: set autoindent smartindent softtabstop=4 tabstop=4 shiftwidth=4 expandtab:
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "beautifulsoup4>=4.13",
+#     "requests>=2.32",
+#     "isbnlib>=3.10",
+# ]
+# ///
+from __future__ import (
+    print_function,
+    with_statement,
+    unicode_literals,
+    division,
+    absolute_import,
+)
+
+__author__ = "Oliver Schneider"
+__copyright__ = "2024, 2025 Oliver Schneider (assarbad.net), under the terms of the UNLICENSE"
+__version__ = "0.1.0"
+__compatible__ = (
+    (3, 12),
+    (3, 13),
+    (3, 14),
+)
+__doc__ = """
+========================
+ SBA Attrappe
+========================
+
+Lokaler Ersatz für die Katalogsuche der SBA, der zwischengespeicherte Detailseiten (cache/) erneut ausliefert.
+
+Damit lassen sich sbasuche.py bzw. SBASearch testen und vermessen (siehe sbabench.py), ohne den echten Katalog zu behelligen.
+"""
+import argparse  # noqa: F401
+import html
+import random
+import re
+import sys
+import threading
+import time
+from hashlib import sha1
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+from urllib.parse import parse_qs, urlparse
+
+from sbasuche import SBAPageStore
+
+# Checking for compatibility with Python version
+if sys.version_info[:2] not in __compatible__:
+    sys.exit(
+        "Dieses Skript ist nur mit folgenden Pythonversionen kompatibel: %s" % (", ".join(["%d.%d" % (z[0], z[1]) for z in __compatible__]))
+    )  # pragma: no cover
+
+
+def parse_args(args=None):
+    """\
+    Argumente parsen
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=Path(__file__).name)
+    parser.add_argument(
+        "--host",
+        dest="host",
+        default="127.0.0.1",
+        help="Adresse, an der gelauscht wird (Vorgabe: 127.0.0.1).",
+    )
+    parser.add_argument(
+        "--port",
+        dest="port",
+        type=int,
+        default=8080,
+        help="Port, an dem gelauscht wird (Vorgabe: 8080; 0 == beliebiger freier Port).",
+    )
+    parser.add_argument(
+        "--cache-dir",
+        dest="cachedir",
+        metavar="VERZEICHNIS",
+        type=Path,
+        default=None,
+        help="Cache-Verzeichnis (cache/OCLC_<searchhash>.<Trefferzahl>), dessen Seiten ausgeliefert werden. Vorgabe: das jüngste unter cache/.",
+    )
+    parser.add_argument(
+        "--cache-db",
+        dest="cachedb",
+        metavar="DATEI",
+        type=Path,
+        default=None,
+        help="Liefere die jüngste vollständige Suche aus dem Seiten-Cache (siehe sbasuche.py --cache-db) statt aus einem Verzeichnis aus.",
+    )
+    parser.add_argument(
+        "--limit",
+        dest="limit",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Liefere höchstens N Treffer aus.",
+    )
+    parser.add_argument(
+        "--latency",
+        dest="latency",
+        metavar="SEKUNDEN",
+        type=float,
+        default=0.0,
+        help="Künstliche Verzögerung jeder Antwort in Sekunden (Vorgabe: 0).",
+    )
+    parser.add_argument(
+        "--error-rate",
+        dest="error_rate",
+        metavar="ANTEIL",
+        type=float,
+        default=0.0,
+        help="Anteil (0..1) der Detailseiten, die stattdessen mit der Fehlerseite des Katalogs beantwortet werden (Vorgabe: 0).",
+    )
+    parser.add_argument(
+        "--branches",
+        dest="branches",
+        metavar="NAME[,NAME...]",
+        default=None,
+        help="Biete zusätzlich diese Schulbibliotheken zur Auswahl an; jede liefert einen eigenen, zusammenhängenden Teil der Treffer.",
+    )
+    return parser.parse_args(args)
+
+
+class PageSource(object):
+    """\
+    Die ausgelieferten Detailseiten, entweder aus einem Cache-Verzeichnis oder aus dem Seiten-Cache (SBAPageStore).
+    """
+
+    og_title_re = re.compile(r'<meta\s+property="og:title"\s+content="([^"]*)"')
+    status_re = re.compile(r'<span class="oclc-module-label">Status:</span>([^<]*)<')
+    due_re = re.compile(r'<span class="oclc-module-label">Rückgabedatum:</span>([^<]*)<')
+
+    def __init__(self, cachedir: Optional[Path] = None, cachedb: Optional[Path] = None, limit: Optional[int] = None):
+        self.pagestore = None
+        self.files = None
+        if cachedb is not None:
+            self.pagestore = SBAPageStore(cachedb)
+            self.search = self.pagestore.newest_complete_search()
+            if self.search is None:
+                raise RuntimeError(f"In der Cache-Datenbank ({cachedb}) wurde keine vollständig zwischengespeicherte Suche gefunden.")
+            self.item_total = self.search.item_total
+            self.name = f"{cachedb} ({self.search.searchhash})"
+        else:
+            if cachedir is None:
+                cache_basepath = Path(__file__).resolve().parent / "cache"
+                cache_dirs = [d for d in cache_basepath.iterdir() if d.is_dir() and d.name.startswith("OCLC_")]
+                if not cache_dirs:
+                    raise RuntimeError(f"Im Cache-Pfad ({cache_basepath}) wurde kein Verzeichnis mit dem Namen eines Suchhashes gefunden.")
+                cachedir = sorted(cache_dirs, key=lambda d: d.stat().st_mtime)[-1]
+            self.files = sorted(cachedir.glob("detail_????.html"))
+            if not self.files:
+                raise RuntimeError(f"Im Verzeichnis {cachedir} liegen keine Detailseiten.")
+            self.item_total = len(self.files)
+            self.name = str(cachedir)
+        if limit is not None:
+            self.item_total = min(self.item_total, limit)
+        self.lock = threading.Lock()
+        self.entries = None
+
+    def get(self, idx: int) -> str:
+        if self.pagestore is not None:
+            return self.pagestore.get(self.search.searchhash, self.search.item_total, idx)
+        return self.files[idx].read_text()
+
+    def get_listing_entry(self, idx: int) -> tuple:
+        """\
+        Titel (aus dem og:title der Detailseite) und Verfügbarkeit eines Treffers für die Trefferliste: Anzahl der Exemplare
+        sowie Status und ggf. Rückgabedatum jedes Exemplars (durch Komma getrennt).
+        """
+        with self.lock:
+            if self.entries is None:
+                self.entries = {}
+            if idx not in self.entries:
+                page = self.get(idx)
+                match = self.og_title_re.search(page)
+                statuses = [" ".join(html.unescape(status).split()) for status in self.status_re.findall(page)]
+                dues = [" ".join(html.unescape(due).split()) for due in self.due_re.findall(page)] + [""] * len(statuses)
+                copies = [f"{status} bis {due}" if due else status for status, due in zip(statuses, dues)]
+                availability = f"{len(copies)} Exemplar(e): {', '.join(copies)}" if copies else ""
+                self.entries[idx] = (html.unescape(match.group(1)) if match else f"Treffer {idx + 1}", availability)
+            return self.entries[idx]
+
+
+class SBAStandInHandler(BaseHTTPRequestHandler):
+    """\
+    Bildet die für SBASearch relevanten Abläufe der Katalogsuche nach:
+
+    - GET auf eine beliebige URL liefert das Suchformular
+    - POST liefert eine Umleitung auf die Trefferliste einer neuen Suche (searchhash=OCLC_...)
+    - GET mit searchhash (und ggf. page/pagesize) liefert eine Seite der Trefferliste
+    - GET mit searchhash und detail=N liefert die Detailseite des Treffers N (bzw. mit --error-rate die Fehlerseite)
+
+    Die vorausgewählte Schulbibliothek liefert alle Treffer, jede zusätzliche (siehe --branches) einen eigenen Ausschnitt
+    davon (siehe make_server). Die Trefferposition in der Detailseite ("N von M") wird passend zur Suche umgeschrieben.
+    """
+
+    protocol_version = "HTTP/1.1"
+    server_version = "SBAStandIn/" + __version__
+
+    form_page = """\
+<!DOCTYPE html>
+<html><head><title>Mediensuche</title></head><body>
+<form method="post" action="/A-F/Friedrich-Fr%C3%B6bel-Schule" id="Form" enctype="multipart/form-data">
+<input type="hidden" name="__VIEWSTATE" id="__VIEWSTATE" value="{viewstate}" />
+<input type="hidden" name="__VIEWSTATEGENERATOR" id="__VIEWSTATEGENERATOR" value="CA0B0334" />
+<input type="hidden" name="__EVENTVALIDATION" id="__EVENTVALIDATION" value="{viewstate}" />
+<a id="dnn_dnnLogin_loginLink" href="#">Anmelden</a>
+<select name="dnn$ctr1$SimpleSearch$DdlMediaGroupValue" id="dnn_ctr1_SimpleSearch_DdlMediaGroupValue">
+<option value="">Alle</option><option value="Buch">Buch</option>
+</select>
+<select name="dnn$ctr1$SimpleSearch$DdlBranchValue" id="dnn_ctr1_SimpleSearch_DdlBranchValue">
+<option value="">Alle</option><option selected="selected" value="Friedrich-Fröbel">Friedrich-Fröbel-Schule</option>{branch_options}
+</select>
+<input id="dnn_ctr1_SimpleSearch_RbMediaTypeList_0" type="radio" name="dnn$ctr1$SimpleSearch$RbMediaTypeList" value="0" checked="checked" />
+<input id="dnn_ctr1_SimpleSearch_RbMediaTypeList_1" type="radio" name="dnn$ctr1$SimpleSearch$RbMediaTypeList" value="1" />
+<input id="dnn_ctr1_SimpleSearch_RbMediaTypeList_2" type="radio" name="dnn$ctr1$SimpleSearch$RbMediaTypeList" value="2" />
+<input type="submit" name="dnn$ctr1$SimpleSearch$BtnSearch" value="Suchen" id="dnn_ctr1_SimpleSearch_BtnSearch" />
+</form>
+</body></html>
+"""
+    error_page = """\
+<!DOCTYPE html>
+<html><head><title>Fehler</title></head><body>
+<div class="dnnFormMessage dnnFormWarning">Der Schulbibliothekskatalog ist momentan nicht erreichbar. Versuchen Sie es zu einem späteren Zeitpunkt erneut.</div>
+</body></html>
+"""
+
+    def log_message(self, format, *args):
+        pass  # keine Ausgabe pro Anfrage
+
+    def count(self, kind: str):
+        with self.server.lock:
+            self.server.stats[kind] = self.server.stats.get(kind, 0) + 1
+
+    def send_page(self, status: int, body: str = "", headers: Optional[dict] = None):
+        payload = body.encode("utf-8")
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    navigator_re = re.compile(r'(_LblDetailNavigator"[^>]*>)\s*\d+\s+von\s+\d+\s*<')
+
+    def do_POST(self):
+        form = parse_qs(self.rfile.read(int(self.headers.get("Content-Length", 0))).decode("utf-8"))
+        branch = next((values[0] for name, values in form.items() if name.endswith("$DdlBranchValue")), None)
+        self.count("suche")
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        searchhash = "OCLC_" + sha1(f"{time.time_ns()}-{random.random()}".encode("ascii")).hexdigest()
+        with self.server.lock:
+            self.server.searches[searchhash] = self.server.branches.get(branch, (0, self.server.source.item_total))
+        self.send_page(302, headers={"Location": f"/Mediensuche/Einfache-Suche?searchhash={searchhash}&top=y"})
+
+    def do_GET(self):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        query = parse_qs(urlparse(self.path).query)
+        if "searchhash" not in query:
+            self.count("formular")
+            branch_options = "".join(f'<option value="{html.escape(branch)}">{html.escape(branch)}</option>' for branch in self.server.branches)
+            return self.send_page(200, self.form_page.format(viewstate=sha1(self.path.encode("utf-8")).hexdigest(), branch_options=branch_options))
+        searchhash = query["searchhash"][0]
+        source = self.server.source
+        with self.server.lock:
+            offset, item_total = self.server.searches.get(searchhash, (0, source.item_total))
+        if "detail" in query:
+            idx = int(query["detail"][0], 10)
+            if not 0 <= idx < item_total:
+                self.count("fehlend")
+                return self.send_page(404, "Not Found")
+            if random.random() < self.server.error_rate:
+                self.count("fehlerseite")
+                return self.send_page(200, self.error_page)
+            self.count("detail")
+            return self.send_page(200, self.navigator_re.sub(rf"\g<1> {idx + 1} von {item_total} <", source.get(offset + idx), count=1))
+        self.count("trefferliste")
+        pagesize = int(query.get("pagesize", ["10"])[0], 10)
+        page = int(query.get("page", ["1"])[0], 10)
+        total_label = f"{item_total} Treffer"
+        entries = []
+        for idx in range((page - 1) * pagesize, min(page * pagesize, item_total)):
+            title, availability = source.get_listing_entry(offset + idx)
+            entries.append(
+                f'<li class="dnnSortable"><a id="dnn_ctr1_MainView_ResultList_Rpt_Item{idx}_LbtnShortDescriptionValue"'
+                f' href="http://{self.headers["Host"]}/Mediensuche/Einfache-Suche?searchhash={searchhash}&amp;top=y&amp;detail={idx}&amp;page={page}">'
+                f"{html.escape(title)}</a>"
+                f' <div class="oclc-availability">{html.escape(availability)}</div></li>'
+            )
+        self.send_page(
+            200,
+            f'<!DOCTYPE html><html><body><span id="dnn_ctr1_MainView_ResultList_TotalItemsLabel">{total_label}</span>'
+            f'<ul>{"".join(entries)}</ul><span id="dnn_ctr1_MainView_ResultListBottom_TotalItemsLabel">{total_label}</span></body></html>',
+        )
+
+
+def make_server(
+    source: PageSource, host: str = "127.0.0.1", port: int = 0, latency: float = 0.0, error_rate: float = 0.0, branches: Optional[list] = None
+) -> ThreadingHTTPServer:
+    """\
+    Erzeugt den Server (ohne ihn zu starten); server.stats zählt die Anfragen je Art, server.server_port ist der genutzte Port.
+
+    Die zusätzlichen Schulbibliotheken (branches) teilen die Treffer unter sich in gleich große, zusammenhängende Teile auf.
+    """
+    server = ThreadingHTTPServer((host, port), SBAStandInHandler)
+    server.daemon_threads = True
+    server.source = source
+    server.branches = {}
+    for number, branch in enumerate(branches or []):
+        start, end = number * source.item_total // len(branches), (number + 1) * source.item_total // len(branches)
+        server.branches[branch] = (start, end - start)
+    server.searches = {}
+    server.latency = latency
+    server.error_rate = error_rate
+    server.lock = threading.Lock()
+    server.stats = {}
+    return server
+
+
+def main(**kwargs):
+    """\
+    Die Hauptfunktion
+    """
+    source = PageSource(kwargs.get("cachedir", None), kwargs.get("cachedb", None), kwargs.get("limit", None))
+    branches = [branch.strip() for branch in (kwargs.get("branches", None) or "").split(",") if branch.strip()]
+    server = make_server(source, kwargs.get("host", "127.0.0.1"), kwargs.get("port", 8080), kwargs.get("latency", 0.0), kwargs.get("error_rate", 0.0), branches)
+    print(f"Liefere {source.item_total} Treffer aus {source.name}", file=sys.stderr)
+    print(f"Suchseite: http://{server.server_address[0]}:{server.server_port}/A-F/Friedrich-Fr%C3%B6bel-Schule", file=sys.stderr)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        print(f"Anfragen: {server.stats!r}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        sys.exit(main(**vars(args)))
+    except KeyboardInterrupt:
+        print("\nSIGINT", file=sys.stderr)
+    except SystemExit:
+        pass
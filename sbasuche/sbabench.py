@@ -0,0 +1,523 @@
+#!/usr/bin/env -S uv run --script --quiet
+# -*- coding: utf-8 -*-
+# vim: set autoindent smartindent softtabstop=4 tabstop=4 shiftwidth=4 expandtab:
+# /// script
+# requires-python = ">=3.12"
+# dependencies = [
+#     "beautifulsoup4>=4.13",
+#     "requests>=2.32",
+#     "isbnlib>=3.10",
+# ]
+# ///
+from __future__ import (
+    print_function,
+    with_statement,
+    unicode_literals,
+    division,
+    absolute_import,
+)
+
+__author__ = "Oliver Schneider"
+__copyright__ = "2024, 2025 Oliver Schneider (assarbad.net), under the terms of the UNLICENSE"
+__version__ = "0.1.0"
+__compatible__ = (
+    (3, 12),
+    (3, 13),
+    (3, 14),
+)
+__doc__ = """
+========================
+ SBA Benchmarks
+========================
+
+Messungen für sbasuche.py, ohne den echten Katalog der SBA zu behelligen.
+
+- crawl: kompletter Lauf von sbasuche.py gegen die lokale Attrappe (sbaattrappe.py) bei verschiedener Parallelität
+- parser: Parsen zwischengespeicherter Detailseiten, aufgeschlüsselt nach Abschnitten, inkl. Speicherbedarf
+- startup: Startzeit der Skripte für kurze Aufrufe (--help, --cache), gemessen per "python -X importtime"
+"""
+import argparse  # noqa: F401
+import json
+import logging
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+
+import sbasuche
+from sbasuche import percentile
+from sbaattrappe import PageSource, make_server
+
+# Checking for compatibility with Python version
+if sys.version_info[:2] not in __compatible__:
+    sys.exit(
+        "Dieses Skript ist nur mit folgenden Pythonversionen kompatibel: %s" % (", ".join(["%d.%d" % (z[0], z[1]) for z in __compatible__]))
+    )  # pragma: no cover
+
+
+def parse_args(args=None):
+    """\
+    Argumente parsen
+    """
+    from argparse import ArgumentParser
+
+    parser = ArgumentParser(description=Path(__file__).name)
+    parser.add_argument(
+        "-o",
+        "--output",
+        dest="outfile",
+        metavar="JSONFILE",
+        type=Path,
+        default=None,
+        help="Schreibe die Ergebnisse zusätzlich als JSON in diese Datei.",
+    )
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    crawl = subparsers.add_parser("crawl", help="Kompletter Lauf von sbasuche.py gegen die lokale Attrappe bei verschiedener Parallelität.")
+    crawl.add_argument(
+        "--cache-dir",
+        dest="cachedir",
+        metavar="VERZEICHNIS",
+        type=Path,
+        default=None,
+        help="Cache-Verzeichnis, aus dem die Attrappe ausliefert (Vorgabe: das jüngste unter cache/).",
+    )
+    crawl.add_argument(
+        "--cache-db",
+        dest="cachedb",
+        metavar="DATEI",
+        type=Path,
+        default=None,
+        help="Seiten-Cache, aus dem die Attrappe ausliefert (statt eines Verzeichnisses).",
+    )
+    crawl.add_argument(
+        "--limit",
+        dest="limit",
+        metavar="N",
+        type=int,
+        default=None,
+        help="Nur die ersten N Treffer abfragen.",
+    )
+    crawl.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        metavar="N[,N...]",
+        default="1,2,4,8",
+        help="Zu messende Anzahl paralleler Worker (Vorgabe: 1,2,4,8).",
+    )
+    crawl.add_argument(
+        "-r",
+        "--rate",
+        dest="rate",
+        type=float,
+        default=1000.0,
+        help="Maximale Anfragen pro Sekunde, die sbasuche.py stellen darf (Vorgabe: 1000).",
+    )
+    crawl.add_argument(
+        "--latency",
+        dest="latency",
+        metavar="SEKUNDEN",
+        type=float,
+        default=0.05,
+        help="Künstliche Verzögerung jeder Antwort der Attrappe in Sekunden (Vorgabe: 0.05).",
+    )
+    crawl.add_argument(
+        "--error-rate",
+        dest="error_rate",
+        metavar="ANTEIL",
+        type=float,
+        default=0.0,
+        help="Anteil (0..1) der Detailseiten, die mit der Fehlerseite des Katalogs beantwortet werden (Vorgabe: 0).",
+    )
+    crawl.add_argument(
+        "--branches",
+        dest="branches",
+        metavar="N",
+        type=int,
+        default=0,
+        help="Teile die Treffer auf N Schulbibliotheken der Attrappe auf und frage sie gleichzeitig ab (sbasuche.py --branch; Vorgabe: 0, also nur die vorausgewählte).",
+    )
+    parse = subparsers.add_parser("parser", help="Parsen zwischengespeicherter Detailseiten, aufgeschlüsselt nach Abschnitten.")
+    parse.add_argument(
+        "--cache-dir",
+        dest="cachedir",
+        metavar="VERZEICHNIS",
+        type=Path,
+        default=None,
+        help="Cache-Verzeichnis mit den Detailseiten (Vorgabe: das jüngste unter cache/).",
+    )
+    parse.add_argument(
+        "--cache-db",
+        dest="cachedb",
+        metavar="DATEI",
+        type=Path,
+        default=None,
+        help="Seiten-Cache mit den Detailseiten (statt eines Verzeichnisses).",
+    )
+    parse.add_argument(
+        "-n",
+        "--limit",
+        dest="limit",
+        metavar="N",
+        type=int,
+        default=500,
+        help="Anzahl der Detailseiten (Vorgabe: 500).",
+    )
+    parse.add_argument(
+        "-p",
+        "--parser",
+        dest="parsers",
+        metavar="NAME[,NAME...]",
+        default=",".join(sbasuche.PARSER_BACKENDS),
+        help=f"Zu messende Parser (Vorgabe: {','.join(sbasuche.PARSER_BACKENDS)}).",
+    )
+    parse.add_argument(
+        "--baseline",
+        dest="baseline",
+        metavar="JSONFILE",
+        type=Path,
+        default=None,
+        help="Vergleiche mit früheren Ergebnissen (per -o gespeichert) und melde Abweichungen.",
+    )
+    startup = subparsers.add_parser("startup", help="Startzeit der Skripte für kurze Aufrufe, gemessen per 'python -X importtime'.")
+    startup.add_argument(
+        "--cache-dir",
+        dest="cachedir",
+        metavar="VERZEICHNIS",
+        type=Path,
+        default=None,
+        help="Cache-Verzeichnis, aus dem die Detailseite für den --cache-Lauf stammt (Vorgabe: das jüngste unter cache/).",
+    )
+    startup.add_argument(
+        "--cache-db",
+        dest="cachedb",
+        metavar="DATEI",
+        type=Path,
+        default=None,
+        help="Seiten-Cache, aus dem die Detailseite für den --cache-Lauf stammt (statt eines Verzeichnisses).",
+    )
+    startup.add_argument(
+        "-n",
+        "--runs",
+        dest="runs",
+        metavar="N",
+        type=int,
+        default=5,
+        help="Anzahl der Läufe je Aufruf, gewertet wird der Median (Vorgabe: 5).",
+    )
+    startup.add_argument(
+        "--budget-ms",
+        dest="budget_ms",
+        metavar="MS",
+        type=float,
+        default=STARTUP_BUDGET_MS,
+        help=f"Zeitbudget je Aufruf in Millisekunden (Median der Laufzeit); bei Überschreitung endet das Skript mit Fehlercode (Vorgabe: {STARTUP_BUDGET_MS:g}).",
+    )
+    return parser.parse_args(args)
+
+
+# Budget für einen kurzen Aufruf, großzügig genug für langsamere Rechner, aber weit unter dem, was die eifrigen Importe kosteten
+STARTUP_BUDGET_MS = 250.0
+# Module, die der jeweilige Aufruf nicht laden darf
+STARTUP_FORBIDDEN = {
+    "sbasuche --help": ("requests", "bs4", "isbnlib", "lxml"),
+    "sbasuche --cache": ("requests", "urllib3"),
+    "bestandslistenabgleich --help": ("rapidfuzz", "numpy"),
+}
+
+
+def reset_logging():
+    """\
+    Entfernt die von sbasuche.main() eingerichteten Log-Handler, damit sich diese bei mehreren Läufen nicht stapeln.
+    """
+    logger = logging.getLogger(str(Path(sbasuche.__file__).resolve()))
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def bench_crawl(**kwargs) -> list:
+    """\
+    Startet die Attrappe und läßt sbasuche.main() für jede angegebene Anzahl Worker einmal komplett dagegen laufen.
+
+    Jeder Lauf nutzt einen frischen, temporären Seiten-Cache, so daß tatsächlich jede Detailseite abgefragt wird. Mit
+    --branches werden die Treffer auf so viele Schulbibliotheken verteilt, die sbasuche.py gleichzeitig abfragt.
+    """
+    source = PageSource(kwargs.get("cachedir", None), kwargs.get("cachedb", None), kwargs.get("limit", None))
+    branches = [f"Zweig-{number + 1}" for number in range(kwargs.get("branches", 0) or 0)]
+    server = make_server(source, latency=kwargs.get("latency", 0.05), error_rate=kwargs.get("error_rate", 0.0), branches=branches)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{server.server_port}/A-F/Friedrich-Fr%C3%B6bel-Schule"
+    print(f"Attrappe: {source.item_total} Treffer aus {source.name} unter {url}", file=sys.stderr)
+    results = []
+    try:
+        for workers in [int(w, 10) for w in kwargs.get("workers", "1").split(",")]:
+            with tempfile.TemporaryDirectory(prefix="sbabench.") as tmpdir:
+                tmpdir = Path(tmpdir)
+                args = sbasuche.parse_args(
+                    [
+                        "--nologo",
+                        "--keep-going",
+                        f"--url={url}",
+                        f"--workers={workers}",
+                        f"--rate={kwargs.get('rate', 1000.0)}",
+                        f"--cache-db={tmpdir / 'seiten.sqlite3'}",
+                        f"--output={tmpdir / 'output.json'}",
+                    ]
+                    + ([f"--branch={','.join(branches)}"] if branches else [])
+                )
+                with server.lock:
+                    before = dict(server.stats)
+                sbasuche.metrics = timer = sbasuche.SBAMetrics()
+                start = time.perf_counter()
+                try:
+                    sbasuche.main(**vars(args))
+                finally:
+                    elapsed = time.perf_counter() - start
+                    sbasuche.metrics = None
+                    reset_logging()
+                with server.lock:
+                    requests = sum(server.stats.get(kind, 0) - before.get(kind, 0) for kind in ("detail", "fehlerseite"))
+                parse_times = timer.durations.get("parsen", [])
+                fetch_times = timer.durations.get("abrufen", [])
+                results.append(
+                    {
+                        "workers": workers,
+                        "branches": len(branches),
+                        "items": source.item_total,
+                        "seconds": elapsed,
+                        "requests": requests,
+                        "requests_per_second": requests / elapsed if elapsed else 0.0,
+                        "parse_seconds": sum(parse_times),
+                        "parse_p50_ms": percentile(parse_times, 50) * 1000,
+                        "fetch_p50_ms": percentile(fetch_times, 50) * 1000,
+                        "fetch_p95_ms": percentile(fetch_times, 95) * 1000,
+                    }
+                )
+    finally:
+        server.shutdown()
+        server.server_close()
+    print(f"{'Worker':>6} {'Dauer/s':>9} {'Anfragen':>9} {'Anfr./s':>9} {'Parsen/s':>9} {'Abruf p50/ms':>13} {'Abruf p95/ms':>13}")
+    for result in results:
+        print(
+            f"{result['workers']:>6} {result['seconds']:>9.2f} {result['requests']:>9} {result['requests_per_second']:>9.1f}"
+            f" {result['parse_seconds']:>9.2f} {result['fetch_p50_ms']:>13.1f} {result['fetch_p95_ms']:>13.1f}"
+        )
+    return results
+
+
+def bench_parser(**kwargs) -> list:
+    """\
+    Parst die Detailseiten mit jedem angegebenen Parser und mißt je Seite:
+
+    - soup: Aufbau der Suppe (BeautifulSoup)
+    - parse: SBABookDetails.__parse(), zusätzlich aufgeschlüsselt nach dessen Abschnitten (parse.<Abschnitt>)
+    - to_json_ready_dict: Umwandlung in ein Dictionary
+    - gesamt: alles zusammen
+
+    Der Speicherbedarf wird in einem zweiten Durchgang (tracemalloc bremst erheblich) als Spitze je Seite ermittelt.
+    """
+    from bs4 import BeautifulSoup
+
+    source = PageSource(kwargs.get("cachedir", None), kwargs.get("cachedb", None), kwargs.get("limit", None))
+    pages = [source.get(idx) for idx in range(source.item_total)]
+    print(f"{len(pages)} Detailseiten aus {source.name}", file=sys.stderr)
+    results = []
+    for backend in kwargs.get("parsers", "index").split(","):
+        book_class, builder = sbasuche.PARSER_BACKENDS[backend]
+        sbasuche.metrics = timer = sbasuche.SBAMetrics()
+        try:
+            for content in pages:
+                start = time.perf_counter()
+                with timer.measure("soup"):
+                    soup = BeautifulSoup(content, builder)
+                with timer.measure("parse"):
+                    details = book_class(soup)
+                with timer.measure("to_json_ready_dict"):
+                    details.to_json_ready_dict()
+                timer.add("gesamt", time.perf_counter() - start)
+        finally:
+            sbasuche.metrics = None
+        peaks = []
+        tracemalloc.start()
+        try:
+            for content in pages:
+                tracemalloc.reset_peak()
+                baseline = tracemalloc.get_traced_memory()[0]
+                book_class(BeautifulSoup(content, builder)).to_json_ready_dict()
+                peaks.append(tracemalloc.get_traced_memory()[1] - baseline)
+            retained = tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        phases = {}
+        for phase, durations in timer.durations.items():
+            phases[phase] = {
+                "count": len(durations),
+                "total_s": sum(durations),
+                "p50_ms": percentile(durations, 50) * 1000,
+                "p95_ms": percentile(durations, 95) * 1000,
+                "p99_ms": percentile(durations, 99) * 1000,
+            }
+        results.append(
+            {
+                "parser": backend,
+                "pages": len(pages),
+                "phases": phases,
+                "peak_kib_p50": percentile(peaks, 50) / 1024,
+                "peak_kib_max": max(peaks, default=0) / 1024,
+                "retained_kib": retained / 1024,
+            }
+        )
+    for result in results:
+        print(
+            f"\n{result['parser']}: {result['pages']} Seiten, Speicherspitze je Seite {result['peak_kib_p50']:.0f} KiB (Median)"
+            f" / {result['peak_kib_max']:.0f} KiB (max), danach belegt {result['retained_kib']:.0f} KiB"
+        )
+        print(f"{'Abschnitt':<28} {'gesamt/s':>9} {'p50/ms':>8} {'p95/ms':>8} {'p99/ms':>8}")
+        for phase, stats in result["phases"].items():
+            print(f"{phase:<28} {stats['total_s']:>9.3f} {stats['p50_ms']:>8.3f} {stats['p95_ms']:>8.3f} {stats['p99_ms']:>8.3f}")
+    baseline = kwargs.get("baseline", None)
+    if baseline is not None:
+        compare_parser_results(json.loads(baseline.read_text())["results"], results)
+    return results
+
+
+def compare_parser_results(previous: list, current: list, tolerance: float = 0.10):
+    """\
+    Vergleicht den Median der Gesamtzeit je Seite und die Speicherspitze mit früheren Ergebnissen.
+
+    Abweichungen über tolerance (relativ) werden als Verschlechterung bzw. Verbesserung gemeldet.
+    """
+    previous = {result["parser"]: result for result in previous}
+    print(f"\n{'Parser':<12} {'Kennzahl':<16} {'vorher':>10} {'jetzt':>10} {'Änderung':>9}")
+    for result in current:
+        old = previous.get(result["parser"])
+        if old is None:
+            continue
+        for label, before, after in (
+            ("gesamt p50/ms", old["phases"]["gesamt"]["p50_ms"], result["phases"]["gesamt"]["p50_ms"]),
+            ("Spitze p50/KiB", old["peak_kib_p50"], result["peak_kib_p50"]),
+        ):
+            change = (after - before) / before if before else 0.0
+            verdict = "schlechter" if change > tolerance else "besser" if change < -tolerance else ""
+            print(f"{result['parser']:<12} {label:<16} {before:>10.2f} {after:>10.2f} {change:>+9.1%} {verdict}".rstrip())
+
+
+def parse_importtime(stderr: str) -> dict:
+    """\
+    Wertet die Ausgabe von "python -X importtime" aus.
+
+    Liefert die Summe der Eigenzeiten aller Importe sowie die kumulierte Zeit je direkt importiertem Modul (in Mikrosekunden).
+    """
+    total, toplevel, modules = 0, {}, set()
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        selftime, cumulative, name = line[len("import time:") :].split("|", 2)
+        if not selftime.strip().isdigit():
+            continue  # Kopfzeile
+        total += int(selftime)
+        module = name.strip()
+        modules.add(module)
+        if len(name) - len(name.lstrip()) == 1:  # direkt importiert (ohne weitere Einrückung)
+            toplevel[module] = int(cumulative)
+    return {"total_us": total, "toplevel": toplevel, "modules": modules}
+
+
+def bench_startup(**kwargs) -> list:
+    """\
+    Startet die Skripte für kurze Aufrufe mehrfach als eigene Prozesse und mißt die Laufzeit sowie die Importzeiten.
+
+    Für den --cache-Lauf wird ein temporärer Seiten-Cache mit genau einer Detailseite angelegt, damit der Start und nicht das Parsen
+    gemessen wird. Ein Aufruf gilt als gescheitert, wenn der Median seiner Laufzeit das Budget überschreitet oder er eines der in
+    STARTUP_FORBIDDEN genannten Module lädt.
+    """
+    source = PageSource(kwargs.get("cachedir", None), kwargs.get("cachedb", None), 1)
+    runs = max(1, kwargs.get("runs", 5))
+    budget_ms = kwargs.get("budget_ms", STARTUP_BUDGET_MS)
+    basepath = Path(__file__).resolve().parent
+    results = []
+    with tempfile.TemporaryDirectory(prefix="sbabench.") as tmpdir:
+        tmpdir = Path(tmpdir)
+        pagestore = sbasuche.SBAPageStore(tmpdir / "seiten.sqlite3")
+        pagestore.put("OCLC_sbabench", 1, 0, source.get(0))
+        pagestore.close()
+        commands = {
+            "sbasuche --help": [basepath / "sbasuche.py", "--help"],
+            "sbasuche --cache": [
+                basepath / "sbasuche.py",
+                "--nologo",
+                "--cache",
+                "--keep-going",
+                f"--cache-db={tmpdir / 'seiten.sqlite3'}",
+                f"--output={tmpdir / 'output.json'}",
+            ],
+            "bestandslistenabgleich --help": [basepath.parent / "bestandslistenabgleich" / "bestandslistenabgleich.py", "--help"],
+        }
+        for name, command in commands.items():
+            walltimes, imports = [], None
+            for _ in range(runs):
+                start = time.perf_counter()
+                proc = subprocess.run([sys.executable, "-X", "importtime", *map(str, command)], capture_output=True, text=True)
+                walltimes.append(time.perf_counter() - start)
+                if proc.returncode != 0:
+                    raise RuntimeError(f"'{name}' endete mit Fehlercode {proc.returncode}:\n{proc.stderr[-2000:]}")
+                imports = parse_importtime(proc.stderr)
+            wall_ms = percentile(walltimes, 50) * 1000
+            forbidden = sorted(module for module in STARTUP_FORBIDDEN.get(name, ()) if module in imports["modules"])
+            top = sorted(imports["toplevel"].items(), key=lambda x: x[1], reverse=True)[:5]
+            results.append(
+                {
+                    "command": name,
+                    "runs": runs,
+                    "wall_ms_p50": wall_ms,
+                    "wall_ms_min": min(walltimes) * 1000,
+                    "import_ms": imports["total_us"] / 1000,
+                    "modules": len(imports["modules"]),
+                    "top_imports_ms": {module: cumulative / 1000 for module, cumulative in top},
+                    "forbidden_imports": forbidden,
+                    "budget_ms": budget_ms,
+                    "ok": wall_ms <= budget_ms and not forbidden,
+                }
+            )
+    print(f"{'Aufruf':<32} {'p50/ms':>8} {'min/ms':>8} {'Importe/ms':>11} {'Module':>7}  Ergebnis")
+    for result in results:
+        verdict = "ok"
+        if result["forbidden_imports"]:
+            verdict = f"lädt {', '.join(result['forbidden_imports'])}"
+        elif not result["ok"]:
+            verdict = f"über Budget ({result['budget_ms']:g} ms)"
+        print(
+            f"{result['command']:<32} {result['wall_ms_p50']:>8.1f} {result['wall_ms_min']:>8.1f} {result['import_ms']:>11.1f}"
+            f" {result['modules']:>7}  {verdict}"
+        )
+        print("    " + ", ".join(f"{module} {cumulative:.1f}" for module, cumulative in result["top_imports_ms"].items()))
+    return results
+
+
+def main(**kwargs):
+    """\
+    Die Hauptfunktion
+    """
+    commands = {
+        "crawl": bench_crawl,
+        "parser": bench_parser,
+        "startup": bench_startup,
+    }
+    results = commands[kwargs.get("command")](**kwargs)
+    outfile = kwargs.get("outfile", None)
+    if outfile is not None:
+        with open(outfile, "w") as json_file:
+            json.dump({"command": kwargs.get("command"), "version": sbasuche.__version__, "results": results}, json_file, indent=4)
+    return 0 if all(result.get("ok", True) for result in results) else 1
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    try:
+        sys.exit(main(**vars(args)))
+    except KeyboardInterrupt:
+        print("\nSIGINT", file=sys.stderr)
@@ -31,22 +31,28 @@ __doc__ = """
 ========================
 """
 import argparse  # noqa: F401
+import heapq
+import html
 import logging
 import json
-import os  # noqa: F401
+import os
 import re
 import sys
 import random
-import requests
+import sqlite3
+import threading
 import time
-from bs4 import BeautifulSoup
-from contextlib import suppress
+import zlib
+from bisect import bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager, nullcontext, suppress
+from dataclasses import dataclass, fields
 from functools import cache
-from isbnlib import is_isbn13, is_isbn10, to_isbn13, canonical  # editions, meta, goom
+from hashlib import sha256
 from pathlib import Path
-from typing import Union, List, Optional
-from urllib.parse import urlparse
-from requests.exceptions import ConnectionError
+from typing import ClassVar, Union, List, Optional
+from urllib.parse import parse_qs, parse_qsl, urlencode, urlparse
 
 # Checking for compatibility with Python version
 if sys.version_info[:2] not in __compatible__:
@@ -55,9 +61,9 @@ if sys.version_info[:2] not in __compatible__:
     )  # pragma: no cover
 
 
-def parse_args():
+def parse_args(args: Optional[List[str]] = None):
     """\
-    Argumente parsen
+    Argumente parsen (args wie sys.argv[1:], siehe sbabench.py)
     """
     from argparse import ArgumentParser
 
@@ -77,6 +83,119 @@ def parse_args():
         const=True,
         help="Unterdrücke erneute Abfrage der Online-Quelle der SBA. Stattdessen wird der Cache bemüht (sofern verfügbar).",
     )
+    parser.add_argument(
+        "--cache-db",
+        dest="cachedb",
+        metavar="DATEI",
+        nargs="?",
+        type=Path,
+        const=Path(__file__).resolve().parent / "cache" / "seiten.sqlite3",
+        help="Nutze statt der Verzeichnisse mit einzelnen HTML-Dateien eine SQLite-Datei als (komprimierten, deduplizierten) Seiten-Cache.",
+        default=None,
+    )
+    parser.add_argument(
+        "--record-cache",
+        dest="recordcache",
+        metavar="DATEI",
+        nargs="?",
+        type=Path,
+        const=Path(__file__).resolve().parent / "cache" / "datensaetze.sqlite3",
+        help="Lege die geparsten Datensätze je Seiteninhalt in einer SQLite-Datei ab, so daß unveränderte Seiten nicht erneut geparst werden müssen.",
+        default=None,
+    )
+    parser.add_argument(
+        "--migrate-cache",
+        action="store_const",
+        dest="migratecache",
+        const=True,
+        help="Übernimm alle vorhandenen Cache-Verzeichnisse in die SQLite-Datei (siehe --cache-db), verwirf mit --record-cache die Datensätze veralteter Parser und beende danach.",
+    )
+    parser.add_argument(
+        "--resume",
+        action="store_const",
+        dest="resume",
+        const=True,
+        help="Setze einen abgebrochenen Lauf anhand des Journals fort: bereits verarbeitete Treffer werden übersprungen, fehlgeschlagene erneut versucht.",
+    )
+    parser.add_argument(
+        "--journal",
+        dest="journal",
+        metavar="DATEI",
+        type=Path,
+        help="Pfad zum Journal der Abfrage (Vorgabe: <Ausgabe>.journal.jsonl neben der Ausgabedatei)",
+        default=None,
+    )
+    parser.add_argument(
+        "-i",
+        "--incremental",
+        action="store_const",
+        dest="incremental",
+        const=True,
+        help="Inkrementelle Aktualisierung: unveränderte Treffer werden aus der vorhandenen Ausgabe übernommen statt neu geparst und das Ergebnis wird mit dieser zusammengeführt.",
+    )
+    parser.add_argument(
+        "--harvest",
+        action="store_const",
+        dest="harvest",
+        const=True,
+        help="Mit --incremental: lies zuerst alle Seiten der Trefferliste (50 Treffer je Anfrage) und lade Detailseiten nur für neue oder geänderte Einträge (verlustbehaftet, siehe README).",
+    )
+    parser.add_argument(
+        "--harvest-max-age",
+        dest="harvest_max_age",
+        metavar="TAGE",
+        type=float,
+        help="Mit --harvest: lade die Detailseite trotz unveränderter Trefferliste, wenn sie zuletzt vor mehr als TAGE Tagen abgefragt wurde (Vorgabe: %(default)s).",
+        default=7.0,
+    )
+    parser.add_argument(
+        "--refresh-form",
+        action="store_const",
+        dest="refresh_form",
+        const=True,
+        help="Ermittle das Suchformular neu, statt das gespeicherte Formularschema (cache/formularschema.json) zu nutzen.",
+    )
+    parser.add_argument(
+        "--shard",
+        dest="shard",
+        metavar="K/N",
+        type=parse_shard,
+        default=None,
+        help="Frage nur jeden N-ten Treffer ab, beginnend beim K-ten (1 <= K <= N); für mehrere Prozesse oder Rechner, siehe --search-info und --merge.",
+    )
+    parser.add_argument(
+        "--search-info",
+        dest="searchinfo",
+        metavar="DATEI",
+        nargs="?",
+        type=Path,
+        const=Path(__file__).resolve().parent / "cache" / "suche.json",
+        help="Teile die Suche (searchhash) über diese Datei mit anderen Läufen: der erste legt sie an, alle weiteren nutzen sie.",
+        default=None,
+    )
+    parser.add_argument(
+        "--branch",
+        dest="branches",
+        metavar="WERT[,WERT...]",
+        help="Durchsuche statt der vorausgewählten diese Schulbibliothek(en) (Werte laut --list-branches, oder 'alle'), gleichzeitig und mit je eigener Ausgabe und eigenem Cache. Ohne -r gilt die Vorgabe-Rate je Schulbibliothek.",
+        default=None,
+    )
+    parser.add_argument(
+        "--list-branches",
+        action="store_const",
+        dest="listbranches",
+        const=True,
+        help="Liste die Schulbibliotheken aus dem Suchformular auf (Wert und Bezeichnung) und beende danach.",
+    )
+    parser.add_argument(
+        "--merge",
+        dest="merge",
+        metavar="DATEI",
+        nargs="+",
+        type=Path,
+        help="Führe die Ausgaben der Shards zu einer Datei (siehe -o) zusammen, prüfe sie auf Vollständigkeit und beende danach.",
+        default=None,
+    )
     parser.add_argument(
         "-k",
         "--keep-going",
@@ -90,10 +209,36 @@ def parse_args():
         "--download-from",
         dest="dlfrom",
         metavar="N",
-        help="Anzahl der Cache-Einträge für welche Treffer angenommen werden sollen; wenn gesetzt wird _nur_ heruntergeladen ohne JSON zu erzeugen!",
+        help="Anzahl der Cache-Einträge für welche Treffer angenommen werden sollen; wenn gesetzt wird _nur_ heruntergeladen ohne JSON zu erzeugen! (veraltet, siehe --resume)",
         type=int,
         default=0,
     )
+    parser.add_argument(
+        "-w",
+        "--workers",
+        dest="workers",
+        metavar="N",
+        help="Anzahl gleichzeitiger Abfragen (Laden, Zwischenspeichern und Parsen überlappen sich dann); mit --cache die Anzahl der Prozesse zum Parsen; Vorgabe: 1",
+        type=int,
+        default=1,
+    )
+    parser.add_argument(
+        "-r",
+        "--rate",
+        dest="rate",
+        metavar="ANFRAGEN",
+        help=f"Obergrenze der Anfragen pro Sekunde an die SBA, über alle Worker hinweg (Vorgabe bei mehr als einem Worker: {DEFAULT_RATE})",
+        type=float,
+        default=None,
+    )
+    parser.add_argument(
+        "-p",
+        "--parser",
+        dest="parser",
+        choices=sorted(PARSER_BACKENDS.keys()),
+        help="Parser für die Detailseiten; 'klassisch' ist der ursprüngliche (langsamere) Parser, 'lxml' benötigt das Paket lxml (Vorgabe: %(default)s)",
+        default="index",
+    )
     parser.add_argument(
         "-u",
         "--url",
@@ -107,8 +252,91 @@ def parse_args():
         "--output",
         dest="outfile",
         metavar="JSONFILE",
-        help="Pfad zu einer JSON-Datei in welche die Ausgabe geschrieben werden soll",
-        default=Path(__file__).resolve().parent / "output.json",
+        type=Path,
+        help="Pfad zu einer JSON-Datei in welche die Ausgabe geschrieben werden soll (Vorgabe: output.json bzw. output.jsonl neben dem Skript)",
+        default=None,
+    )
+    parser.add_argument(
+        "--format",
+        dest="format",
+        choices=["json", "jsonl"],
+        help="Ausgabeformat: 'json' schreibt am Ende ein eingerücktes JSON-Array, 'jsonl' hängt jeden Datensatz sofort als eigene Zeile an (Vorgabe: %(default)s)",
+        default="json",
+    )
+    parser.add_argument(
+        "--fsync-every",
+        dest="fsyncevery",
+        metavar="N",
+        type=int,
+        help="Bei --format jsonl: nach jeweils N Datensätzen wird das Schreiben auf den Datenträger erzwungen (Vorgabe: %(default)s)",
+        default=50,
+    )
+    parser.add_argument(
+        "--convert-jsonl",
+        dest="convertjsonl",
+        metavar="JSONLFILE",
+        type=Path,
+        help="Wandle eine mit --format jsonl erzeugte Datei in ein eingerücktes JSON-Array (siehe -o) um und beende danach.",
+        default=None,
+    )
+    parser.add_argument(
+        "--delta",
+        dest="delta",
+        metavar="DATEI",
+        nargs="?",
+        type=Path,
+        const=True,
+        help="Schreibe die Änderungen gegenüber der vorherigen Ausgabe (neue und entfernte Titel, Exemplare, Status und Rückgabedatum) als JSON Lines in diese Datei (Vorgabe: <Ausgabe>.delta.jsonl).",
+        default=None,
+    )
+    parser.add_argument(
+        "--diff",
+        dest="diff",
+        metavar=("ALT", "NEU"),
+        nargs=2,
+        type=Path,
+        help="Schreibe die Änderungen zwischen zwei vorhandenen Ausgaben (siehe --delta, Vorgabe: neben NEU) und beende danach.",
+        default=None,
+    )
+    parser.add_argument(
+        "--export-sqlite",
+        dest="exportsqlite",
+        metavar="DATEI",
+        type=Path,
+        help="Schreibe die Datensätze zusätzlich in eine SQLite-Datenbank (Tabellen records, copies, isbns, systematics; indiziert nach Titel, ISBN und Systematik).",
+        default=None,
+    )
+    parser.add_argument(
+        "--export-parquet",
+        dest="exportparquet",
+        metavar="DATEI",
+        type=Path,
+        help="Schreibe die Datensätze zusätzlich spaltenweise als Parquet-Datei (benötigt das Paket pyarrow).",
+        default=None,
+    )
+    parser.add_argument(
+        "--export-from",
+        dest="exportfrom",
+        metavar="DATEI",
+        type=Path,
+        help="Exportiere eine vorhandene Ausgabe (JSON, JSON Lines oder SQLite) gemäß --export-sqlite/--export-parquet und beende danach.",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-json",
+        dest="metricsjson",
+        metavar="DATEI",
+        type=Path,
+        help="Schreibe am Ende des Laufs Zähler (Cache-Treffer, abgerufene Bytes, Wiederholungen, ...) und Laufzeiten je Abschnitt als JSON in diese Datei.",
+        default=None,
+    )
+    parser.add_argument(
+        "--metrics-prom",
+        dest="metricsprom",
+        metavar="DATEI",
+        type=Path,
+        help="Wie --metrics-json, aber im Textformat für den textfile collector des Prometheus node_exporter (Dateiendung .prom).",
+        default=None,
     )
     parser.add_argument(
         "-v",
@@ -117,7 +345,7 @@ def parse_args():
         help="Setzen der Ausführlichkeit der Ausgaben (verbosity); kann mehrfach angegeben werden",
         default=0,
     )
-    return parser.parse_args()
+    return parser.parse_args(args)
 
 
 def setup_logging(verbosity: int):
@@ -136,7 +364,7 @@ def setup_logging(verbosity: int):
     logger.setLevel(logging.DEBUG)
 
     conlog = logging.StreamHandler(sys.stderr)
-    filelog = logging.FileHandler(log_filepath)
+    filelog = logging.FileHandler(log_filepath, delay=True)  # Datei erst beim ersten Eintrag öffnen
 
     conloglvl = logging.WARNING
     if verbosity > 1:
@@ -151,23 +379,1220 @@ def setup_logging(verbosity: int):
     conlog.setFormatter(confmt)
     filelog.setFormatter(filefmt)
 
-    logger.addHandler(conlog)
-    logger.addHandler(filelog)
+    logger.addHandler(conlog)
+    logger.addHandler(filelog)
+
+    return logger
+
+
+class ValidationError(ValueError): ...
+
+
+class SBARequestError(RuntimeError): ...
+
+
+class SBALogicError(RuntimeError): ...
+
+
+class SBAUnavailable(RuntimeError): ...
+
+
+DEFAULT_RATE = 2.0  # Anfragen pro Sekunde, sofern parallel abgefragt wird
+SEARCHINFO_MAX_AGE = 6 * 3600  # Sekunden, solange wird eine gemeinsame Suche (--search-info) weiterverwendet
+
+# Zähler und Laufzeiten des Laufs (SBAMetrics), gesetzt per --metrics-json/--metrics-prom oder von sbabench.py (siehe timed(), count())
+metrics = None
+
+# Schlüssel eines Eintrags im Seiten-Cache (SBAPageStore)
+SBACacheKey = namedtuple("SBACacheKey", ["searchhash", "item_total", "idx"])
+# Kurzinformationen zu einem Treffer, wie sie in der Trefferliste stehen (siehe SBASearch.harvest_listing)
+SBAListingEntry = namedtuple("SBAListingEntry", ["idx", "title", "fields", "text", "fingerprint"])
+# Felder bzw. Text eines Eintrags der Trefferliste, die auf Angaben zur Verfügbarkeit der Exemplare hindeuten. Geprüft nur
+# gegen sbaattrappe.py, nicht gegen eine echte Trefferliste des Katalogs (siehe README zu --harvest).
+LISTING_AVAILABILITY_RE = re.compile(r"availab|status|exemplar|verf(?:ü|ue)gbar|entliehen|ausgeliehen|vorgemerkt", re.IGNORECASE)
+
+
+def has_availability(entry: SBAListingEntry) -> bool:
+    """\
+    Ob der Eintrag der Trefferliste Angaben zur Verfügbarkeit enthält. Nur dann deckt sein Fingerabdruck auch Änderungen
+    an den Exemplaren (Status, Rückgabedatum) ab, ansonsten gilt er als unvollständig und die Detailseite wird abgefragt.
+    """
+    if LISTING_AVAILABILITY_RE.search(entry.text):
+        return True
+    return any(LISTING_AVAILABILITY_RE.search(name) for name in entry.fields)
+
+
+class RateLimiter(object):
+    """\
+    Threadsicherer Taktgeber, der die Anfragen aller Worker auf eine globale Rate begrenzt.
+    """
+
+    def __init__(self, rate: float):
+        if rate <= 0:
+            raise ValueError(f"Die Rate muß größer als 0 sein ({rate=}).")
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self) -> float:
+        """\
+        Blockiert bis zum nächsten freien Zeitfenster und gibt die Wartezeit in Sekunden zurück.
+        """
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        delay = slot - now
+        if delay > 0:
+            time.sleep(delay)
+        return delay
+
+
+def percentile(values: list, pct: float) -> float:
+    """\
+    Perzentil (0..100) per linearer Interpolation; 0.0 für eine leere Liste.
+    """
+    if not values:
+        return 0.0
+    values = sorted(values)
+    pos = (len(values) - 1) * pct / 100
+    lower = int(pos)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (pos - lower)
+
+
+class SBAMetrics(object):
+    """\
+    Sammelt Zähler und die Laufzeiten benannter Abschnitte (Sekunden je Aufruf) eines Laufs.
+
+    Am Ende lassen sich beide als JSON-Zusammenfassung oder im Textformat für den textfile collector des Prometheus
+    node_exporter ablegen (siehe write()). Die Laufzeiten werden dort als Histogramm mit den Grenzen aus buckets ausgegeben.
+    """
+
+    buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.durations = {}
+        self.counters = {}
+        self.started = time.time()
+
+    def add(self, phase: str, elapsed: float):
+        with self.lock:
+            self.durations.setdefault(phase, []).append(elapsed)
+
+    def count(self, name: str, n: int = 1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    @contextmanager
+    def measure(self, phase: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(phase, time.perf_counter() - start)
+
+    def summary(self, success: bool) -> dict:
+        with self.lock:
+            durations = {phase: list(values) for phase, values in self.durations.items()}
+            counters = dict(self.counters)
+        return {
+            "version": __version__,
+            "started": self.started,
+            "seconds": time.time() - self.started,
+            "success": success,
+            "counters": dict(sorted(counters.items())),
+            "phases": {
+                phase: {
+                    "count": len(values),
+                    "total_s": sum(values),
+                    "p50_ms": percentile(values, 50) * 1000,
+                    "p95_ms": percentile(values, 95) * 1000,
+                    "max_ms": max(values) * 1000,
+                }
+                for phase, values in sorted(durations.items())
+            },
+        }
+
+    def to_prometheus(self, prefix: str, success: bool) -> str:
+        """\
+        Liefert Zähler und Histogramme im Textformat von Prometheus, alle Namen beginnen mit prefix.
+        """
+        summary = self.summary(success)
+        lines = []
+        for name, value in summary["counters"].items():
+            lines += [f"# TYPE {prefix}_{name}_total counter", f"{prefix}_{name}_total {value}"]
+        lines.append(f"# TYPE {prefix}_abschnitt_dauer_seconds histogram")
+        with self.lock:
+            durations = {phase: sorted(values) for phase, values in self.durations.items()}
+        for phase, values in sorted(durations.items()):
+            for bound in self.buckets:
+                lines.append(f'{prefix}_abschnitt_dauer_seconds_bucket{{abschnitt="{phase}",le="{bound:g}"}} {bisect_right(values, bound)}')
+            lines.append(f'{prefix}_abschnitt_dauer_seconds_bucket{{abschnitt="{phase}",le="+Inf"}} {len(values)}')
+            lines.append(f'{prefix}_abschnitt_dauer_seconds_sum{{abschnitt="{phase}"}} {sum(values):.6f}')
+            lines.append(f'{prefix}_abschnitt_dauer_seconds_count{{abschnitt="{phase}"}} {len(values)}')
+        lines += [
+            f"# TYPE {prefix}_lauf_dauer_seconds gauge",
+            f"{prefix}_lauf_dauer_seconds {summary['seconds']:.3f}",
+            f"# TYPE {prefix}_lauf_erfolgreich gauge",
+            f"{prefix}_lauf_erfolgreich {int(success)}",
+            f"# TYPE {prefix}_lauf_ende_timestamp_seconds gauge",
+            f"{prefix}_lauf_ende_timestamp_seconds {time.time():.0f}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def write(self, json_path: Optional[Path], prom_path: Optional[Path], prefix: str, success: bool):
+        """\
+        Schreibt die JSON-Zusammenfassung und/oder die Datei für Prometheus.
+
+        Letztere wird erst unter einem temporären Namen geschrieben und dann umbenannt, damit der node_exporter nie eine
+        halb geschriebene Datei zu sehen bekommt.
+        """
+        if json_path is not None:
+            with open(json_path, "w") as json_file:
+                json.dump(self.summary(success), json_file, ensure_ascii=False, indent=4)
+        if prom_path is not None:
+            tmp_path = prom_path.with_name(f".{prom_path.name}.{os.getpid()}.tmp")
+            with open(tmp_path, "w") as prom_file:
+                prom_file.write(self.to_prometheus(prefix, success))
+            os.replace(tmp_path, prom_path)
+
+
+def timed(phase: str):
+    """\
+    Kontextmanager, der die Laufzeit des Abschnitts phase erfaßt, sofern metrics gesetzt ist.
+    """
+    return nullcontext() if metrics is None else metrics.measure(phase)
+
+
+def count(name: str, n: int = 1):
+    """\
+    Erhöht den Zähler name um n, sofern metrics gesetzt ist.
+    """
+    if metrics is not None:
+        metrics.count(name, n)
+
+
+def transient_errors() -> tuple:
+    """\
+    Die Ausnahmen, bei denen sich ein erneuter Versuch lohnt (SBAUnavailable, ConnectionError von requests).
+
+    requests wird dafür nicht eigens importiert; solange es nicht geladen ist, kann es auch keine seiner Ausnahmen geben.
+    """
+    requests = sys.modules.get("requests")
+    return (SBAUnavailable,) if requests is None else (SBAUnavailable, requests.exceptions.ConnectionError)
+
+
+class SBARetryScheduler(object):
+    """\
+    Plant Wiederholungsversuche für vorübergehend fehlgeschlagene Abfragen (SBAUnavailable, ConnectionError).
+
+    Die Wartezeit wächst exponentiell (mit Zufallsanteil); während ein Treffer wartet, werden die übrigen weiter geladen
+    (siehe ordered_map). Häufen sich aufeinanderfolgende SBAUnavailable, wird der gesamte Verkehr für eine Weile pausiert
+    (Schutzschalter), statt den ohnehin gestörten Katalog weiter zu belasten.
+    """
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        base_delay: float = 3.5,
+        max_delay: float = 60.0,
+        breaker_threshold: int = 5,
+        breaker_pause: float = 30.0,
+        breaker_max_pause: float = 300.0,
+    ):
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.breaker_threshold = breaker_threshold
+        self.breaker_pause = breaker_pause
+        self.breaker_max_pause = breaker_max_pause
+        self.lock = threading.Lock()
+        self.consecutive_unavailable = 0
+        self.consecutive_trips = 0
+        self.paused_until = 0.0
+        # Statistik für summary()
+        self.retries = 0
+        self.backoff_total = 0.0
+        self.giveups = 0
+        self.trips = 0
+        self.pause_total = 0.0
+
+    @staticmethod
+    def is_retryable(exc: BaseException) -> bool:
+        return isinstance(exc, transient_errors())
+
+    def is_final(self, attempt: int) -> bool:
+        """\
+        Gibt an, ob nach dem (0-basierten) Versuch attempt kein weiterer mehr folgt.
+        """
+        return attempt + 1 >= self.attempts
+
+    def backoff(self, attempt: int) -> float:
+        """\
+        Liefert die Wartezeit in Sekunden vor dem Versuch nach dem (0-basierten) Versuch attempt.
+        """
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt + 1))
+        delay = random.uniform(delay / 2, delay)
+        with self.lock:
+            self.retries += 1
+            self.backoff_total += delay
+        count("wiederholungen")
+        return delay
+
+    def give_up(self):
+        with self.lock:
+            self.giveups += 1
+        count("aufgegeben")
+
+    def record(self, exc: Optional[BaseException]):
+        """\
+        Vermerkt das Ergebnis einer Abfrage (exc ist None bei Erfolg) und löst ggf. den Schutzschalter aus.
+        """
+        with self.lock:
+            if not isinstance(exc, SBAUnavailable):
+                if exc is None:
+                    self.consecutive_unavailable = self.consecutive_trips = 0
+                return
+            self.consecutive_unavailable += 1
+            now = time.monotonic()
+            if self.consecutive_unavailable < self.breaker_threshold or now < self.paused_until:
+                return
+            pause = min(self.breaker_max_pause, self.breaker_pause * 2**self.consecutive_trips)
+            self.paused_until = now + pause
+            self.consecutive_trips += 1
+            self.trips += 1
+            self.pause_total += pause
+        count("schutzschalter")
+        log.warning("Der Katalog ist wiederholt nicht erreichbar (%d Mal in Folge), pausiere %.0f Sekunden.", self.consecutive_unavailable, pause)
+
+    def wait(self) -> float:
+        """\
+        Blockiert, solange der Schutzschalter ausgelöst ist, und gibt die Wartezeit in Sekunden zurück.
+        """
+        with self.lock:
+            delay = self.paused_until - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        return max(delay, 0.0)
+
+    def summary(self):
+        log.log(
+            logging.WARNING if self.retries or self.giveups else logging.INFO,
+            "Wiederholungen: %d (insgesamt %.1f Sekunden Wartezeit), aufgegeben: %d, Pausen durch Schutzschalter: %d (%.0f Sekunden)",
+            self.retries,
+            self.backoff_total,
+            self.giveups,
+            self.trips,
+            self.pause_total,
+        )
+
+
+class JSONLinesWriter(object):
+    """\
+    Schreibt Datensätze zeilenweise (JSON Lines) und erzwingt regelmäßig das Schreiben auf den Datenträger (fsync).
+
+    Bei einem Absturz gehen so höchstens die Datensätze seit dem letzten fsync verloren.
+    """
+
+    def __init__(self, path: Path, fsync_every: int = 50, append: bool = False):
+        self.path = path
+        self.fsync_every = max(1, fsync_every)
+        self.unsynced = 0
+        self.file = open(path, "a" if append else "w")
+
+    def write(self, details: dict):
+        self.file.write(json.dumps(details, allow_nan=False, ensure_ascii=False, sort_keys=True) + "\n")
+        self.unsynced += 1
+        if self.unsynced >= self.fsync_every:
+            self.sync()
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.unsynced = 0
+
+    def close(self):
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+
+def iter_jsonl(path: Path):
+    """\
+    Liest eine JSON-Lines-Datei Datensatz für Datensatz.
+
+    Eine unvollständige letzte Zeile (bspw. nach einem Absturz während des Schreibens) wird mit einer Warnung übersprungen.
+    """
+    with open(path, "r") as jsonl_file:
+        for lineno, line in enumerate(jsonl_file, 1):
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                if line.endswith("\n"):
+                    raise ValidationError(f"Zeile {lineno} in {path} ist kein gültiges JSON.")
+                log.warning("Unvollständige letzte Zeile %d in %s wird ignoriert", lineno, path)
+
+
+def resume_jsonl_output(path: Path, finished: set) -> set:
+    """\
+    Bereinigt die Ausgabe eines abgebrochenen Laufs im Streaming-Betrieb (--format jsonl) für das Fortsetzen: behalten
+    werden nur Datensätze, deren Index laut Journal fertig ist, jeder einmal (eine unvollständige letzte Zeile entfällt).
+
+    Liefert die Indizes der behaltenen Datensätze; alle übrigen müssen erneut abgefragt werden.
+    """
+    kept = set()
+    if not path.exists():
+        return kept
+    tmppath = path.with_name(f"{path.name}.tmp")
+    writer = JSONLinesWriter(tmppath)
+    try:
+        for details in iter_jsonl(path):
+            idx = details.get("match_index", None)
+            if idx in finished and idx not in kept:
+                kept.add(idx)
+                writer.write(details)
+    finally:
+        writer.close()
+    os.replace(tmppath, path)
+    return kept
+
+
+def parse_shard(value: str) -> tuple:
+    """\
+    Wandelt die Angabe K/N (K-ter von N Shards, beginnend bei 1) in das Tupel (K, N) um.
+    """
+    from argparse import ArgumentTypeError
+
+    match = re.fullmatch(r"(\d+)/(\d+)", value.strip())
+    if match is None:
+        raise ArgumentTypeError(f"Shard muß als K/N angegeben werden, nicht {value!r}.")
+    shard, shards = int(match.group(1), 10), int(match.group(2), 10)
+    if not 1 <= shard <= shards:
+        raise ArgumentTypeError(f"Für K/N muß 1 <= K <= N gelten, nicht {value!r}.")
+    return shard, shards
+
+
+def get_branch_slug(branch: str) -> str:
+    """\
+    Macht aus dem Wert einer Schulbibliothek (bspw. 'Friedrich-Fröbel') einen Bestandteil für Datei- und Verzeichnisnamen.
+    """
+    return re.sub(r"[^\w-]+", "_", branch).strip("_") or "_"
+
+
+def get_branch_path(path: Path, branch: Optional[str]) -> Path:
+    """\
+    Fügt die Schulbibliothek in den Dateinamen ein (output.json -> output.Friedrich-Fröbel.json), sofern branch gesetzt ist.
+    """
+    return path if branch is None else path.with_name(f"{path.stem}.{get_branch_slug(branch)}{path.suffix}")
+
+
+def merge_shards(paths: List[Path]) -> list:
+    """\
+    Führt die Ausgaben mehrerer Shards (JSON-Array oder JSON Lines) zu einer nach match_index sortierten Liste zusammen.
+
+    Alle Datensätze müssen dieselbe Trefferzahl (match_total) haben und jeder Index von 0 bis match_total - 1 muß genau einmal
+    vorkommen, sonst wird ein SBALogicError mit den fehlenden bzw. doppelten Indizes geworfen.
+    """
+    by_index, duplicates, totals = {}, set(), {}
+    for path in paths:
+        records = read_output(path)
+        log.info("%d Datensätze aus %s", len(records), path)
+        for details in records:
+            idx, total = details.get("match_index"), details.get("match_total")
+            if idx is None or total is None:
+                raise SBALogicError(f"Datensatz ohne match_index/match_total in {path}: {details.get('title')!r}")
+            totals.setdefault(total, path)
+            if idx in by_index:
+                duplicates.add(idx)
+            by_index[idx] = details
+    if len(totals) != 1:
+        raise SBALogicError(f"Die Shards stammen aus verschiedenen Suchen (Trefferzahlen: {', '.join(f'{t} in {p}' for t, p in totals.items())}).")
+    (item_total,) = totals
+    missing = sorted(set(range(item_total)) - set(by_index))
+    unexpected = sorted(idx for idx in by_index if not 0 <= idx < item_total)
+    if missing or duplicates or unexpected:
+        raise SBALogicError(
+            f"Die Shards ergeben keine vollständige Suche mit {item_total} Treffern: fehlend {missing[:20]!r}{' ...' if len(missing) > 20 else ''}"
+            f" ({len(missing)}), doppelt {sorted(duplicates)[:20]!r} ({len(duplicates)}), außerhalb {unexpected[:20]!r} ({len(unexpected)})"
+        )
+    return [by_index[idx] for idx in range(item_total)]
+
+
+def read_output(path: Path) -> list:
+    """\
+    Liest eine Ausgabedatei dieses Skripts, egal ob JSON-Array, JSON Lines oder SQLite (--export-sqlite).
+    """
+    with open(path, "rb") as output_file:
+        if output_file.read(16) == b"SQLite format 3\x00":
+            return read_sqlite_output(path)
+    with open(path, "r") as json_file:
+        is_array = json_file.read(64).lstrip().startswith("[")
+    if not is_array:
+        # Nach einem fortgesetzten Lauf stehen die Datensätze nicht mehr in der Reihenfolge der Treffer
+        return sorted(iter_jsonl(path), key=lambda x: (x["match_index"] is None, x["match_index"] or 0))
+    with open(path, "r") as json_file:
+        return json.load(json_file)
+
+
+def write_output(path: Path, book_details: list, output_format: str, fsync_every: int = 50):
+    if output_format == "jsonl":
+        writer = JSONLinesWriter(path, fsync_every)
+        for details in book_details:
+            writer.write(details)
+        writer.close()
+        return
+    with open(path, "w") as json_file:
+        json.dump(book_details, json_file, allow_nan=False, ensure_ascii=False, sort_keys=True, indent=4)
+
+
+# Spalten der Exemplartabelle in der SQLite-Ausgabe; weitere (bspw. 'Aktion') landen als JSON in der Spalte extra
+EXPORT_COPY_COLUMNS = {"Schulbibliothek": "schulbibliothek", "Standorte": "standorte", "Status": "status", "Rückgabedatum": "rueckgabedatum"}
+# Listenfelder eines Datensatzes, in der SQLite-Ausgabe als JSON abgelegt (isbn und systematics zusätzlich als eigene Tabellen)
+EXPORT_LIST_FIELDS = ("authors", "isbn", "publisher", "responsibility", "series", "subject_type", "systematics")
+EXPORT_SQLITE_VERSION = 1
+EXPORT_SQLITE_SCHEMA = """\
+    CREATE TABLE records (
+        id INTEGER PRIMARY KEY,
+        match_index INTEGER,
+        match_total INTEGER,
+        match_entry INTEGER,
+        title TEXT NOT NULL,
+        description TEXT,
+        excerpt TEXT,
+        publish_year TEXT,
+        authors TEXT,
+        isbn TEXT,
+        publisher TEXT,
+        responsibility TEXT,
+        series TEXT,
+        subject_type TEXT,
+        systematics TEXT
+    );
+    CREATE TABLE copies (
+        record_id INTEGER NOT NULL REFERENCES records (id),
+        nr INTEGER NOT NULL,
+        schulbibliothek TEXT,
+        standorte TEXT,
+        status TEXT,
+        rueckgabedatum TEXT,
+        extra TEXT,
+        PRIMARY KEY (record_id, nr)
+    );
+    CREATE TABLE isbns (
+        record_id INTEGER NOT NULL REFERENCES records (id),
+        isbn TEXT NOT NULL
+    );
+    CREATE TABLE systematics (
+        record_id INTEGER NOT NULL REFERENCES records (id),
+        systematic TEXT NOT NULL
+    );
+"""
+EXPORT_SQLITE_INDEXES = """\
+    CREATE INDEX records_title ON records (title);
+    CREATE INDEX records_match_index ON records (match_index);
+    CREATE INDEX isbns_isbn ON isbns (isbn);
+    CREATE INDEX isbns_record_id ON isbns (record_id);
+    CREATE INDEX systematics_systematic ON systematics (systematic);
+    CREATE INDEX systematics_record_id ON systematics (record_id);
+"""
+
+
+def export_sqlite(path: Path, book_details: list):
+    """\
+    Schreibt die Datensätze in eine neue SQLite-Datenbank: ein Datensatz je Zeile in records (in der Reihenfolge der Ausgabe),
+    die Exemplare in copies, ISBNs und Systematiken zusätzlich in eigene, indizierte Tabellen.
+
+    Die Datenbank wird erst unter einem temporären Namen erstellt und dann umbenannt, ein Leser sieht also nie einen halben Export.
+    Die Indizes werden erst nach dem Befüllen angelegt, das ist deutlich schneller.
+    """
+    tmppath = path.with_name(f"{path.name}.tmp")
+    tmppath.unlink(missing_ok=True)
+    db = sqlite3.connect(tmppath)
+    try:
+        with db:
+            db.executescript(EXPORT_SQLITE_SCHEMA)
+            db.execute(f"PRAGMA user_version = {EXPORT_SQLITE_VERSION}")
+            for record_id, details in enumerate(book_details):
+                db.execute(
+                    f"INSERT INTO records VALUES ({', '.join('?' * (8 + len(EXPORT_LIST_FIELDS)))})",
+                    (
+                        record_id,
+                        details.get("match_index"),
+                        details.get("match_total"),
+                        details.get("match_entry"),
+                        details["title"],
+                        details.get("description"),
+                        details.get("excerpt"),
+                        details.get("publish_year"),
+                    )
+                    + tuple(None if details.get(field) is None else json.dumps(details[field], ensure_ascii=False) for field in EXPORT_LIST_FIELDS),
+                )
+                for nr, copy in enumerate(details.get("copies") or []):
+                    extra = {key: value for key, value in copy.items() if key not in EXPORT_COPY_COLUMNS}
+                    db.execute(
+                        "INSERT INTO copies VALUES (?, ?, ?, ?, ?, ?, ?)",
+                        (record_id, nr)
+                        + tuple(copy.get(key) for key in EXPORT_COPY_COLUMNS)
+                        + (json.dumps(extra, ensure_ascii=False, sort_keys=True) if extra else None,),
+                    )
+                db.executemany("INSERT INTO isbns VALUES (?, ?)", ((record_id, isbn) for isbn in details.get("isbn") or []))
+                db.executemany("INSERT INTO systematics VALUES (?, ?)", ((record_id, systematic) for systematic in details.get("systematics") or []))
+            db.executescript(EXPORT_SQLITE_INDEXES)
+    finally:
+        db.close()
+    os.replace(tmppath, path)
+
+
+def read_sqlite_output(path: Path) -> list:
+    """\
+    Liest eine mit export_sqlite() geschriebene Datenbank wieder als Liste von Datensätzen ein.
+    """
+    db = sqlite3.connect(f"{path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        (version,) = db.execute("PRAGMA user_version").fetchone()
+        if version != EXPORT_SQLITE_VERSION:
+            raise SBALogicError(f"{path} hat die Schemaversion {version}, erwartet wird {EXPORT_SQLITE_VERSION}.")
+        copies = {}
+        for record_id, _, *values, extra in db.execute("SELECT * FROM copies ORDER BY record_id, nr"):
+            copy = {key: value for key, value in zip(EXPORT_COPY_COLUMNS, values) if value is not None}
+            copy.update(json.loads(extra) if extra else {})
+            copies.setdefault(record_id, []).append(copy)
+        book_details = []
+        for record_id, match_index, match_total, match_entry, title, description, excerpt, publish_year, *lists in db.execute(
+            "SELECT * FROM records ORDER BY id"
+        ):
+            details = {
+                "match_index": match_index,
+                "match_total": match_total,
+                "match_entry": match_entry,
+                "title": title,
+                "description": description,
+                "excerpt": excerpt,
+                "publish_year": publish_year,
+                "copies": copies.get(record_id, []),
+            }
+            details.update((field, None if value is None else json.loads(value)) for field, value in zip(EXPORT_LIST_FIELDS, lists))
+            book_details.append(details)
+        return book_details
+    finally:
+        db.close()
+
+
+def export_parquet(path: Path, book_details: list):
+    """\
+    Schreibt die Datensätze spaltenweise als Parquet-Datei (ein Datensatz je Zeile, copies als Liste von Strukturen).
+
+    Benötigt das Paket pyarrow, welches nicht zu den Abhängigkeiten dieses Skripts gehört (bspw. 'uv run --with pyarrow').
+    """
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        log.error("--export-parquet benötigt das Paket pyarrow, bspw.: uv run --with pyarrow %s ...", Path(__file__).name)
+        raise
+    tmppath = path.with_name(f"{path.name}.tmp")
+    pyarrow.parquet.write_table(pyarrow.Table.from_pylist(book_details), tmppath, compression="zstd")
+    os.replace(tmppath, path)
+
+
+def export_output(book_details: list, options: dict, branch: Optional[str] = None):
+    """\
+    Schreibt die Datensätze zusätzlich in die per --export-sqlite bzw. --export-parquet angegebenen Dateien.
+    """
+    for option, exporter in (("exportsqlite", export_sqlite), ("exportparquet", export_parquet)):
+        if (path := options.get(option, None)) is None:
+            continue
+        path = get_branch_path(path, branch)
+        with timed("export"):
+            exporter(path, book_details)
+        log.info("%d Datensätze nach %s exportiert", len(book_details), path)
+
+
+class SBACrawlJournal(object):
+    """\
+    Journal über den Zustand jedes Treffers einer (online) Abfrage, als JSON Lines fortgeschrieben.
+
+    Die erste Zeile enthält die Trefferzahl der Suche, danach folgt pro Zustandswechsel eines Index eine Zeile mit einem der
+    Zustände 'pending', 'fetched', 'parsed' oder 'failed' (inkl. Grund). Maßgeblich ist jeweils die letzte Zeile zu einem
+    Index. Damit kann ein abgebrochener Lauf mit --resume nahtlos fortgesetzt werden.
+
+    Mit records wird zu 'parsed' auch der Datensatz abgelegt; das braucht es nur, wenn die Ausgabe erst am Ende geschrieben
+    wird. Im Streaming-Betrieb stehen die Datensätze bereits in der Ausgabe. Im Speicher werden in keinem Fall Datensätze
+    gehalten, nur die Indizes der fertigen Treffer und die Gründe der Fehlschläge.
+    """
+
+    states = ("pending", "fetched", "parsed", "failed")
+
+    def __init__(self, path: Path, resume: bool = False, records: bool = True):
+        self.path = path
+        self.lock = threading.Lock()
+        self.item_total = None
+        self.with_records = records
+        self.finished = set()  # Indizes, deren letzter Zustand 'parsed' ist
+        self.reasons = {}  # Index -> Grund des Fehlschlags
+        if resume:
+            if not path.exists():
+                raise SBALogicError(f"Zum Fortsetzen wird ein Journal benötigt, {path} existiert aber nicht.")
+            self.load()
+        self.writer = JSONLinesWriter(path, append=resume)
+
+    def load(self):
+        for entry in iter_jsonl(self.path):
+            if "item_total" in entry:
+                self.item_total = entry["item_total"]
+                continue
+            idx, state = entry["idx"], entry["state"]
+            if state == "parsed":
+                self.finished.add(idx)
+            else:
+                self.finished.discard(idx)
+            if state == "failed":
+                self.reasons[idx] = entry.get("reason")
+            else:
+                self.reasons.pop(idx, None)
+        failed = sorted(self.reasons)
+        log.warning("Journal %s: %d Treffer bereits verarbeitet, %d fehlgeschlagen (%r)", self.path, len(self.finished), len(failed), failed)
+
+    def read_records(self) -> dict:
+        """\
+        Liest die im Journal abgelegten Datensätze der fertigen Treffer (Index -> Datensatz), nur zum Fortsetzen.
+        """
+        records = {}
+        for entry in iter_jsonl(self.path):
+            if entry.get("idx", None) in self.finished and "record" in entry:
+                records[entry["idx"]] = entry["record"]
+        return records
+
+    def start(self, item_total: int):
+        """\
+        Vermerkt die Trefferzahl der Suche; beim Fortsetzen muß diese mit jener des abgebrochenen Laufs übereinstimmen.
+        """
+        if self.item_total is None:
+            self.item_total = item_total
+            with self.lock:
+                self.writer.write({"item_total": item_total, "started": time.time()})
+                self.writer.file.flush()
+        elif self.item_total != item_total:
+            raise SBALogicError(
+                f"Die Trefferzahl ({item_total}) weicht von jener im Journal ({self.item_total}) ab; der Katalog hat sich geändert, ein Fortsetzen ist nicht möglich."
+            )
+
+    def record(self, idx: int, state: str, reason: Optional[str] = None, details: Optional[dict] = None):
+        assert state in self.states, f"Unbekannter Zustand {state!r}"
+        entry = {"idx": idx, "state": state}
+        if reason is not None:
+            entry["reason"] = reason
+        if details is not None and self.with_records:
+            entry["record"] = details
+        with self.lock:
+            if state == "parsed":
+                self.finished.add(idx)
+            else:
+                self.finished.discard(idx)
+            if state == "failed":
+                self.reasons[idx] = reason
+            else:
+                self.reasons.pop(idx, None)
+            self.writer.write(entry)
+            self.writer.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.writer.close()
+
+
+def get_record_key(details: dict) -> str:
+    """\
+    Liefert einen von der Trefferposition unabhängigen Schlüssel für einen Datensatz (ISBN und Titel).
+    """
+    isbn = details["isbn"][0] if details["isbn"] else ""
+    return f"{isbn}|{details['title'].strip()}"
+
+
+def get_record_keys(book_details: list) -> list:
+    """\
+    Liefert eindeutige Schlüssel für eine Liste von Datensätzen (in deren Reihenfolge).
+
+    Teilen sich mehrere Datensätze ISBN und Titel (bspw. verschiedene Auflagen), bekommen alle ab dem zweiten eine
+    fortlaufende Nummer angehängt ('#2', '#3', ...).
+    """
+    seen = {}
+    keys = []
+    for details in book_details:
+        key = get_record_key(details)
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+def get_copy_keys(copies: list) -> list:
+    """\
+    Liefert eindeutige Schlüssel für die Exemplare eines Datensatzes (Schulbibliothek und Standort, bei Gleichheit fortlaufend nummeriert).
+    """
+    seen = {}
+    keys = []
+    for copy in copies:
+        key = f"{copy.get('Schulbibliothek', '')}|{copy.get('Standorte', '')}"
+        seen[key] = seen.get(key, 0) + 1
+        keys.append(key if seen[key] == 1 else f"{key}#{seen[key]}")
+    return keys
+
+
+# Felder, die nur die Position in der Trefferliste beschreiben und daher nicht als Änderung eines Datensatzes gelten
+DELTA_IGNORED_FIELDS = {"match_index", "match_entry", "match_total", "copies"}
+
+
+def get_comparable(value):
+    # Frisch geparste Datensätze enthalten Tupel, aus JSON gelesene Listen
+    return list(value) if isinstance(value, tuple) else value
+
+
+def diff_records(previous: list, current: list, skipped: Optional[set] = None) -> tuple:
+    """\
+    Vergleicht zwei Ausgaben anhand der Datensatzschlüssel (siehe get_record_keys) und liefert die Änderungen samt Zusammenfassung.
+
+    Je geändertem Datensatz gibt es einen Eintrag mit change 'added' (inkl. Datensatz), 'removed' oder 'changed'. Letzterer
+    enthält die geänderten Felder als [alt, neu] sowie hinzugekommene, weggefallene und geänderte Exemplare (siehe
+    get_copy_keys), bei letzteren die geänderten Spalten (bspw. Status und Rückgabedatum) als [alt, neu]. Eine bloße
+    Verschiebung in der Trefferliste gilt nicht als Änderung. Der Aufwand ist linear in der Zahl der Datensätze.
+
+    skipped sind die Indizes der Treffer, die in diesem Lauf übersprungen wurden (--keep-going). Fehlt ein vorheriger
+    Datensatz an einer dieser Positionen, ist unbekannt ob er entfernt wurde; er bekommt daher change 'skipped' statt 'removed'.
+    """
+    skipped = skipped or set()
+    previous_by_key = dict(zip(get_record_keys(previous), previous))
+    current_keys = get_record_keys(current)
+    summary = dict.fromkeys(("added", "removed", "skipped", "changed", "copies_added", "copies_removed", "copies_changed"), 0)
+    entries = []
+    for key, details in zip(current_keys, current):
+        old = previous_by_key.get(key)
+        if old is None:
+            entries.append({"key": key, "change": "added", "match_index": details.get("match_index"), "record": details})
+            summary["added"] += 1
+            summary["copies_added"] += len(details.get("copies") or [])
+            continue
+        entry = {"key": key, "change": "changed", "match_index": details.get("match_index")}
+        fields = {
+            field: [old.get(field), details.get(field)]
+            for field in sorted(set(old) | set(details))
+            if field not in DELTA_IGNORED_FIELDS and get_comparable(old.get(field)) != get_comparable(details.get(field))
+        }
+        if fields:
+            entry["fields"] = fields
+        old_copies = dict(zip(get_copy_keys(old.get("copies") or []), old.get("copies") or []))
+        new_copies = dict(zip(get_copy_keys(details.get("copies") or []), details.get("copies") or []))
+        added = [copy for copy_key, copy in new_copies.items() if copy_key not in old_copies]
+        removed = [copy for copy_key, copy in old_copies.items() if copy_key not in new_copies]
+        changed = []
+        for copy_key, copy in new_copies.items():
+            old_copy = old_copies.get(copy_key)
+            if old_copy is None or old_copy == copy:
+                continue
+            columns = {
+                column: [old_copy.get(column), copy.get(column)] for column in sorted(set(old_copy) | set(copy)) if old_copy.get(column) != copy.get(column)
+            }
+            changed.append({"copy_key": copy_key, **columns})
+        for name, copies in (("copies_added", added), ("copies_removed", removed), ("copies_changed", changed)):
+            if copies:
+                entry[name] = copies
+                summary[name] += len(copies)
+        if len(entry) > 3:  # mehr als Schlüssel, Art und Position
+            entries.append(entry)
+            summary["changed"] += 1
+    current_key_set = set(current_keys)
+    for key, old in previous_by_key.items():
+        if key in current_key_set:
+            continue
+        if old.get("match_index") in skipped:
+            entries.append({"key": key, "change": "skipped", "match_index": old.get("match_index"), "title": old.get("title")})
+            summary["skipped"] += 1
+            continue
+        entries.append({"key": key, "change": "removed", "match_index": old.get("match_index"), "title": old.get("title")})
+        summary["removed"] += 1
+        summary["copies_removed"] += len(old.get("copies") or [])
+    return entries, summary
+
+
+def get_delta_path(outfile: Path) -> Path:
+    return outfile.with_name(f"{outfile.stem}.delta.jsonl")
+
+
+def write_delta(path: Path, previous: list, current: list, source: Optional[Path] = None, skipped: Optional[set] = None):
+    """\
+    Schreibt die Änderungen zwischen zwei Ausgaben (siehe diff_records) als JSON Lines; die erste Zeile enthält die
+    Zusammenfassung. Die Datei wird erst unter einem temporären Namen geschrieben und dann umbenannt.
+    """
+    with timed("delta"):
+        entries, summary = diff_records(previous, current, skipped)
+        tmppath = path.with_name(f"{path.name}.tmp")
+        writer = JSONLinesWriter(tmppath, fsync_every=len(entries) + 1)
+        writer.write(
+            {
+                "version": 1,
+                "created": time.time(),
+                "previous": None if source is None else str(source),
+                "previous_total": len(previous),
+                "current_total": len(current),
+                "summary": summary,
+            }
+        )
+        for entry in entries:
+            writer.write(entry)
+        writer.close()
+        os.replace(tmppath, path)
+    log.warning(
+        "Änderungen nach %s: %d neu, %d entfernt, %d übersprungen, %d geändert; Exemplare: %d neu, %d weggefallen, %d geändert",
+        path,
+        summary["added"],
+        summary["removed"],
+        summary["skipped"],
+        summary["changed"],
+        summary["copies_added"],
+        summary["copies_removed"],
+        summary["copies_changed"],
+    )
+    return summary
+
+
+HIDDEN_INPUT_RE = re.compile(r"<input\b[^>]*\btype=\"hidden\"[^>]*>", re.IGNORECASE)
+SEARCHHASH_RE = re.compile(r"searchhash=OCLC_[0-9a-fA-F]+")
+# Position des Treffers ("N von M") und Links zu anderen Treffern; ändern sich mit jedem Titel, der hinzukommt oder wegfällt
+NAVIGATOR_RE = re.compile(r"(_LblDetailNavigator\"[^>]*>)[^<]*<")
+POSITION_PARAM_RE = re.compile(r"([?&](?:amp;)?(?:detail|page)=)\d+")
+
+
+def get_record_hash(content: str) -> str:
+    """\
+    Hash über den Inhalt einer Detailseite, ohne jene Teile die sich mit jeder Anfrage bzw. Suche ändern
+    (versteckte Formularfelder wie __VIEWSTATE und den searchhash in Links). Diese fließen nicht in den Datensatz ein.
+
+    Ebenso ohne die Position des Treffers (Navigator "N von M" sowie detail= und page= in Links), sonst änderte sich mit
+    jedem hinzugekommenen oder entfernten Titel der Hash jeder Seite. Die Position wird bei einem Treffer neu gesetzt.
+    """
+    content = HIDDEN_INPUT_RE.sub("", content)
+    content = SEARCHHASH_RE.sub("searchhash=", content)
+    content = NAVIGATOR_RE.sub(r"\g<1><", content)
+    content = POSITION_PARAM_RE.sub(r"\g<1>", content)
+    return sha256(content.encode("utf-8")).hexdigest()
+
+
+class SBAIncrementalState(object):
+    """\
+    Stand des letzten Laufs für die inkrementelle Aktualisierung.
+
+    Neben der Ausgabedatei wird eine Zustandsdatei (<Ausgabe>.state.json) gepflegt, die jedem Datensatzschlüssel
+    (siehe get_record_keys) den Hash der Detailseite zuordnet, aus der er geparst wurde (siehe get_record_hash).
+    Liefert eine Detailseite einen bekannten Hash, wird der vorhandene Datensatz übernommen, ohne die Seite zu parsen.
+
+    Zusätzlich wird der Fingerabdruck des Eintrags in der Trefferliste vermerkt (siehe --harvest). Ist dieser unverändert,
+    wird der vorhandene Datensatz übernommen, ohne die Detailseite überhaupt abzufragen, sofern diese zuletzt vor weniger
+    als max_age Sekunden abgefragt wurde (Zeitpunkt je Datensatzschlüssel in der Zustandsdatei).
+    """
+
+    version = 1
+
+    def __init__(self, outfile: Path, max_age: Optional[float] = None):
+        self.outfile = Path(outfile)
+        self.max_age = max_age
+        self.started = time.time()
+        self.path = self.outfile.with_name(f"{self.outfile.stem}.state.json")
+        self.lock = threading.Lock()
+        self.previous = {}  # Schlüssel -> Datensatz
+        self.previous_hashes = {}  # Schlüssel -> Hash
+        self.by_hash = {}  # Hash -> Datensatz
+        self.hashes = {}  # Index -> Hash (dieser Lauf)
+        self.previous_listings = {}  # Schlüssel -> Fingerabdruck in der Trefferliste
+        self.by_listing = {}  # Fingerabdruck in der Trefferliste -> Schlüssel
+        self.listings = {}  # Index -> Fingerabdruck in der Trefferliste (dieser Lauf)
+        self.previous_fetched = {}  # Schlüssel -> Zeitpunkt der letzten Abfrage der Detailseite
+        self.from_listing = {}  # Index -> Schlüssel der ohne Abfrage übernommenen Datensätze (dieser Lauf)
+        self.reused = 0
+        self.skipped = 0
+        if not self.path.exists() or not self.outfile.exists():
+            log.info("Kein vorheriger Stand für die inkrementelle Aktualisierung gefunden (%s)", self.path)
+            return
+        with open(self.path, "r") as state_file:
+            state = json.load(state_file)
+        if state.get("version") != self.version:
+            log.warning("Zustandsdatei %s hat eine unbekannte Version (%r) und wird ignoriert", self.path, state.get("version"))
+            return
+        previous = read_output(self.outfile)
+        self.previous = dict(zip(get_record_keys(previous), previous))
+        self.previous_hashes = {key: record_hash for key, record_hash in state["records"].items() if key in self.previous}
+        self.by_hash = {record_hash: self.previous[key] for key, record_hash in self.previous_hashes.items()}
+        self.previous_listings = {key: fingerprint for key, fingerprint in state.get("listings", {}).items() if key in self.previous}
+        # Ältere Zustandsdateien kennen keine Zeitpunkte, deren Datensätze gelten als zu alt
+        self.previous_fetched = {key: fetched for key, fetched in state.get("fetched", {}).items() if key in self.previous}
+        ambiguous = set()
+        for key, fingerprint in self.previous_listings.items():
+            if fingerprint in self.by_listing:
+                ambiguous.add(fingerprint)  # mehrdeutig, die Detailseite muß in jedem Fall abgefragt werden
+            self.by_listing[fingerprint] = key
+        for fingerprint in ambiguous:
+            del self.by_listing[fingerprint]
+        log.info("Vorheriger Stand: %d Datensätze, davon %d mit bekanntem Hash", len(self.previous), len(self.by_hash))
+
+    def set_listing(self, listing: dict):
+        """\
+        Übernimmt die Einträge der Trefferliste (Index -> SBAListingEntry) dieses Laufs, soweit sie Angaben zur Verfügbarkeit
+        enthalten (siehe has_availability).
+        """
+        complete = {idx: entry for idx, entry in listing.items() if has_availability(entry)}
+        if len(complete) < len(listing):
+            log.warning("%d Einträge der Trefferliste ohne Angaben zur Verfügbarkeit, deren Detailseiten werden abgefragt.", len(listing) - len(complete))
+        counts = {}
+        for entry in complete.values():
+            counts[entry.fingerprint] = counts.get(entry.fingerprint, 0) + 1
+        self.listings = {idx: entry.fingerprint for idx, entry in complete.items() if counts[entry.fingerprint] == 1}
+
+    def lookup_listing(self, idx: int, item_total: int) -> Optional[dict]:
+        """\
+        Liefert den vorhandenen Datensatz (mit angepaßter Position), sofern der Eintrag in der Trefferliste unverändert ist.
+        """
+        key = self.by_listing.get(self.listings.get(idx))
+        if key is None:
+            return None
+        fetched = self.previous_fetched.get(key)
+        if fetched is None or (self.max_age is not None and self.started - fetched > self.max_age):
+            return None
+        details = dict(self.previous[key], match_index=idx, match_entry=idx + 1, match_total=item_total)
+        with self.lock:
+            if key in self.previous_hashes:
+                self.hashes[idx] = self.previous_hashes[key]
+            self.from_listing[idx] = key
+            self.skipped += 1
+        return details
+
+    def lookup(self, idx: int, record_hash: str) -> Optional[dict]:
+        """\
+        Merkt sich den Hash zum Index und liefert den vorhandenen Datensatz, sofern der Hash bekannt ist.
+        """
+        details = self.by_hash.get(record_hash)
+        with self.lock:
+            self.hashes[idx] = record_hash
+            if details is not None:
+                self.reused += 1
+        return details
+
+    def merge(self, book_details: list, complete: bool) -> list:
+        """\
+        Führt die Datensätze dieses Laufs mit jenen des vorherigen zusammen.
+
+        Nur wenn dieser Lauf vollständig war, werden Datensätze entfernt, die nicht mehr im Katalog auftauchen.
+        """
+        current = dict(zip(get_record_keys(book_details), book_details))
+        merged = dict(current) if complete else {**self.previous, **current}
+        added = sum(1 for key in current if key not in self.previous)
+        removed = sum(1 for key in self.previous if key not in merged)
+        log.warning(
+            "Inkrementell: %d Datensätze ohne Abfrage übernommen, %d unverändert übernommen, %d geparst (davon %d neu), %d entfernt",
+            self.skipped,
+            self.reused,
+            len(current) - self.reused - self.skipped,
+            added,
+            removed,
+        )
+        if not complete:
+            log.warning("Der Lauf war unvollständig, Datensätze aus dem vorherigen Stand wurden daher nicht entfernt.")
+        return sorted(merged.values(), key=lambda x: (x["match_index"] is None, x["match_index"] or 0))
+
+    def save(self, book_details: list, merged: list):
+        """\
+        Schreibt die Zustandsdatei passend zur (zusammengeführten) Ausgabe.
+        """
+        current = {id(details) for details in book_details}
+        records, listings, fetched = {}, {}, {}
+        for key, details in zip(get_record_keys(merged), merged):
+            if id(details) in current:
+                record_hash = self.hashes.get(details["match_index"])
+                fingerprint = self.listings.get(details["match_index"])
+                if details["match_index"] in self.from_listing:
+                    fetched_at = self.previous_fetched.get(self.from_listing[details["match_index"]])
+                else:
+                    fetched_at = self.started
+            else:
+                record_hash = self.previous_hashes.get(key)
+                fingerprint = self.previous_listings.get(key)
+                fetched_at = self.previous_fetched.get(key)
+            if record_hash is not None:
+                records[key] = record_hash
+            if fingerprint is not None:
+                listings[key] = fingerprint
+            if fetched_at is not None:
+                fetched[key] = fetched_at
+        with open(self.path, "w") as state_file:
+            json.dump({"version": self.version, "records": records, "listings": listings, "fetched": fetched}, state_file, ensure_ascii=False, indent=1)
+
+
+class SBAPageStore(object):
+    """\
+    Seiten-Cache in einer einzelnen SQLite-Datei.
+
+    Die Seiteninhalte werden zlib-komprimiert unter ihrem SHA-256-Hash abgelegt, so daß identische Seiten aus verschiedenen
+    Suchen (searchhash) nur einmal gespeichert werden. Welcher Treffer einer Suche zu welchem Inhalt gehört, steht in einer
+    eigenen Tabelle.
+    """
+
+    __schema = """\
+        CREATE TABLE IF NOT EXISTS pages (
+            hash TEXT PRIMARY KEY,
+            content BLOB NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS searches (
+            searchhash TEXT NOT NULL,
+            item_total INTEGER NOT NULL,
+            created REAL NOT NULL,
+            PRIMARY KEY (searchhash, item_total)
+        );
+        CREATE TABLE IF NOT EXISTS entries (
+            searchhash TEXT NOT NULL,
+            item_total INTEGER NOT NULL,
+            idx INTEGER NOT NULL,
+            hash TEXT NOT NULL REFERENCES pages (hash),
+            PRIMARY KEY (searchhash, item_total, idx)
+        );
+        CREATE INDEX IF NOT EXISTS entries_hash ON entries (hash);
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(self.__schema)
+
+    @staticmethod
+    def content_hash(content: str) -> str:
+        return sha256(content.encode("utf-8")).hexdigest()
+
+    def get(self, searchhash: str, item_total: int, idx: int) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute(
+                "SELECT pages.content FROM entries JOIN pages ON pages.hash = entries.hash WHERE searchhash = ? AND item_total = ? AND idx = ?",
+                (searchhash, item_total, idx),
+            ).fetchone()
+        return None if row is None else zlib.decompress(row[0]).decode("utf-8")
+
+    def put(self, searchhash: str, item_total: int, idx: int, content: str, created: Optional[float] = None) -> str:
+        """\
+        Legt den Inhalt für einen Treffer ab und gibt dessen Hash zurück. Bereits bekannte Inhalte werden nicht erneut gespeichert.
+        """
+        content_hash = self.content_hash(content)
+        with self.lock, self.db:
+            if self.db.execute("SELECT 1 FROM pages WHERE hash = ?", (content_hash,)).fetchone() is None:
+                self.db.execute("INSERT INTO pages (hash, content) VALUES (?, ?)", (content_hash, zlib.compress(content.encode("utf-8"))))
+            self.db.execute(
+                "INSERT OR IGNORE INTO searches (searchhash, item_total, created) VALUES (?, ?, ?)",
+                (searchhash, item_total, time.time() if created is None else created),
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO entries (searchhash, item_total, idx, hash) VALUES (?, ?, ?, ?)", (searchhash, item_total, idx, content_hash)
+            )
+        return content_hash
+
+    def discard(self, searchhash: str, item_total: int, idx: int):
+        """\
+        Entfernt den Eintrag zu einem Treffer; der Inhalt selbst wird gelöscht, sobald keine Suche mehr darauf verweist.
+        """
+        with self.lock, self.db:
+            row = self.db.execute("SELECT hash FROM entries WHERE searchhash = ? AND item_total = ? AND idx = ?", (searchhash, item_total, idx)).fetchone()
+            if row is None:
+                return
+            self.db.execute("DELETE FROM entries WHERE searchhash = ? AND item_total = ? AND idx = ?", (searchhash, item_total, idx))
+            self.db.execute("DELETE FROM pages WHERE hash = ? AND NOT EXISTS (SELECT 1 FROM entries WHERE hash = ?)", (row[0], row[0]))
+
+    def newest_complete_search(self) -> Optional[SBACacheKey]:
+        """\
+        Ermittelt die jüngste Suche, für die alle Treffer im Cache liegen (idx ist dann None).
+        """
+        with self.lock:
+            row = self.db.execute(
+                """\
+                SELECT searches.searchhash, searches.item_total FROM searches
+                WHERE (SELECT COUNT(*) FROM entries WHERE entries.searchhash = searches.searchhash AND entries.item_total = searches.item_total
+                       AND entries.idx >= 0 AND entries.idx < searches.item_total) = searches.item_total
+                ORDER BY searches.created DESC LIMIT 1
+                """
+            ).fetchone()
+        return None if row is None else SBACacheKey(row[0], row[1], None)
+
+    def import_directory(self, cache_dir: Path) -> int:
+        """\
+        Übernimmt ein Cache-Verzeichnis (OCLC_<searchhash>.<item_total>) mit seinen detail_NNNN.html-Dateien.
+        """
+        searchhash, _, item_total = cache_dir.name.rpartition(".")
+        if not searchhash.startswith("OCLC_") or not item_total.isdigit():
+            raise SBALogicError(f"Der Verzeichnisname entspricht nicht dem Schema 'OCLC_<searchhash>.<Trefferzahl>': {cache_dir}")
+        created = cache_dir.stat().st_mtime
+        imported = 0
+        for cache_file in sorted(cache_dir.glob("detail_????.html")):
+            idx = int(cache_file.stem.split("_")[1], 10)
+            with open(cache_file, "r") as f:
+                self.put(searchhash, int(item_total, 10), idx, f.read(), created)
+            imported += 1
+        return imported
+
+    def close(self):
+        with self.lock:
+            self.db.close()
 
-    logger.debug("Logging initialisiert")
-    return logger
 
+class SBARecordCache(object):
+    """\
+    Cache für geparste Datensätze (to_json_ready_dict), abgelegt je Hash des Seiteninhalts (siehe get_record_hash).
 
-class ValidationError(ValueError): ...
+    Jeder Eintrag trägt den Fingerabdruck des Parsers (siehe get_parser_fingerprint) und wird nur für diesen genutzt, so daß
+    eine Änderung am Parser oder an den Titelkorrekturen nie zu veralteten Datensätzen führt. Einträge mit einem anderen
+    Fingerabdruck bleiben erhalten (etwa für den Wechsel zwischen zwei Versionen) und werden erst mit purge() verworfen.
+    """
 
+    __schema = """\
+        CREATE TABLE IF NOT EXISTS records (
+            hash TEXT NOT NULL,
+            fingerprint TEXT NOT NULL,
+            record TEXT NOT NULL,
+            PRIMARY KEY (hash, fingerprint)
+        );
+    """
 
-class SBARequestError(RuntimeError): ...
+    def __init__(self, path: Path):
+        self.path = path
+        self.fingerprint = get_parser_fingerprint()
+        self.lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        with self.lock, self.db:
+            self.db.execute("PRAGMA journal_mode=WAL")
+            self.db.executescript(self.__schema)
 
+    def get(self, record_hash: str) -> Optional[dict]:
+        with self.lock:
+            row = self.db.execute("SELECT record FROM records WHERE hash = ? AND fingerprint = ?", (record_hash, self.fingerprint)).fetchone()
+        return None if row is None else json.loads(row[0])
 
-class SBALogicError(RuntimeError): ...
+    def put(self, record_hash: str, details: dict):
+        record = json.dumps(details, allow_nan=False, ensure_ascii=False, sort_keys=True)
+        with self.lock, self.db:
+            self.db.execute("INSERT OR REPLACE INTO records (hash, fingerprint, record) VALUES (?, ?, ?)", (record_hash, self.fingerprint, record))
 
+    def purge(self) -> int:
+        """\
+        Verwirft alle Datensätze mit einem anderen als dem aktuellen Parser-Fingerabdruck.
+        """
+        with self.lock, self.db:
+            stale = self.db.execute("DELETE FROM records WHERE fingerprint != ?", (self.fingerprint,)).rowcount
+        log.warning("%d veraltete Datensätze aus %s verworfen (Parser-Fingerabdruck %s)", stale, self.path, self.fingerprint)
+        return stale
 
-class SBAUnavailable(RuntimeError): ...
+    def close(self):
+        with self.lock:
+            self.db.close()
 
 
 class SBASearch(object):
@@ -211,18 +1636,57 @@ class SBASearch(object):
     __branch_default_value = "Friedrich-Fröbel"
     __mediatype_default_value = 2  # 0 == alle, 1 == E-Medien, 2 == phys. Medien
     __searchuri_default_value = "/A-F/Friedrich-Fr%C3%B6bel-Schule"  # "/Mediensuche/Erweiterte-Suche" # "/Mediensuche/Einfache-Suche"
+    __listing_pagesize = "50"
+    __form_schema_version = 2
 
-    def __init__(self, url: str, cache: bool):
+    def __init__(
+        self,
+        url: str,
+        cache: bool,
+        workers: int = 1,
+        ratelimiter: Optional[RateLimiter] = None,
+        pagestore: Optional[SBAPageStore] = None,
+        harvest: bool = False,
+        refresh_form: bool = False,
+        searchinfo: Optional[Path] = None,
+        branch: Optional[str] = None,
+        adapter=None,
+    ):
         """\
         Initialisierer für unsere Hilfsklasse zur SBA-Suche.
 
         Hier werden u.a. bestimmte Annahmen überprüft und auch Elemente ermittelt, deren Inhalte irgendwie für die weiteren Abfragen relevant sind.
+        Ist ein ratelimiter gesetzt, ersetzt dieser die zufällige Verzögerung nach jedem Cache-Fehlschlag.
+        Ist ein pagestore gesetzt, wird dieser anstelle der Cache-Verzeichnisse genutzt.
+        Ist harvest gesetzt, werden beim Abfragen der Treffer alle Seiten der Trefferliste ausgelesen (siehe self.listing).
+        Ist refresh_form gesetzt, wird das Suchformular neu ermittelt, statt das gespeicherte Formularschema zu nutzen.
+        Ist searchinfo gesetzt, teilen sich alle Läufe (bspw. die Shards, siehe --shard) über diese Datei eine Suche (siehe items()).
+        Ist branch gesetzt, wird statt der vorausgewählten diese Schulbibliothek durchsucht, mit eigenem Cache-Verzeichnis
+        (siehe get_cache_basepath). Ist adapter gesetzt (ein requests.adapters.HTTPAdapter), teilen sich alle SBASearch-Instanzen
+        damit einen Verbindungspool, behalten aber ihre eigenen Cookies.
         """
         self.cache = cache
+        self.ratelimiter = ratelimiter
+        self.pagestore = pagestore
+        self.harvest = harvest
+        self.searchinfo = searchinfo
+        self.selected_branch = branch
+        self.listing = {}
+        # Zustand des Laufs, der diese Suche abarbeitet (siehe crawl())
+        self.journal = None
+        self.incremental = None
         if self.cache:
             return
         self.matching_item_re = re.compile(r"^(\d+?)\s+?Treffer$")
+        import requests  # nur online benötigt, daher erst hier
+
         self.session = requests.Session()
+        if adapter is None and workers > 1:
+            # Ein Verbindungspool pro Worker, sonst verwirft urllib3 überzählige Verbindungen
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        if adapter is not None:
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
         # Die Standard HTTP-Header welche wir immer mitschicken wollen
         self.session.headers.update(
             {
@@ -241,12 +1705,45 @@ class SBASearch(object):
             }
         )
         log.debug("User-Agent: %s", self.session.headers["User-Agent"])
-        self.initial_rsp = self.session.get(url)
-        self.initial_soup = BeautifulSoup(self.initial_rsp.text, "html.parser")
+        self.url = url
+        self.load_search_page(rediscover=refresh_form)
+        if branch is not None and branch not in dict(self.form_schema["branches"]):
+            raise SBALogicError(f"Die Schulbibliothek {branch!r} gibt es nicht, zur Auswahl stehen: {', '.join(dict(self.form_schema['branches']))}")
+
+    def load_search_page(self, rediscover: bool = False):
+        """\
+        Ruft die Suchseite ab (für Cookies und die aktuellen Werte der versteckten Formularfelder).
+
+        Das Formular selbst wird nur dann per BeautifulSoup untersucht (siehe discover_form), wenn kein gespeichertes
+        Formularschema vorliegt, sich die Struktur des Formulars seither geändert hat oder rediscover gesetzt ist.
+        """
+        self.initial_rsp = self.session.get(self.url)
         log.debug("%d Byte(s) mit HTTP-Code: %d", len(self.initial_rsp.text), self.initial_rsp.status_code)
         if self.initial_rsp.status_code not in range(100, 400):
             log.critical("%d Byte(s) mit HTTP-Code: %d", len(self.initial_rsp.text), self.initial_rsp.status_code)
-            raise SBARequestError(f"HTTP-Status[GET]: {self.initial_rsp.status_code} (URL: {url})")
+            raise SBARequestError(f"HTTP-Status[GET]: {self.initial_rsp.status_code} (URL: {self.url})")
+        action_url = urlparse(self.initial_rsp.url)
+        self.searchaction_url = f"{action_url.scheme}://{action_url.netloc}{self.__searchuri_default_value}"
+        log.debug("Ermittelte URL für Suchanfragen: %s", self.searchaction_url)
+        schema_hash = self.get_form_schema_hash(self.initial_rsp.text)
+        if not rediscover and (schema := self.load_form_schema(schema_hash)) is not None:
+            hidden_values = self.get_hidden_values(self.initial_rsp.text, schema["hidden_fields"])
+            if hidden_values is not None:
+                log.info("Nutze gespeichertes Formularschema (%s)", self.get_form_schema_path())
+                self.form_schema, self.hidden_values, self.form_schema_cached = schema, hidden_values, True
+                return
+            log.info("Nicht alle versteckten Formularfelder des gespeicherten Formularschemas gefunden.")
+        self.discover_form(schema_hash)
+        self.form_schema_cached = False
+        self.save_form_schema()
+
+    def discover_form(self, schema_hash: str):
+        """\
+        Untersucht das Suchformular, überprüft dabei unsere Annahmen und ermittelt das Formularschema (self.form_schema).
+        """
+        from bs4 import BeautifulSoup
+
+        self.initial_soup = BeautifulSoup(self.initial_rsp.text, "html.parser")
         forms = self.initial_soup.find_all("form")
         # Wir sollten nur ein <form /> vorfinden
         assert len(forms) == 1, f"Es wurde nur ein Suchformular auf der Suchseite erwartet (sehe {len(forms)=})"
@@ -255,9 +1752,6 @@ class SBASearch(object):
         self.searchenctype = self.searchform.get("enctype", None)
         assert self.searchmethod in {"post"}, f"Es wird erwartet, daß das Formular per POST übertragen werden soll (habe {self.searchmethod=})."
         assert self.searchenctype in {"multipart/form-data"}, f"Habe bestimmte Kodierung für POST erwartet ({self.searchenctype=})."
-        action_url = urlparse(self.initial_rsp.url)
-        self.searchaction_url = f"{action_url.scheme}://{action_url.netloc}{self.__searchuri_default_value}"
-        log.debug("Ermittelte URL für Suchanfragen: %s", self.searchaction_url)
         # Formularfelder
         self.searchbtn = self.find_searchform_singleton("input", {"type": "submit", "id": lambda x: x and x.endswith("_BtnSearch")})
         self.mediagroup_combobox = self.find_searchform_singleton("select", {"id": lambda x: x and x.endswith("_DdlMediaGroupValue")})
@@ -277,60 +1771,143 @@ class SBASearch(object):
         assert len(self.branch_selected) == 1, "Es wurde erwartet daß exakt eine Schulbibliothek vorausgewählt ist"
         self.branch_selected = self.branch_selected[0]
         log.debug("Schulbibliothek vorausgewählt: %s", self.branch_selected.get("value", "<keine>"))
+        branches = [(option.get("value"), option.get_text().strip()) for option in self.branch.find_all("option") if option.get("value")]
+        assert branches, "Es wurde mindestens eine Schulbibliothek zur Auswahl erwartet"
+        # Feldnamen (und deren gemeinsames Präfix) für die Suchanfrage
+        mediagroup_name = self.mediagroup_combobox.get("name")
+        branch_name = self.branch.get("name")
+        mediatype_name = self.mediatypes[0].get("name")
+        assert mediagroup_name, "Name des Feldes für die Mediengruppe konnte nicht ermittelt werden"
+        assert branch_name, "Name des Feldes für die Zweigstelle (Schulbibliothek) konnte nicht ermittelt werden"
+        assert mediatype_name, "Name des Feldes für die Medienart konnte nicht ermittelt werden"
+        assert "$" in mediagroup_name and "$" in branch_name and "$" in mediatype_name, "'$' wurde in allen Feldnamen erwartet!"
+        idx = mediagroup_name.rindex("$")
+        prefix = mediagroup_name[: idx + 1]
+        assert all(
+            x.startswith(prefix) for x in {mediagroup_name, branch_name, mediatype_name}
+        ), f"Alle Feldnamen müssen mit dem gleichen Präfix beginnen. Habe Präfix '{prefix}' ermittelt, aber folgende Namen bekommen: {mediagroup_name=!r}, {branch_name=!r}, {mediatype_name=!r}"
+        self.hidden_values = SBASearch.get_namevalue_dict(self.hidden_fields)
+        self.form_schema = {
+            "version": self.__form_schema_version,
+            "url": self.url,
+            "hash": schema_hash,
+            "prefix": prefix,
+            "mediagroup_name": mediagroup_name,
+            "mediagroup_value": self.mediagroup_combobox.get("value", self.__book_default_value),
+            "branch_name": branch_name,
+            "branch_value": self.branch_selected.get("value", self.__branch_default_value),
+            "branches": branches,
+            "mediatype_name": mediatype_name,
+            "hidden_fields": sorted(self.hidden_values),
+        }
+
+    # Attribute der Formularelemente, die zur Struktur des Formulars zählen (siehe get_form_schema_hash)
+    __form_control_re = re.compile(r"<(form|input|select|textarea|option)\b([^>]*)>", re.IGNORECASE)
+    __form_attribute_re = re.compile(r"""([\w:-]+)\s*=\s*(?:"([^"]*)"|'([^']*)')""")
+
+    @staticmethod
+    def get_tag_attributes(attributes: str) -> dict:
+        return {name.lower(): html.unescape(dquoted or squoted) for name, dquoted, squoted in SBASearch.__form_attribute_re.findall(attributes)}
+
+    @staticmethod
+    def get_form_schema_hash(content: str) -> str:
+        """\
+        Hash über die Struktur des Suchformulars, ermittelt per regulärem Ausdruck statt über eine vollständig geparste Suppe.
+
+        Berücksichtigt werden Art, Name, Typ und (außer bei versteckten Feldern, deren Werte sich ständig ändern) Wert aller
+        Formularelemente sowie die Werte aller Optionen und welche davon vorausgewählt sind (bspw. neue Schulbibliotheken).
+        """
+        controls = []
+        for tag, attributes in SBASearch.__form_control_re.findall(content):
+            tag = tag.lower()
+            attributes = SBASearch.get_tag_attributes(attributes)
+            if tag == "form":
+                controls.append((tag, attributes.get("method", ""), attributes.get("enctype", "")))
+            elif tag == "option":
+                controls.append((tag, attributes.get("value", ""), "selected" in attributes))
+            elif attributes.get("type", "").lower() == "hidden":
+                controls.append((tag, attributes.get("name", ""), "hidden"))
+            else:
+                controls.append((tag, attributes.get("name", ""), attributes.get("type", ""), attributes.get("value", "")))
+        return sha256(json.dumps(controls, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def get_hidden_values(content: str, names: list) -> Optional[dict]:
+        """\
+        Liest die Werte der versteckten Formularfelder names per regulärem Ausdruck aus; None, falls eines davon fehlt.
+        """
+        values = {}
+        for match in HIDDEN_INPUT_RE.finditer(content):
+            attributes = SBASearch.get_tag_attributes(match.group(0)[len("<input") :])
+            if attributes.get("name") in names:
+                values[attributes["name"]] = attributes.get("value", "")
+        return values if set(values) == set(names) else None
+
+    @staticmethod
+    def get_form_schema_path() -> Path:
+        return Path(__file__).resolve().parent / "cache" / "formularschema.json"
+
+    def load_form_schema(self, schema_hash: str) -> Optional[dict]:
+        """\
+        Lädt das gespeicherte Formularschema, sofern es zur URL und zum aktuellen Hash der Formularstruktur paßt.
+        """
+        try:
+            with open(self.get_form_schema_path(), "r") as schema_file:
+                schema = json.load(schema_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if schema.get("version") != self.__form_schema_version or schema.get("url") != self.url:
+            return None
+        if schema.get("hash") != schema_hash:
+            log.info("Die Struktur des Suchformulars hat sich geändert, es wird neu ermittelt.")
+            return None
+        return schema
+
+    def save_form_schema(self):
+        schema_path = self.get_form_schema_path()
+        schema_path.parent.mkdir(parents=True, exist_ok=True)
+        # Die Datei teilen sich Schulbibliotheken (Threads) und Shards (Prozesse); Leser sollen nie eine halb geschriebene sehen
+        tmp_path = schema_path.with_name(f"{schema_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as schema_file:
+            json.dump(self.form_schema, schema_file, ensure_ascii=False, indent=4)
+        os.replace(tmp_path, schema_path)
+        log.debug("Formularschema gespeichert: %s", schema_path)
 
-    @cache
     def prepare_post_data(self):
-        form_data = {}
-        if not hasattr(self, "cached_form_data"):
-            cached_form_data = {}
-            mediagroup_name = self.mediagroup_combobox.get("name")
-            mediagroup_value = self.mediagroup_combobox.get("value", self.__book_default_value)
-            branch_name = self.branch.get("name")
-            branch_value = self.branch_selected.get("value", self.__branch_default_value)
-            mediatype_name = self.mediatypes[0].get("name")
-            assert mediagroup_name, "Name des Feldes für die Mediengruppe konnte nicht ermittelt werden"
-            assert branch_name, "Name des Feldes für die Zweigstelle (Schulbibliothek) konnte nicht ermittelt werden"
-            assert mediatype_name, "Name des Feldes für die Medienart konnte nicht ermittelt werden"
-            assert "$" in mediagroup_name and "$" in branch_name and "$" in mediatype_name, "'$' wurde in allen Feldnamen erwartet!"
-            idx = mediagroup_name.rindex("$")
-            prefix = mediagroup_name[: idx + 1]
-            assert all(
-                x.startswith(prefix) for x in {mediagroup_name, branch_name, mediatype_name}
-            ), f"Alle Feldnamen müssen mit dem gleichen Präfix beginnen. Habe Präfix '{prefix}' ermittelt, aber folgende Namen bekommen: {mediagroup_name=!r}, {branch_name=!r}, {mediatype_name=!r}"
-            cached_form_data[mediagroup_name] = mediagroup_value
-            cached_form_data[branch_name] = branch_value
-            cached_form_data[mediatype_name] = self.__mediatype_default_value  # nur physische Medien!
-            cached_form_data.update(
-                {
-                    # Diese beiden scheinen ansonsten manchmal zu fehlen
-                    "__EVENTTARGET": "",
-                    "__EVENTARGUMENT": "",
-                    # Die gehen eigentlich normalerweise in die URI
-                    "pagesize": "50",
-                    "top": "y",
-                    # Wir schummeln hier ein wenig und hartkodieren einige der Formularfelder und deren Werte
-                    f"{prefix}FirstSearchField": "Free",
-                    f"{prefix}FirstSearchValue": "",
-                    f"{prefix}SecondSearchOperator": "And",
-                    f"{prefix}SecondSearchField": "Title",
-                    f"{prefix}SecondSearchValue": "",
-                    f"{prefix}ThirdSearchOperator": "And",
-                    f"{prefix}ThirdSearchField": "Author",
-                    f"{prefix}ThirdSearchValue": "",
-                    f"{prefix}TxtNewAquisitionsPastDays": "",
-                    f"{prefix}TbxProductionYearFrom": "",
-                    f"{prefix}TbxProductionYearTo": "",
-                    f"{prefix}BtnSearch": "Suchen",
-                }
-            )
-            self.cached_form_data = cached_form_data
-        form_data.update(self.cached_form_data)
+        schema = self.form_schema
+        prefix = schema["prefix"]
+        form_data = {
+            schema["mediagroup_name"]: schema["mediagroup_value"],
+            schema["branch_name"]: self.selected_branch or schema["branch_value"],
+            schema["mediatype_name"]: self.__mediatype_default_value,  # nur physische Medien!
+            # Diese beiden scheinen ansonsten manchmal zu fehlen
+            "__EVENTTARGET": "",
+            "__EVENTARGUMENT": "",
+            # Die gehen eigentlich normalerweise in die URI
+            "pagesize": "50",
+            "top": "y",
+            # Wir schummeln hier ein wenig und hartkodieren einige der Formularfelder und deren Werte
+            f"{prefix}FirstSearchField": "Free",
+            f"{prefix}FirstSearchValue": "",
+            f"{prefix}SecondSearchOperator": "And",
+            f"{prefix}SecondSearchField": "Title",
+            f"{prefix}SecondSearchValue": "",
+            f"{prefix}ThirdSearchOperator": "And",
+            f"{prefix}ThirdSearchField": "Author",
+            f"{prefix}ThirdSearchValue": "",
+            f"{prefix}TxtNewAquisitionsPastDays": "",
+            f"{prefix}TbxProductionYearFrom": "",
+            f"{prefix}TbxProductionYearTo": "",
+            f"{prefix}BtnSearch": "Suchen",
+        }
         log.debug("Formularfelder (ohne versteckte): %r", form_data)
         # Zuletzt noch alle versteckten Formularfelder hinzufügen
-        form_data.update(SBASearch.get_namevalue_dict(self.hidden_fields))
+        form_data.update(self.hidden_values)
         return form_data
 
     def cached_items(self):
+        if self.pagestore is not None:
+            return self.stored_items()
         cache_basepath = self.get_cache_basepath()
         cached_searchhashes = [d for d in cache_basepath.iterdir() if d.is_dir() and d.stem.startswith("OCLC_")]
         if not cached_searchhashes:
@@ -339,8 +1916,8 @@ class SBASearch(object):
         cache_file_list = sorted([cache_file for cache_file in newest_cache_dir.glob("detail_????.html")])
         assert cache_file_list, f"Es wurde kein gültiges bereits zwischengespeichertes Verzeichnis gefunden (habe versucht: {newest_cache_dir})."
         item_total = len(cache_file_list)
-        if not str(newest_cache_dir).endswith(f".{item_total}"):
-            raise SBALogicError(f"Das neueste Cache-Verzeichnis ({newest_cache_dir}) endet nicht, wie erwartet, auf '.{item_total}'.")
+        if not str(newest_cache_dir).endswith(f".{item_total:04}"):
+            raise SBALogicError(f"Das neueste Cache-Verzeichnis ({newest_cache_dir}) endet nicht, wie erwartet, auf '.{item_total:04}'.")
         if cache_file_list[0].name != "detail_0000.html":
             raise SBALogicError(f"Der erste Eintrag der Cache-Liste hätte 'detail_0000.html' sein sollen ({len(cache_file_list)=}).")
         if cache_file_list[-1].name != f"detail_{item_total-1:04}.html":
@@ -352,11 +1929,29 @@ class SBASearch(object):
 
         return get_detail_url()
 
+    def stored_items(self):
+        newest = self.pagestore.newest_complete_search()
+        if newest is None:
+            raise SBALogicError(f"In der Cache-Datenbank ({self.pagestore.path}) wurde keine vollständig zwischengespeicherte Suche gefunden.")
+        log.info("Nutze Suche %s mit %d Treffern aus %s", newest.searchhash, newest.item_total, self.pagestore.path)
+
+        def get_detail_url():
+            for idx in range(newest.item_total):
+                yield idx, newest._replace(idx=idx), newest.item_total
+
+        return get_detail_url()
+
     def items(self):
         if self.cache:  # sidestep the online stuff
             return self.cached_items()
-        form_data = self.prepare_post_data()
-        self.response = self.session.post(self.searchaction_url, data=form_data)
+        if self.searchinfo is not None and (info := self.load_searchinfo()) is not None:
+            log.info("Nutze die Suche aus %s mit %d Treffern: %s", self.searchinfo, info["item_total"], info["template_url"])
+            return self.get_detail_urls(info["template_url"], info["item_total"])
+        self.response = self.session.post(self.searchaction_url, data=self.prepare_post_data())
+        if self.form_schema_cached and (self.response.status_code >= 300 or "searchhash=OCLC_" not in self.response.url):
+            log.warning("Die Suchanfrage mit dem gespeicherten Formularschema schlug fehl (Status: %d), ermittle das Formular neu.", self.response.status_code)
+            self.load_search_page(rediscover=True)
+            self.response = self.session.post(self.searchaction_url, data=self.prepare_post_data())
         if self.response.status_code >= 300:  # Umleitungen aus dem 300er-Bereich sollten hier nicht auftauchen, weil die Requests normalerweise befolgt
             log.critical(f"POST gab Status {self.response.status_code} zurück (URL: {self.searchaction_url}).")
             raise SBARequestError(f"HTTP-Status[POST]: {self.response.status_code} (URL: {self.searchaction_url})")
@@ -365,6 +1960,8 @@ class SBASearch(object):
             "searchhash=OCLC_" in self.response.url
         ), "Es wurde erwartet einen 'searchhash' der mit 'OCLC_' beginnt in der URL für die Ergebnisliste vorzufinden."
         log.info("URL des Suchergebnisses: %s (Status: %d); Bytes: %d", self.response.url, self.response.status_code, len(self.response.text))
+        from bs4 import BeautifulSoup
+
         soup = BeautifulSoup(self.response.text, "html.parser")
         item_total = soup.find_all("span", {"id": lambda x: x and x.endswith("_TotalItemsLabel")})
         assert len(item_total) == 2, f"Es wurde erwartet, daß die Gesamttrefferzahl exakt zweimal (oben + unten) in der Ergebnisliste auftaucht: {item_total!r}"
@@ -384,12 +1981,138 @@ class SBASearch(object):
         assert "searchhash=OCLC_" in result_url, "Es wurde erwartet einen 'searchhash' der mit 'OCLC_' beginnt im ersten Ergebnislink vorzufinden."
         template_url = result_url.replace("&detail=0&", "&detail={item_index}&")
         log.info("Die ermittelte _generische_ URL für Ergebnisdetails lautet: %s", template_url)
+        if self.harvest:
+            self.listing = self.harvest_listing(soup, item_total)
+        if self.searchinfo is not None:
+            template_url, item_total = self.save_searchinfo(template_url, item_total)
+        return self.get_detail_urls(template_url, item_total)
 
-        def get_detail_url():
-            for idx in range(0, item_total):
-                yield idx, template_url.format(item_index=idx), item_total
+    @staticmethod
+    def get_detail_urls(template_url: str, item_total: int):
+        for idx in range(0, item_total):
+            yield idx, template_url.format(item_index=idx), item_total
 
-        return get_detail_url()
+    def load_searchinfo(self) -> Optional[dict]:
+        """\
+        Lädt die gemeinsame Suche (searchhash, Trefferzahl, URL-Vorlage der Detailseiten) anderer Läufe.
+
+        Gehört sie zu einer anderen Einstiegs-URL oder ist sie älter als SEARCHINFO_MAX_AGE, wird sie ignoriert.
+        """
+        try:
+            with open(self.searchinfo, "r") as info_file:
+                info = json.load(info_file)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return None
+        if info.get("url") != self.url:
+            log.warning("Die Suche in %s gehört zu einer anderen URL (%s) und wird ignoriert.", self.searchinfo, info.get("url"))
+            return None
+        if time.time() - info.get("created", 0) > SEARCHINFO_MAX_AGE:
+            log.warning("Die Suche in %s ist älter als %d Stunden und wird durch eine neue ersetzt.", self.searchinfo, SEARCHINFO_MAX_AGE // 3600)
+            return None
+        return info
+
+    def save_searchinfo(self, template_url: str, item_total: int) -> tuple:
+        """\
+        Legt die eigene Suche für andere Läufe ab und liefert die URL-Vorlage und Trefferzahl, die zu nutzen sind.
+
+        Die Datei wird nur angelegt, wenn es sie (noch) nicht gibt. Ist ein anderer Lauf zuvorgekommen, gilt dessen Suche,
+        damit alle Shards dieselben Indizes desselben searchhash abfragen.
+        """
+        info = {"url": self.url, "searchhash": parse_qs(urlparse(template_url).query)["searchhash"][0], "item_total": item_total}
+        info.update(template_url=template_url, created=time.time())
+        self.searchinfo.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.searchinfo.with_name(f"{self.searchinfo.name}.{os.getpid()}.tmp")
+        with open(tmp_path, "w") as info_file:
+            json.dump(info, info_file, ensure_ascii=False, indent=4)
+        try:
+            if self.searchinfo.exists() and self.load_searchinfo() is None:
+                self.searchinfo.unlink()  # veraltet oder für eine andere URL
+            os.link(tmp_path, self.searchinfo)  # scheitert, falls die Datei zwischenzeitlich angelegt wurde
+            log.info("Suche %s mit %d Treffern in %s abgelegt", info["searchhash"], item_total, self.searchinfo)
+        except FileExistsError:
+            if (other := self.load_searchinfo()) is None:
+                raise SBALogicError(f"Die Suche in {self.searchinfo} konnte weder gelesen noch ersetzt werden.")
+            log.warning("Ein anderer Lauf hat die Suche %s bereits abgelegt, nutze diese statt der eigenen.", other["searchhash"])
+            template_url, item_total = other["template_url"], other["item_total"]
+        finally:
+            tmp_path.unlink()
+        return template_url, item_total
+
+    def get_listing_url(self, page: int) -> str:
+        """\
+        Liefert die URL zu einer Seite (1-basiert) der Trefferliste der aktuellen Suche, mit 50 Treffern pro Seite.
+        """
+        parsed_url = urlparse(self.response.url)
+        query = [(k, v) for k, v in parse_qsl(parsed_url.query, keep_blank_values=True) if k not in {"page", "pagesize", "detail"}]
+        query += [("pagesize", self.__listing_pagesize), ("page", str(page))]
+        return parsed_url._replace(query=urlencode(query)).geturl()
+
+    @staticmethod
+    def get_listing_entries(soup) -> list:
+        """\
+        Liest die Einträge einer Seite der Trefferliste aus.
+
+        Ausgehend vom Titel-Link jedes Eintrags wird das umschließende Element gesucht, welches nur diesen einen Eintrag enthält.
+        Alle Elemente darin mit einer ID und einem (nicht rein numerischen) Text landen in den Feldern des Eintrags, bspw.
+        Verfasser oder Verfügbarkeit. Der Fingerabdruck wird über Titel, Felder und den gesamten Text des Eintrags gebildet,
+        damit auch Angaben ohne eigene ID oder rein numerische (Anzahl der Exemplare, Rückgabedatum) darin eingehen.
+        """
+        is_item_link = {"id": lambda x: x and x.endswith("_LbtnShortDescriptionValue")}
+        entries = []
+        for link in soup.find_all("a", is_item_link):
+            match = re.search(r"[?&]detail=(\d+)", link.get("href", ""))
+            if match is None:
+                continue
+            container = link
+            for parent in link.parents:
+                if len(parent.find_all("a", is_item_link)) > 1:
+                    break
+                container = parent
+            title = link.get_text().strip()
+            fields = {}
+            for elem in container.find_all(attrs={"id": True}):
+                text = " ".join(elem.get_text().split())
+                if elem is not link and text and not text.isdigit():
+                    fields[elem.get("id").rsplit("_", 1)[-1]] = text
+            text = " ".join(container.get_text(" ").split())
+            fingerprint = sha256(json.dumps([title, fields, text], ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+            entries.append(SBAListingEntry(int(match.group(1), 10), title, fields, text, fingerprint))
+        return entries
+
+    def harvest_listing(self, first_page_soup, item_total: int) -> dict:
+        """\
+        Liest alle Seiten der Trefferliste aus und liefert ein Dictionary Index -> SBAListingEntry.
+
+        Die erste Seite liegt mit der Antwort auf die Suchanfrage bereits vor; enthält sie weniger Einträge als erwartet,
+        wird sie mit der gewünschten Seitengröße erneut abgefragt.
+        """
+        from bs4 import BeautifulSoup
+
+        pagesize = int(self.__listing_pagesize, 10)
+        pages = (item_total + pagesize - 1) // pagesize
+        listing = {}
+        for page in range(1, pages + 1):
+            soup = first_page_soup
+            if page > 1 or len(self.get_listing_entries(soup)) < min(pagesize, item_total):
+                url = self.get_listing_url(page)
+                if self.ratelimiter is not None:
+                    self.ratelimiter.wait()
+                else:
+                    time.sleep(random.choice(range(250, 1000)) / 1000)
+                with timed("netzwerk"):
+                    response = self.session.get(url)
+                count("http_anfragen")
+                count("bytes_abgerufen", len(response.content))
+                if response.status_code >= 300:
+                    log.critical(f"GET gab Status {response.status_code} zurück (URL: {url}).")
+                    raise SBARequestError(f"HTTP-Status[GET]: {response.status_code} (URL: {url})")
+                soup = BeautifulSoup(response.text, "html.parser")
+            for entry in self.get_listing_entries(soup):
+                listing[entry.idx] = entry
+            log.debug("Trefferliste Seite %d/%d: bisher %d Einträge", page, pages, len(listing))
+        if len(listing) != item_total:
+            log.warning("Die Trefferliste lieferte %d statt %d Einträge; für fehlende Einträge werden die Detailseiten abgefragt.", len(listing), item_total)
+        return listing
 
     @staticmethod
     def get_values(bsresultset):
@@ -405,7 +2128,6 @@ class SBASearch(object):
         """
         return {elem.get("name"): elem.get("value", "") for elem in bsresultset}
 
-    @cache
     def get_mediatypes(self):
         mediatypes = self.searchform.find_all(
             "input", attrs={"id": lambda x: x and "_RbMediaTypeList_" in x, "name": lambda x: x and x.endswith("RbMediaTypeList")}
@@ -435,6 +2157,8 @@ class SBASearch(object):
     @cache
     def get_cache_basepath(self) -> Path:
         retval = Path(__file__).resolve().parent / "cache"
+        if self.selected_branch is not None:
+            retval = retval / f"zweigstelle.{get_branch_slug(self.selected_branch)}"
         return retval
 
     @cache
@@ -443,45 +2167,154 @@ class SBASearch(object):
         log.info("Cache-Pfad = %s", retval)
         return retval
 
-    @cache
-    def get_cache_filepath(self, idx: int, item_total: int, url: Union[str, Path]) -> Path:
+    @staticmethod
+    def get_searchhash(url: str) -> str:
+        """\
+        Ermittelt den Wert des 'searchhash'-Parameters einer Detail-URL.
+        """
         parsed_url = urlparse(url)
         assert parsed_url.query, f"Die Query in der URL hätte nicht leer sein dürfen! ({url=})"
         assert "&" in parsed_url.query, f"Es wurde ein '&' in der Query ({url=}) erwartet"
         assert "searchhash=" in parsed_url.query, f"Es wurde ein 'searchhash=' in der URL ({url=}) erwartet"
-        searchhash = [x for x in url.split("?")[1].split("&") if x.startswith("searchhash=")][0].split("=")[1]
+        return [x for x in url.split("?")[1].split("&") if x.startswith("searchhash=")][0].split("=")[1]
+
+    def get_cache_key(self, idx: int, item_total: int, url: Union[str, SBACacheKey]) -> SBACacheKey:
+        return url if isinstance(url, SBACacheKey) else SBACacheKey(self.get_searchhash(url), item_total, idx)
+
+    @cache
+    def get_cache_filepath(self, idx: int, item_total: int, url: Union[str, Path]) -> Path:
+        searchhash = self.get_searchhash(url)
         cache_path = self.get_cache_path(searchhash, item_total)
         cache_path.mkdir(parents=True, exist_ok=True)
         return cache_path / f"detail_{idx:04d}.html"
 
-    def get_cached_content(self, idx: int, item_total: int, url: Union[str, Path]):
+    def get_cached_content(self, idx: int, item_total: int, url: Union[str, Path, SBACacheKey]):
         force_cache = not isinstance(url, str)
-        if not force_cache:
-            cache_filepath = self.get_cache_filepath(idx, item_total, url)
+        if self.pagestore is not None:
+            cache_filepath = self.get_cache_key(idx, item_total, url)
+            with timed("cache_lesen"):
+                content = self.pagestore.get(*cache_filepath)
+            if content is not None:
+                log.debug("Cache-Treffer: #%d -> %s", idx, url)
+                count("cache_treffer")
+                return content
         else:
-            cache_filepath = url
-        with suppress(FileNotFoundError):
-            with open(cache_filepath, "r") as cache_file:
+            cache_filepath = url if force_cache else self.get_cache_filepath(idx, item_total, url)
+            with suppress(FileNotFoundError):
+                with timed("cache_lesen"), open(cache_filepath, "r") as cache_file:
+                    content = cache_file.read()
                 log.debug("Cache-Treffer: #%d -> %s", idx, url)
-                return cache_file.read()
+                count("cache_treffer")
+                return content
         if force_cache:
             log.critical(f"Es war nicht möglich den Cache für die angefragte Datei auszulesen ({idx=}; {cache_filepath=}).")
             raise SBALogicError(f"Es war nicht möglich den Cache für die angefragte Datei auszulesen ({idx=}; {cache_filepath=}).")
+        if self.ratelimiter is not None:
+            self.ratelimiter.wait()
         # Wir machen das _vor_ dem nächsten with-Bereich, damit wir möglichst keine leeren Dateien erzeugen
-        details = self.session.get(url)
+        with timed("netzwerk"):
+            details = self.session.get(url)
+        count("cache_fehlschlag")
+        count("http_anfragen")
+        count("bytes_abgerufen", len(details.content))
         if details.status_code >= 300:  # Umleitungen aus dem 300er-Bereich sollten hier nicht auftauchen, weil die Requests normalerweise befolgt
             log.critical(f"GET gab Status {details.status_code} zurück (URL: {url}).")
             raise SBARequestError(f"HTTP-Status[GET]: {details.status_code} (URL: {url})")
-        with open(cache_filepath, "w") as cache_file:
-            cache_file.write(details.text)
+        with timed("cache_schreiben"):
+            if self.pagestore is not None:
+                self.pagestore.put(*cache_filepath, details.text)
+            else:
+                with open(cache_filepath, "w") as cache_file:
+                    cache_file.write(details.text)
+        if self.ratelimiter is not None:
+            log.debug("Cache-Fehlschlag: #%d -> %s", idx, url)
+            return details.text
         delay = random.choice(range(250, 1000))  # in Millisekunden
         log.debug("Cache-Fehlschlag: #%d -> %s (Verzögerung %d ms)", idx, url, delay)
         time.sleep(delay / 1000)
         return details.text
 
-    def get_details_soup(self, idx: int, item_total: int, url: str):
+    def discard_cached_content(self, idx: int, item_total: int, url: Union[str, Path]):
+        """\
+        Verwirft den Cache-Eintrag zu einem online abgefragten Treffer (bspw. weil die Seite eine Fehlermeldung enthielt).
+
+        Im reinen Cache-Betrieb (url ist dann ein Pfad) wird nichts gelöscht, da es dort keine Möglichkeit gäbe den Eintrag neu zu laden.
+        """
+        if not isinstance(url, str):
+            return
+        if self.pagestore is not None:
+            self.pagestore.discard(*self.get_cache_key(idx, item_total, url))
+            log.debug("Cache-Eintrag #%d gelöscht!", idx)
+            return
+        cache_filepath = self.get_cache_filepath(idx, item_total, url)
+        with suppress(FileNotFoundError):
+            cache_filepath.unlink()
+            log.debug("Cachedatei %s gelöscht!", cache_filepath)
+
+    def get_details_soup(self, idx: int, item_total: int, url: str, builder: str = "html.parser"):
+        from bs4 import BeautifulSoup
+
         details = self.get_cached_content(idx, item_total, url)
-        return BeautifulSoup(details, "html.parser")
+        return BeautifulSoup(details, builder)
+
+
+@dataclass(frozen=True, slots=True)
+class SBACopy(object):
+    """\
+    Ein Exemplar aus der Exemplartabelle einer Detailseite. Die Spalte "Aktion" gibt es nur in Sonderfällen.
+    """
+
+    schulbibliothek: str
+    standorte: str
+    status: str
+    rueckgabedatum: str
+    aktion: Optional[str] = None
+
+    # Spaltenüberschrift -> Feld
+    _columns: ClassVar[dict] = {
+        "Aktion": "aktion",
+        "Schulbibliothek": "schulbibliothek",
+        "Standorte": "standorte",
+        "Status": "status",
+        "Rückgabedatum": "rueckgabedatum",
+    }
+
+    @classmethod
+    def from_columns(cls, columns: dict) -> "SBACopy":
+        return cls(**{cls._columns[name]: value for name, value in columns.items()})
+
+    def to_json_ready_dict(self) -> dict:
+        return {name: getattr(self, field) for name, field in self._columns.items() if field != "aktion" or self.aktion is not None}
+
+
+@dataclass(frozen=True, slots=True)
+class SBABookRecord(object):
+    """\
+    Unveränderlicher Datensatz zu einem Buch, wie ihn SBABookDetails beim Parsen befüllt.
+
+    Hält keine Verweise auf die Suppe, so daß nach dem Parsen nur noch dieser (kompakte) Datensatz übrig bleibt.
+    """
+
+    authors: tuple
+    title: str
+    excerpt: Optional[str]
+    series: Optional[tuple]
+    responsibility: tuple
+    publish_year: Optional[str]
+    publisher: tuple
+    systematics: Optional[tuple]
+    subject_type: tuple
+    isbn: tuple
+    description: Optional[str]
+    match_entry: Optional[int]
+    match_index: Optional[int]
+    match_total: Optional[int]
+    copies: tuple  # von SBACopy
+
+    def to_json_ready_dict(self) -> dict:
+        json_ready_dict = {field.name: getattr(self, field.name) for field in fields(self)}
+        json_ready_dict["copies"] = [copy.to_json_ready_dict() for copy in self.copies]
+        return json_ready_dict
 
 
 class SBABookDetails(object):
@@ -500,14 +2333,10 @@ class SBABookDetails(object):
         "match_entry": lambda x: isinstance(x, int) or x is None,
         "match_index": lambda x: isinstance(x, int) or x is None,
         "match_total": lambda x: isinstance(x, int) or x is None,
-        "copies": lambda x: isinstance(x, list) and len(x) > 0 and all(isinstance(e, dict) for e in x),  # 1..∞?
+        "copies": lambda x: isinstance(x, tuple) and len(x) > 0 and all(isinstance(e, SBACopy) for e in x),  # 1..∞?
     }
-
-    def __init__(self, soup):
-        self.soup = soup
-        self._attributes = {}
-        self._known_attributes = SBABookDetails._known_attributes
-        self.valid_copy_cols = {
+    _valid_copy_cols = frozenset(
+        {
             (
                 "Schulbibliothek",
                 "Standorte",
@@ -523,32 +2352,41 @@ class SBABookDetails(object):
                 "Rückgabedatum",
             ),
         }
+    )
+
+    def __init__(self, soup):
+        """\
+        Parst die Suppe einer Detailseite; das Ergebnis steht danach in self.record (SBABookRecord).
+        """
+        self.soup = soup
+        self._soupstr = None
+        self._prefix = None
+        self.record = None
         self.__parse()
 
-    @cache
     def __getattr__(self, name):
         if name not in self._known_attributes:
             raise AttributeError(f"'{self.__class__.__name__}' object has no known attribute '{name}'")
-        if name in self._attributes:
-            return self._attributes[name]
+        if self.record is not None:
+            return getattr(self.record, name)
         raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
 
-    @cache
     def __dir__(self):
         return list(self._known_attributes.keys()) + super().__dir__()
 
     @property
-    @cache
     def prefix(self):
+        if self._prefix is not None:
+            return self._prefix
         pfx_sentinel = "_MainView_UcDetailView_CatalogueDetailView"
         unavailable_sentinel = {
             "Es ist ein Fehler aufgetreten.",
             "Versuchen Sie es zu einem späteren Zeitpunkt",
             "Der Schulbibliothekskatalog ist momentan nicht erreichbar",
         }
-        anyelem = self.soup.find_all("div", {"id": lambda x: x and x.endswith(pfx_sentinel)})
+        anyelem = self.find_all("div", {"id": lambda x: x and x.endswith(pfx_sentinel)})
         if len(anyelem) != 1:
-            soupstr = str(self.soup)
+            soupstr = self.get_soupstr()
             log.debug("Sentinel existiert in Soup? -> %s (Länge: %d)", pfx_sentinel in soupstr, len(soupstr))
             log.critical("Es wird erwartet daß nur ein Element mit der gesuchten ID existiert (anyelem=%r)", anyelem)
             if any(x in soupstr for x in unavailable_sentinel):
@@ -558,35 +2396,49 @@ class SBABookDetails(object):
         anyid = anyelem.get("id")
         idre = re.compile(r"^(dnn_ctr\d+?)_")
         if match := idre.match(anyid):
-            return match.group(1)
+            self._prefix = match.group(1)
+            return self._prefix
         log.critical("Die ID (%r) stimmte nicht mit der Regex (%r) überein", anyid, idre.pattern)
         raise SBALogicError(f"Die ID ({anyid!r}) stimmte nicht mit der Regex ({idre.pattern!r}) überein")
 
+    # Statische Korrekturen für den ermittelten Titel (fließen in den Fingerabdruck des Parsers ein)
+    _titel_austausch = {
+        # "Paul Klee,": "Paul Klee, Bilder träumen",
+    }
+
     @staticmethod
     def __titel_korrekturen(titel):
         """\
         Statische Korrekturen für den ermittelten Titel (um Hickser in den SBA-Daten abzufedern)
         """
-        austausch = {
-            # "Paul Klee,": "Paul Klee, Bilder träumen",
-        }
+        austausch = SBABookDetails._titel_austausch
         if titel in austausch:
             return austausch[titel]
         return titel
 
+    def __lap(self, phase: str):
+        """\
+        Erfaßt (sofern metrics gesetzt ist) die Zeit seit dem vorigen Aufruf als Abschnitt "parse.<phase>".
+        """
+        if metrics is None:
+            return
+        now = time.perf_counter()
+        metrics.add(f"parse.{phase}", now - self.__lap_start)
+        self.__lap_start = now
+
     def __parse(self):
-        soup = self.soup
-        soupstr = str(soup)
+        self.__lap_start = time.perf_counter()
         prefix = self.prefix
+        self.__lap("prefix")
+        attributes = {}
         # Vorbelegungen für Werte die mglw. nicht vorhanden sind
-        self._attributes["match_entry"] = None
-        self._attributes["match_index"] = None
-        self._attributes["match_total"] = None
-        self._attributes["number_copies"] = 0
-        self._attributes["excerpt"] = None
-        self._attributes["series"] = None
+        attributes["match_entry"] = None
+        attributes["match_index"] = None
+        attributes["match_total"] = None
+        attributes["excerpt"] = None
+        attributes["series"] = None
         # Autoren/Beteiligte (0..∞)
-        self._attributes["authors"] = tuple(
+        attributes["authors"] = tuple(
             x.get_text()
             for x in self.find_all(
                 attrs={
@@ -596,21 +2448,24 @@ class SBABookDetails(object):
             )
             if x.get_text().strip()
         )
+        self.__lap("autoren")
         # Buchtitel (1)
         title = [x.get("content").strip() for x in self.find_all(xmltype="meta", attrs={"property": "og:title", "content": lambda x: x})]
         if len(title) != 1:
             raise ValidationError(f"Nur ein Buchtitel wurde erwartet (habe {len(title)=})!")
         if not title:
             raise ValidationError(f"Buchtitel darf nicht leer sein ({title=!r})!")
-        self._attributes["title"] = self.__titel_korrekturen(title[0])
+        attributes["title"] = self.__titel_korrekturen(title[0])
+        self.__lap("titel")
         # Exzerpt/Inhaltsangabe (kann leer sein!)
         excerpt = tuple(x.get("content") for x in self.find_all(attrs={"property": "og:description", "content": lambda x: x}))
         if excerpt:
             if len(excerpt) != 1:
                 raise ValidationError(f"Nur eine Inhaltsangabe wurde erwartet (habe {len(excerpt)=})!")
-            self._attributes["excerpt"] = excerpt[0]
+            attributes["excerpt"] = excerpt[0]
+        self.__lap("exzerpt")
         # Von/Mit (0..∞?)
-        self._attributes["responsibility"] = tuple(
+        attributes["responsibility"] = tuple(
             x.get_text()
             for x in self.find_all(
                 attrs={
@@ -619,6 +2474,7 @@ class SBABookDetails(object):
             )
             if x.get_text().strip()
         )
+        self.__lap("verantwortlichkeit")
         # Erscheinungsjahr (1)
         publish_year = tuple(
             x.get_text()
@@ -630,11 +2486,12 @@ class SBABookDetails(object):
             if x.get_text().strip()
         )
         if len(publish_year) != 1:
-            if "nicht verfügbar" not in soupstr:
+            if "nicht verfügbar" not in self.get_soupstr():
                 raise ValidationError(f"Es wurde ein Erscheinungsjahr erwartet (habe {len(publish_year)=}).")
-        self._attributes["publish_year"] = publish_year[0] if publish_year else None
+        attributes["publish_year"] = publish_year[0] if publish_year else None
+        self.__lap("erscheinungsjahr")
         # Ort, Verlag/Herausgeber/Hersteller (0..1)
-        self._attributes["publisher"] = tuple(
+        attributes["publisher"] = tuple(
             x.get_text()
             for x in self.find_all(
                 attrs={
@@ -643,6 +2500,7 @@ class SBABookDetails(object):
             )
             if x.get_text().strip()
         )
+        self.__lap("verlag")
         # Systematiken (1..∞?)
         systematics = tuple(
             x.get_text().strip()
@@ -655,11 +2513,12 @@ class SBABookDetails(object):
             if x.get_text().strip()
         )
         if not systematics:
-            if "nicht verfügbar" not in soupstr:
+            if "nicht verfügbar" not in self.get_soupstr():
                 raise ValidationError(f"Es wurde mindestens eine Systematik erwartet (habe {len(systematics)=}).")
-        self._attributes["systematics"] = systematics if systematics else None
+        attributes["systematics"] = systematics if systematics else None
+        self.__lap("systematik")
         # Interessenkreis (0..∞?)
-        self._attributes["subject_type"] = tuple(
+        attributes["subject_type"] = tuple(
             x.get_text().strip()
             for x in self.find_all(
                 attrs={
@@ -669,6 +2528,7 @@ class SBABookDetails(object):
             )
             if x.get_text().strip()
         )
+        self.__lap("interessenkreis")
         # ISBN (0..1)
         isbn = tuple(
             x.get_text().strip()
@@ -680,6 +2540,8 @@ class SBABookDetails(object):
             if x.get_text().strip()
         )
         if isbn:
+            from isbnlib import is_isbn13, is_isbn10, to_isbn13, canonical  # editions, meta, goom
+
             isbn = isbn[0]
             if is_isbn10(isbn):
                 isbn = (canonical(to_isbn13(isbn)),)
@@ -687,7 +2549,8 @@ class SBABookDetails(object):
                 isbn = (canonical(to_isbn13(isbn)),)
             else:
                 isbn = (f"!{isbn}",)
-        self._attributes["isbn"] = isbn
+        attributes["isbn"] = isbn
+        self.__lap("isbn")
         # Beschreibung (1)
         description = tuple(
             x.get_text().strip()
@@ -699,9 +2562,10 @@ class SBABookDetails(object):
             if x.get_text().strip()
         )
         if len(description) != 1:
-            if "nicht verfügbar" not in soupstr:
+            if "nicht verfügbar" not in self.get_soupstr():
                 raise ValidationError(f"Es wurde eine Beschreibung erwartet (habe {len(description)=}).")
-        self._attributes["description"] = description[0] if description else None
+        attributes["description"] = description[0] if description else None
+        self.__lap("beschreibung")
         # Reihe (0..∞?)
         series = tuple(
             x.get_text().strip()
@@ -713,7 +2577,8 @@ class SBABookDetails(object):
             if x.get_text().strip()
         )
         if series:
-            self._attributes["series"] = series
+            attributes["series"] = series
+        self.__lap("reihe")
         # Treffernummer ermitteln
         match_number = [
             x.get_text().strip()
@@ -730,9 +2595,10 @@ class SBABookDetails(object):
                 match_number = int(m.group(1), 10)
                 match_total = int(m.group(2), 10)
                 match_index = match_number - 1
-                self._attributes["match_entry"] = match_number
-                self._attributes["match_index"] = match_index
-                self._attributes["match_total"] = match_total
+                attributes["match_entry"] = match_number
+                attributes["match_index"] = match_index
+                attributes["match_total"] = match_total
+        self.__lap("treffernummer")
         # Tabelle mit Exemplaren in der jeweiligen Bibliothek
         copies_table = self.find_all("table", {"id": f"{prefix}_MainView_UcDetailView_ucCatalogueCopyView_grdViewMediumCopies"})
         if len(copies_table) != 1:
@@ -741,32 +2607,56 @@ class SBABookDetails(object):
             copies_table = copies_table[0]
             # Anmerkung: Status ist hier bspw. "In Einarbeitung" für neue Bücherlieferungen seitens der SBA
             copy_cols = tuple([x.get("abbr", None) or x.get_text() for x in copies_table.find_all("th", attrs={"scope": "col"})])
-            if copy_cols not in self.valid_copy_cols:
+            if copy_cols not in self._valid_copy_cols:
                 raise ValidationError(
                     f"Die Spalten stimmen nicht mit unseren Annahmen überein. Zeit das Skript anzupassen ({title=}, {match_index=}, {set(copy_cols)=!r})."
                 )
-            for elem in soup.select(f"table#{prefix}_MainView_UcDetailView_ucCatalogueCopyView_grdViewMediumCopies tr:has(td) td span.oclc-module-label"):
-                elem.decompose()
-            copies_rows = soup.select(f"table#{prefix}_MainView_UcDetailView_ucCatalogueCopyView_grdViewMediumCopies tr:has(td)")
             copies = []
-            for row in copies_rows:
-                col_contents = [x.get_text().replace("\n", " ").replace("\r", " ").strip().replace("  ", " ") for x in row.select("tr td")]
+            for row in self.get_copies_rows(copies_table):
+                col_contents = [x.get_text().replace("\n", " ").replace("\r", " ").strip().replace("  ", " ") for x in self.get_row_cells(row)]
                 if len(col_contents) != len(copy_cols):
                     raise ValidationError(
                         f"Es wurde erwartet daß die Anzahl Spalten im Tabellenkopf mit der Anzahl Spalten in den Zeilen übereinstimmt ({len(col_contents)=} != {len(copy_cols)=})."
                     )
-                copies.append(dict(zip(copy_cols, col_contents)))
-            self._attributes["copies"] = copies
+                copies.append(SBACopy.from_columns(dict(zip(copy_cols, col_contents))))
+            attributes["copies"] = tuple(copies)
+        self.__lap("exemplare")
         # Validiere alle bisher belegten Attribute
         for name, validator in self._known_attributes.items():
             assert callable(validator), f"Brauche einen aufrufbaren Validator, habe {validator!r}."
-            if name not in self._attributes:
-                raise ValidationError(f"Nach dem Parsen hätten alle Attribute belegt sein sollen, '{name}' ist es nicht; {self._attributes=!r}.")
-            if not validator(self._attributes[name]):
-                raise ValidationError(f"Die Validierung für das Attribut '{name}' schlug fehl: {self._attributes[name]=!r}")
+            if name not in attributes:
+                raise ValidationError(f"Nach dem Parsen hätten alle Attribute belegt sein sollen, '{name}' ist es nicht; {attributes=!r}.")
+            if not validator(attributes[name]):
+                raise ValidationError(f"Die Validierung für das Attribut '{name}' schlug fehl: {attributes[name]=!r}")
+        self.record = SBABookRecord(**attributes)
+        self.__lap("validierung")
         self.soup = None
+        self._soupstr = None
         delattr(self, "soup")
 
+    def get_soupstr(self) -> str:
+        """\
+        Liefert die Suppe als Zeichenkette; wird nur bei Bedarf (und dann nur einmal) erzeugt.
+        """
+        if self._soupstr is None:
+            self._soupstr = str(self.soup)
+        return self._soupstr
+
+    def get_copies_rows(self, copies_table):
+        """\
+        Entfernt die Beschriftungen aus den Zellen der Exemplartabelle und liefert deren Zeilen mit Inhalt (td).
+        """
+        table_selector = f"table#{self.prefix}_MainView_UcDetailView_ucCatalogueCopyView_grdViewMediumCopies"
+        for elem in self.soup.select(f"{table_selector} tr:has(td) td span.oclc-module-label"):
+            elem.decompose()
+        return self.soup.select(f"{table_selector} tr:has(td)")
+
+    def get_row_cells(self, row):
+        """\
+        Liefert die Zellen (td) einer Zeile der Exemplartabelle.
+        """
+        return row.select("tr td")
+
     def find_all(self, xmltype: Optional[Union[str, List[str]]] = None, attrs: dict = {}, soup=None):
         """\
         Sucht innerhalb der hübschen Suppe Elemente.
@@ -788,74 +2678,603 @@ class SBABookDetails(object):
         """
         return self.find_singleton(None, attrs={"id": f"{self.prefix}{id_suffix}"}, soup=soup)
 
-    @cache
     def to_json_ready_dict(self):
-        json_ready_dict = {}
-        for key in self._known_attributes.keys():
-            if not hasattr(self, key):
-                raise ValidationError(f"Erwartetes Attribut '{key}' existiert nicht.")
-            json_ready_dict[key] = getattr(self, key)
-        return json_ready_dict
+        if self.record is None:
+            raise ValidationError("Es liegt kein geparster Datensatz vor.")
+        return self.record.to_json_ready_dict()
+
+
+class SBABookDetailsIndexed(SBABookDetails):
+    """\
+    Schnellere Variante von SBABookDetails mit identischem Ergebnis.
+
+    Statt für jedes Attribut das gesamte Dokument abzusuchen, werden alle Elemente mit 'id'- oder 'property'-Attribut in einem
+    einzigen Durchlauf indiziert. Die Suchen in find_all() gehen dann nur noch über diesen Index. Die CSS-Selektoren für die
+    Exemplartabelle werden durch direkte Suchen innerhalb der Tabelle ersetzt.
+    """
+
+    _indexed_attributes = ("id", "property")
+
+    def __init__(self, soup):
+        self._index = {name: {} for name in self._indexed_attributes}
+        for position, elem in enumerate(soup.find_all(True)):
+            for name, index in self._index.items():
+                value = elem.get(name)
+                if value is not None:
+                    index.setdefault(value, []).append((position, elem))
+        super().__init__(soup)
+        self._index = None
+
+    @staticmethod
+    def attr_matches(value, matcher) -> bool:
+        """\
+        Bildet den Vergleich von Attributwerten nach, wie ihn BeautifulSoup für find_all(attrs=...) vornimmt.
+        """
+        if callable(matcher) and not isinstance(matcher, re.Pattern):
+            return bool(matcher(value))
+        if value is None:
+            return False
+        if isinstance(matcher, re.Pattern):
+            return matcher.search(value) is not None
+        return value == matcher
+
+    def find_all(self, xmltype: Optional[Union[str, List[str]]] = None, attrs: dict = {}, soup=None):
+        """\
+        Sucht über den Index; für alles was nicht über den Index abgedeckt ist, wird auf die hübsche Suppe zurückgegriffen.
+        """
+        indexed = [name for name in self._indexed_attributes if name in attrs]
+        if soup is not None or not indexed or not isinstance(xmltype, (str, type(None))):
+            return super().find_all(xmltype, attrs, soup)
+        name, matcher = indexed[0], attrs[indexed[0]]
+        index = self._index[name]
+        if isinstance(matcher, str):
+            candidates = index.get(matcher, [])
+        elif self.attr_matches(None, matcher):
+            return super().find_all(xmltype, attrs, soup)  # würde auch Elemente ohne dieses Attribut finden
+        else:
+            candidates = sorted((x for value, elems in index.items() if self.attr_matches(value, matcher) for x in elems), key=lambda x: x[0])
+        return [
+            elem
+            for _, elem in candidates
+            if (xmltype is None or elem.name == xmltype) and all(self.attr_matches(elem.get(k), v) for k, v in attrs.items() if k != name)
+        ]
+
+    def get_copies_rows(self, copies_table):
+        for elem in copies_table.find_all("span", attrs={"class": "oclc-module-label"}):
+            cell = elem.find_parent("td")
+            if cell is not None and cell.find_parent("tr") is not None:
+                elem.decompose()
+        return [row for row in copies_table.find_all("tr") if row.find("td") is not None]
+
+    def get_row_cells(self, row):
+        return row.find_all("td")
+
+
+# Muß erhöht werden, sobald eine Änderung an SBABookDetails zu anderen Datensätzen führt (macht --record-cache ungültig)
+PARSER_VERSION = 1
+
+
+def get_parser_fingerprint() -> str:
+    """\
+    Fingerabdruck aus Parserversion und Titelkorrekturen; Datensätze im SBARecordCache gelten nur für den gleichen Fingerabdruck.
+    """
+    korrekturen = json.dumps(SBABookDetails._titel_austausch, ensure_ascii=False, sort_keys=True)
+    return sha256(f"{PARSER_VERSION}|{korrekturen}".encode("utf-8")).hexdigest()[:16]
+
+
+PARSER_BACKENDS = {
+    # Name: (Klasse, Tree-Builder für BeautifulSoup)
+    "klassisch": (SBABookDetails, "html.parser"),
+    "index": (SBABookDetailsIndexed, "html.parser"),
+    "lxml": (SBABookDetailsIndexed, "lxml"),
+}
+
+
+def ordered_map(func, jobs, workers: int, executor_class=ThreadPoolExecutor, retry: Optional[SBARetryScheduler] = None, **executor_kwargs):
+    """\
+    Wendet func auf alle Argumenttupel aus jobs an, mit bis zu workers gleichzeitigen Aufrufen.
+
+    Die Ergebnisse werden stets in der Reihenfolge der Eingabe geliefert. Es sind nie mehr als 2*workers Aufträge unterwegs,
+    damit der Speicherbedarf auch bei großen Trefferzahlen begrenzt bleibt. Ausnahmen werden an der Stelle weitergereicht,
+    an der das Ergebnis des betroffenen Auftrags an der Reihe gewesen wäre.
+
+    Mit retry wird func zusätzlich das Argument attempt übergeben und ein Auftrag, der mit einer vorübergehenden Ausnahme
+    scheitert, nach einer Wartezeit erneut gestartet (siehe retried_map).
+    """
+    if retry is not None:
+        yield from retried_map(func, jobs, workers, executor_class, retry, **executor_kwargs)
+        return
+    if workers <= 1:
+        for args in jobs:
+            yield func(*args)
+        return
+    pending = deque()
+    with executor_class(max_workers=workers, **executor_kwargs) as executor:
+        try:
+            for args in jobs:
+                pending.append(executor.submit(func, *args))
+                if len(pending) >= 2 * workers:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+def retried_map(func, jobs, workers: int, executor_class, retry: SBARetryScheduler, buffered: int = 500, **executor_kwargs):
+    """\
+    Variante von ordered_map mit Wiederholungsversuchen.
+
+    Ein gescheiterter Auftrag wird mit der von retry bestimmten Wartezeit zurückgestellt, während die nachfolgenden
+    weiterlaufen. Deren Ergebnisse werden (bis zu buffered Stück) zurückgehalten, bis der zurückgestellte Auftrag
+    abgeschlossen ist, damit die Reihenfolge erhalten bleibt.
+    """
+    workers = max(workers, 1)
+    jobs = iter(jobs)
+    exhausted = False
+    slots = deque()  # [args, attempt, future, done] je Auftrag, in Reihenfolge der Eingabe
+    waiting = []  # Heap aus (fällig, laufende Nummer, slot) der zurückgestellten Aufträge
+    running = {}  # future -> slot
+    sequence = 0
+    with executor_class(max_workers=workers, **executor_kwargs) as executor:
+        try:
+            while True:
+                while not exhausted and len(running) < 2 * workers and len(slots) < 2 * workers + buffered:
+                    args = next(jobs, None)
+                    if args is None:
+                        exhausted = True
+                        break
+                    slot = [args, 0, executor.submit(func, *args, attempt=0), False]
+                    slots.append(slot)
+                    running[slot[2]] = slot
+                while slots and slots[0][3]:
+                    yield slots.popleft()[2].result()
+                if not slots and exhausted:
+                    return
+                now = time.monotonic()
+                while waiting and waiting[0][0] <= now:
+                    slot = heapq.heappop(waiting)[2]
+                    log.debug("Erneuter Versuch (%d) für %r", slot[1] + 1, slot[0][1:])
+                    slot[2] = executor.submit(func, *slot[0], attempt=slot[1])
+                    running[slot[2]] = slot
+                timeout = max(waiting[0][0] - now, 0) if waiting else None
+                if not running:  # wait() kehrt bei leerer Menge sofort zurück
+                    time.sleep(timeout or 0)
+                    continue
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    slot = running.pop(future)
+                    exc = future.exception()
+                    if exc is not None and retry.is_retryable(exc) and not retry.is_final(slot[1]):
+                        delay = retry.backoff(slot[1])
+                        log.debug("Verzögerung % 2.3f Sekunden bis zu nächstem Versuch für %r", delay, slot[0][1:])
+                        slot[1] += 1
+                        sequence += 1
+                        heapq.heappush(waiting, (time.monotonic() + delay, sequence, slot))
+                    else:
+                        slot[3] = True
+        finally:
+            for future in running:
+                future.cancel()
+
+
+def load_book_details(search: SBASearch, idx: int, detail_url: Union[str, Path, SBACacheKey], item_total: int, attempt: int = 0):
+    """\
+    Lädt die Details zu einem Treffer (online oder aus dem Cache) und parst diese.
+
+    Gibt das Tupel (idx, detail_url, item_total, json_ready_dict) zurück, wobei json_ready_dict None ist, falls der Treffer
+    wegen --keep-going übersprungen wurde. Vorübergehende Fehler (SBAUnavailable, ConnectionError) werden weitergereicht,
+    solange laut retryscheduler noch ein weiterer Versuch (attempt) folgt.
+    """
+    journal, incremental = search.journal, search.incremental
+    try:
+        try:
+            if incremental is not None and (details := incremental.lookup_listing(idx, item_total)) is not None:
+                log.debug("Unverändert laut Trefferliste: #%d -> %s", idx, get_record_key(details))
+                count("unveraendert")
+                return idx, detail_url, item_total, details
+            book_class, builder = PARSER_BACKENDS[parser_backend]
+            if retryscheduler is not None:
+                retryscheduler.wait()
+            with timed("abrufen"):
+                content = search.get_cached_content(idx, item_total, detail_url)
+            if journal is not None:
+                journal.record(idx, "fetched")
+            record_hash = get_record_hash(content) if incremental is not None or recordcache is not None else None
+            if incremental is not None and (details := incremental.lookup(idx, record_hash)) is not None:
+                log.debug("Unverändert: #%d -> %s", idx, get_record_key(details))
+                count("unveraendert")
+                details = dict(details, match_index=idx, match_entry=idx + 1, match_total=item_total)
+            elif recordcache is not None and (details := recordcache.get(record_hash)) is not None:
+                log.debug("Datensatz-Cache-Treffer: #%d -> %s", idx, record_hash)
+                count("datensatz_cache_treffer")
+                details = dict(details, match_index=idx, match_entry=idx + 1, match_total=item_total)
+            else:
+                from bs4 import BeautifulSoup
+
+                with timed("parsen"):
+                    details = book_class(BeautifulSoup(content, builder)).to_json_ready_dict()
+                if recordcache is not None:
+                    recordcache.put(record_hash, details)
+            if retryscheduler is not None:
+                retryscheduler.record(None)
+            return idx, detail_url, item_total, details
+        except transient_errors() as exc:
+            count("voruebergehende_fehler")
+            search.discard_cached_content(idx, item_total, detail_url)
+            if retryscheduler is not None:
+                retryscheduler.record(exc)
+            if retryscheduler is not None and not retryscheduler.is_final(attempt):
+                log.debug("Versuch %d fehlgeschlagen (%s): %s", attempt + 1, exc.__class__.__name__, detail_url)
+                raise
+            if retryscheduler is not None:
+                retryscheduler.give_up()
+            if journal is not None:
+                journal.record(idx, "failed", reason=f"{exc.__class__.__name__}: {exc}")
+            if keepgoing:
+                log.error("Es trat ein Fehler beim Laden von %s auf. Fahre dennoch fort.", detail_url)
+                return idx, detail_url, item_total, None
+            raise
+    except (ValidationError, SBARequestError, SBALogicError) as exc:
+        count("validierungsfehler" if isinstance(exc, ValidationError) else "fehler")
+        log.critical("Angefragte URL: %s (Index: %d von %d)", detail_url, idx, item_total)
+        if journal is not None:
+            journal.record(idx, "failed", reason=f"{exc.__class__.__name__}: {exc}")
+        search.discard_cached_content(idx, item_total, detail_url)
+        raise
+
+
+def init_cache_worker(
+    verbosity: int, backend: str, keep_going: Optional[bool], cachedb: Optional[Path], recordcachedb: Optional[Path], branch: Optional[str] = None
+):
+    """\
+    Initialisiert einen Prozeß des Prozeßpools, der im reinen Cache-Betrieb (--cache) die Detailseiten parst.
+
+    Jeder Prozeß bekommt seine eigene SBASearch-Instanz (und ggf. Verbindungen zum Seiten- und Datensatz-Cache).
+    """
+    global log, parser_backend, keepgoing, recordcache, retryscheduler, worker_search
+    log = logging.getLogger(str(Path(__file__).resolve()))
+    if not log.handlers:  # nur bei "spawn" nötig, bei "fork" sind die Handler bereits vorhanden
+        log = setup_logging(verbosity)
+    parser_backend, keepgoing, retryscheduler = backend, keep_going, None
+    recordcache = SBARecordCache(recordcachedb) if recordcachedb is not None else None
+    worker_search = SBASearch(None, True, pagestore=SBAPageStore(cachedb) if cachedb is not None else None, branch=branch)
+
+
+def load_cached_book_details(idx: int, cache_key: Union[Path, SBACacheKey], item_total: int):
+    """\
+    Gegenstück zu load_book_details() für Prozesse, die per init_cache_worker() initialisiert wurden.
+    """
+    return load_book_details(worker_search, idx, cache_key, item_total)
+
+
+def migrate_cache(pagestore: SBAPageStore, cache_basepath: Path):
+    """\
+    Übernimmt alle Cache-Verzeichnisse in den Seiten-Cache. Die Verzeichnisse selbst bleiben unangetastet.
+    """
+    cache_dirs = sorted((d for d in cache_basepath.iterdir() if d.is_dir() and d.name.startswith("OCLC_")), key=lambda d: d.stat().st_mtime)
+    if not cache_dirs:
+        log.warning("Im Cache-Pfad (%s) wurde kein Verzeichnis mit dem Namen eines Suchhashes gefunden.", cache_basepath)
+    for cache_dir in cache_dirs:
+        migrated = pagestore.import_directory(cache_dir)
+        log.info("%d Seite(n) aus %s übernommen", migrated, cache_dir)
+    with pagestore.lock:
+        pages, entries = pagestore.db.execute("SELECT (SELECT COUNT(*) FROM pages), (SELECT COUNT(*) FROM entries)").fetchone()
+    log.warning("Seiten-Cache %s: %d Einträge in %d Suche(n), %d eindeutige Seite(n)", pagestore.path, entries, len(cache_dirs), pages)
 
 
 def main(**kwargs):
     """\
     Die Hauptfunktion
     """
-    global log, cache, dlfrom, keepgoing
+    global log, cache, dlfrom, keepgoing, parser_backend, recordcache, retryscheduler, metrics
     log = setup_logging(kwargs.get("verbose", 0))
+    metricsjson, metricsprom = kwargs.get("metricsjson", None), kwargs.get("metricsprom", None)
+    if metrics is None and (metricsjson is not None or metricsprom is not None):
+        metrics = SBAMetrics()
     cache = kwargs.get("cache", None)
+    parser_backend = kwargs.get("parser", "index")
     keepgoing = kwargs.get("keepgoing", None)
     dlfrom = kwargs.get("dlfrom", 0)
-    outfile = kwargs.get("outfile", Path(__file__).resolve().parent / "output.json")
+    workers = max(1, kwargs.get("workers", 1) or 1)
+    rate = kwargs.get("rate", None)
+    output_format = kwargs.get("format", "json")
+    fsync_every = kwargs.get("fsyncevery", 50)
+    outfile = kwargs.get("outfile", None)
+    if convertjsonl := kwargs.get("convertjsonl", None):
+        outfile = outfile or Path(__file__).resolve().parent / "output.json"
+        book_details = sorted(iter_jsonl(convertjsonl), key=lambda x: (x["match_index"] is None, x["match_index"] or 0))
+        write_output(outfile, book_details, "json")
+        log.info("%d Datensätze aus %s nach %s übernommen", len(book_details), convertjsonl, outfile)
+        export_output(book_details, kwargs)
+        return 0
+    if diff := kwargs.get("diff", None):
+        previous, current = diff
+        delta = kwargs.get("delta", None)
+        write_delta(get_delta_path(current) if delta in (None, True) else delta, read_output(previous), read_output(current), previous)
+        return 0
+    if exportfrom := kwargs.get("exportfrom", None):
+        if kwargs.get("exportsqlite", None) is None and kwargs.get("exportparquet", None) is None:
+            log.error("--export-from braucht --export-sqlite und/oder --export-parquet.")
+            return 1
+        export_output(read_output(exportfrom), kwargs)
+        return 0
+    if merge := kwargs.get("merge", None):
+        outfile = outfile or Path(__file__).resolve().parent / f"output.{output_format}"
+        book_details = merge_shards(merge)
+        write_output(outfile, book_details, output_format, fsync_every)
+        log.warning("%d Datensätze aus %d Shard(s) nach %s zusammengeführt", len(book_details), len(merge), outfile)
+        export_output(book_details, kwargs)
+        return 0
+    shard = kwargs.get("shard", None)
+    if shard is not None:
+        outfile = outfile or Path(__file__).resolve().parent / f"output.shard{shard[0]}of{shard[1]}.{output_format}"
+    outfile = outfile or Path(__file__).resolve().parent / f"output.{output_format}"
     url = kwargs.get("url", None)
     assert url is not None, "Die Einstiegs-URL kann nicht 'nichts' (None) sein."
-    search = SBASearch(url, cache)
+    cachedb = kwargs.get("cachedb", None)
+    if kwargs.get("migratecache", None):
+        cachedb = cachedb or Path(__file__).resolve().parent / "cache" / "seiten.sqlite3"
+        pagestore = SBAPageStore(cachedb)
+        migrate_cache(pagestore, Path(__file__).resolve().parent / "cache")
+        pagestore.close()
+        if (recordcachedb := kwargs.get("recordcache", None)) is not None:
+            recordcache = SBARecordCache(recordcachedb)
+            recordcache.purge()
+            recordcache.close()
+        return 0
+    incremental = kwargs.get("incremental", None)
+    if incremental and shard is not None:
+        log.warning("--incremental braucht die vollständige vorherige Ausgabe und wird zusammen mit --shard ignoriert.")
+        incremental = False
+    harvest = kwargs.get("harvest", None)
+    if harvest and (cache or not incremental):
+        log.warning("--harvest wird nur zusammen mit --incremental und ohne --cache genutzt und daher ignoriert.")
+        harvest = False
+    if kwargs.get("resume", None) and cache:
+        log.warning("--resume wird im reinen Cache-Betrieb ignoriert.")
+    if shard is not None and kwargs.get("searchinfo", None) is None and not cache:
+        log.warning("--shard ohne --search-info: jeder Shard stellt seine eigene Suchanfrage, die Indizes passen nur bei unverändertem Katalog zusammen.")
+    options = dict(kwargs, harvest=harvest, incremental=incremental)
+    recordcachedb = kwargs.get("recordcache", None)
+    recordcache = SBARecordCache(recordcachedb) if recordcachedb is not None else None
+    branches = kwargs.get("branches", None)
+    ratelimiter = None
+    if rate is not None or workers > 1 or branches:
+        ratelimiter = RateLimiter(rate or DEFAULT_RATE)
+        log.info("Parallele Abfrage mit %d Worker(n), maximal %.2f Anfragen pro Sekunde", workers, rate or DEFAULT_RATE)
+    # Im reinen Cache-Betrieb ändert Warten nichts an einer zwischengespeicherten Fehlerseite, daher keine Wiederholungen
+    retryscheduler = None if cache else SBARetryScheduler()
+    if kwargs.get("listbranches", None):
+        for value, label in list_branches(url, ratelimiter, options):
+            print(f"{value}\t{label}")
+        return 0
+    failed = False
+    try:
+        if branches:
+            crawl_branches(outfile, branches, ratelimiter, options)
+        else:
+            crawl(outfile, None, ratelimiter, None, options)
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        if retryscheduler is not None:
+            retryscheduler.summary()
+        if metrics is not None and (metricsjson is not None or metricsprom is not None):
+            metrics.write(metricsjson, metricsprom, "sbasuche", success=not failed)
+
+
+def list_branches(url: str, ratelimiter: Optional[RateLimiter], options: dict) -> list:
+    """\
+    Liefert die Schulbibliotheken (Wert, Bezeichnung) aus der Auswahl im Suchformular.
+
+    Im reinen Cache-Betrieb stammen sie aus dem gespeicherten Formularschema, ansonsten wird die Suchseite abgerufen.
+    """
+    if not cache:
+        search = SBASearch(url, False, ratelimiter=ratelimiter, refresh_form=options.get("refresh_form", None) or False)
+        return [tuple(branch) for branch in search.form_schema["branches"]]
+    with suppress(FileNotFoundError, json.JSONDecodeError):
+        with open(SBASearch.get_form_schema_path(), "r") as schema_file:
+            return [tuple(branch) for branch in json.load(schema_file).get("branches", [])]
+    raise SBALogicError(f"Ohne gespeichertes Formularschema ({SBASearch.get_form_schema_path()}) sind im reinen Cache-Betrieb keine Schulbibliotheken bekannt.")
+
+
+def crawl_branches(outfile: Path, branches: str, ratelimiter: Optional[RateLimiter], options: dict):
+    """\
+    Arbeitet mehrere Schulbibliotheken ab (branches ist eine kommagetrennte Liste ihrer Werte oder 'alle').
+
+    Online laufen die Schulbibliotheken gleichzeitig, mit einem gemeinsamen Verbindungspool und gemeinsamer Ratenbegrenzung,
+    so daß alle zusammen ungefähr so lange brauchen wie die langsamste (sofern die Rate es hergibt). Im reinen Cache-Betrieb
+    ist das Parsen der Flaschenhals, dort werden sie nacheinander abgearbeitet. Ohne -r ist die gemeinsame Rate die Vorgabe
+    (DEFAULT_RATE) mal der Anzahl der Schulbibliotheken, mit -r ist sie eine feste Obergrenze für alle zusammen. Schlägt eine Schulbibliothek fehl, werden
+    die übrigen dennoch zu Ende gebracht und danach die erste Ausnahme weitergereicht.
+    """
+    url = options.get("url")
+    selected = [branch.strip() for branch in branches.split(",") if branch.strip()]
+    if selected == ["alle"]:
+        selected = [value for value, _ in list_branches(url, ratelimiter, options)]
+    log.info("Schulbibliotheken (%d): %s", len(selected), ", ".join(selected))
+    workers = max(1, options.get("workers", 1) or 1)
+    if options.get("rate", None) is None and not cache:
+        # Ohne -r gilt die Vorgabe je Schulbibliothek, sonst bräuchten alle zusammen so lange wie nacheinander
+        ratelimiter = RateLimiter(DEFAULT_RATE * len(selected))
+        log.info("Gemeinsame Ratenbegrenzung: maximal %.2f Anfragen pro Sekunde", DEFAULT_RATE * len(selected))
+    failures = {}
+    if cache:
+        for branch in selected:
+            try:
+                crawl(outfile, branch, ratelimiter, None, options)
+            except Exception as exc:
+                failures[branch] = exc
+    else:
+        import requests
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=workers * len(selected))
+        with ThreadPoolExecutor(max_workers=len(selected), thread_name_prefix="zweigstelle") as executor:
+            futures = {executor.submit(crawl, outfile, branch, ratelimiter, adapter, options): branch for branch in selected}
+            for future in futures:
+                if (exc := future.exception()) is not None:
+                    failures[futures[future]] = exc
+    for branch, exc in failures.items():
+        log.error("Schulbibliothek %s fehlgeschlagen: %s: %s", branch, exc.__class__.__name__, exc)
+    if failures:
+        raise next(iter(failures.values()))
+
+
+def crawl(outfile: Path, branch: Optional[str], ratelimiter: Optional[RateLimiter], adapter, options: dict):
+    """\
+    Fragt alle Treffer einer Suche ab (online oder aus dem Cache) und schreibt die Ausgabe.
+
+    Ist branch gesetzt, wird diese Schulbibliothek durchsucht und deren Name in die Namen von Ausgabe, Journal, Seiten-Cache
+    und --search-info eingefügt (siehe get_branch_path), damit sich mehrere gleichzeitig laufende Suchen nicht in die Quere kommen.
+    """
+    workers = max(1, options.get("workers", 1) or 1)
+    output_format = options.get("format", "json")
+    fsync_every = options.get("fsyncevery", 50)
+    shard = options.get("shard", None)
+    outfile = get_branch_path(outfile, branch)
+    cachedb = options.get("cachedb", None)
+    if cachedb is not None:
+        cachedb = get_branch_path(cachedb, branch)
+    pagestore = SBAPageStore(cachedb) if cachedb is not None else None
+    incremental = None
+    if options.get("incremental", None):
+        max_age = options.get("harvest_max_age", 7.0)
+        incremental = SBAIncrementalState(outfile, None if max_age is None else max_age * 86400)
+    # Das Journal braucht es nur für Abfragen der Online-Quelle, im reinen Cache-Betrieb ist ein Neustart ohnehin günstig
+    resume = options.get("resume", None) and not cache
+    deltafile = options.get("delta", None)
+    if deltafile is not None:
+        deltafile = get_delta_path(outfile) if deltafile is True else get_branch_path(deltafile, branch)
+    # Die vorherige Ausgabe wird vorab gelesen, weil sie im Streaming-Betrieb sofort überschrieben wird
+    previous = None
+    if deltafile is not None and dlfrom == 0:
+        if resume and output_format == "jsonl":
+            log.warning("Beim Fortsetzen mit --format jsonl ist die Ausgabe bereits teilweise überschrieben, --delta wird ignoriert.")
+        elif not outfile.exists():
+            log.warning("Keine vorherige Ausgabe %s, es werden keine Änderungen geschrieben.", outfile)
+        else:
+            previous = read_output(outfile)
+    # Im Streaming-Betrieb wird jeder Datensatz sofort geschrieben statt alle bis zum Ende im Speicher zu halten
+    streaming = output_format == "jsonl" and incremental is None and dlfrom == 0
+    journal = None
+    if not cache:
+        journalfile = options.get("journal", None)
+        journalfile = get_branch_path(journalfile, branch) if journalfile is not None else outfile.with_name(f"{outfile.stem}.journal.jsonl")
+        journal = SBACrawlJournal(journalfile, resume=resume, records=not streaming)
+    harvest = options.get("harvest", None)
+    searchinfo = options.get("searchinfo", None)
+    search = SBASearch(
+        options.get("url"),
+        cache,
+        workers=workers,
+        ratelimiter=ratelimiter,
+        pagestore=pagestore,
+        harvest=harvest,
+        refresh_form=options.get("refresh_form", None) or False,
+        searchinfo=get_branch_path(searchinfo, branch) if searchinfo is not None else None,
+        branch=branch,
+        adapter=adapter,
+    )
+    search.journal, search.incremental = journal, incremental
     missing_idxs = set()
+    skipped_idxs = set()  # mit --keep-going übersprungen, siehe diff_records
     book_details = []
-    try:
-        for idx, detail_url, item_total in search.items():
+    if journal is not None and resume:
+        # Fertig ist nur, wovon der Datensatz auch vorliegt (in der Ausgabe bzw. im Journal), alles andere wird erneut abgefragt
+        if streaming:
+            journal.finished = resume_jsonl_output(outfile, journal.finished)
+        else:
+            records = journal.read_records()
+            journal.finished = set(records)
+            book_details = [records[idx] for idx in sorted(records)]
+
+    # Im reinen Cache-Betrieb ist das Parsen der Flaschenhals, daher wird es dann auf mehrere Prozesse verteilt
+    use_processes = cache and workers > 1 and incremental is None
+
+    def get_jobs():
+        # items() sucht sofort, die Trefferliste liegt danach bereits vor (unabhängig von -f bzw. --shard)
+        items = search.items()
+        if harvest:
+            incremental.set_listing(search.listing)
+        for idx, detail_url, item_total in items:
             if dlfrom > idx:
                 continue
+            if shard is not None and idx % shard[1] != shard[0] - 1:
+                continue
+            if journal is not None:
+                journal.start(item_total)
+                if idx in journal.finished:
+                    continue
+                journal.record(idx, "pending")
             missing_idxs.add(idx)
-            cache_filepath = search.get_cache_filepath(idx, item_total, detail_url)
-            retries = 5
-            try:
-                for attempt in range(retries):
-                    try:
-                        if attempt > 0:
-                            log.debug("Versuch %d: %s", attempt, detail_url)
-                        soup = search.get_details_soup(idx, item_total, detail_url)
-                        book = SBABookDetails(soup)
-                        book_details.append(book.to_json_ready_dict())
-                        missing_idxs.discard(idx)
-                        break
-                    except (SBAUnavailable, ConnectionError):
-                        if attempt + 1 < retries:
-                            delay = random.choice(range(3500, 15000)) / 1000  # in Sekunden
-                            log.debug("Verzögerung % 2.3f Sekunden bis zu nächstem Versuch.", delay)
-                            time.sleep(delay)
-                            with suppress(FileNotFoundError):
-                                cache_filepath.unlink()
-                                log.debug("Cachedatei %s gelöscht!", cache_filepath)
-                            continue
-                        if keepgoing:
-                            log.error("Es trat ein Fehler beim Laden von %s auf. Fahre dennoch fort.", detail_url)
-                            break
-                        raise
-            except (ValidationError, SBARequestError, SBALogicError):
-                log.critical("Angefragte URL: %s (Index: %d von %d)", detail_url, idx, item_total)
-                with suppress(FileNotFoundError):
-                    cache_filepath.unlink()
-                    log.debug("Cachedatei %s gelöscht!", cache_filepath)
-                raise
+            yield (idx, detail_url, item_total) if use_processes else (search, idx, detail_url, item_total)
+
+    if use_processes:
+        # Erst hier, weil concurrent.futures.process multiprocessing nachlädt und den Start spürbar verlangsamt
+        from concurrent.futures import ProcessPoolExecutor
+
+        log.info("Parse Cache-Einträge mit %d Prozessen", workers)
+        results = ordered_map(
+            load_cached_book_details,
+            get_jobs(),
+            workers,
+            ProcessPoolExecutor,
+            initializer=init_cache_worker,
+            initargs=(options.get("verbose", 0), parser_backend, keepgoing, cachedb, options.get("recordcache", None), branch),
+        )
+    else:
+        results = ordered_map(load_book_details, get_jobs(), workers, retry=retryscheduler)
+    writer = None
+    if streaming:
+        # Beim Fortsetzen wird die (oben bereinigte) Ausgabe fortgeschrieben, read_output() sortiert sie wieder nach Index
+        writer = JSONLinesWriter(outfile, fsync_every, append=bool(resume))
+    try:
+        for idx, detail_url, item_total, details in results:
+            if details is None:
+                count("uebersprungen")
+                skipped_idxs.add(idx)
+                continue
+            count("datensaetze")
+            if writer is not None:
+                writer.write(details)
+            else:
+                book_details.append(details)
+            if journal is not None:
+                journal.record(idx, "parsed", details=details)
+            missing_idxs.discard(idx)
         if dlfrom != 0:
             return
-        with open(outfile, "w") as json_file:
-            json.dump(book_details, json_file, allow_nan=False, ensure_ascii=False, sort_keys=True, indent=4)
+        if writer is not None:
+            writer.close()
+            # Im Streaming-Betrieb liegen die Datensätze nicht im Speicher, für Export und Änderungen wird die Ausgabe daher erneut gelesen
+            if previous is None and options.get("exportsqlite", None) is None and options.get("exportparquet", None) is None:
+                return
+            merged = read_output(outfile)
+        else:
+            if resume:
+                book_details.sort(key=lambda x: (x["match_index"] is None, x["match_index"] or 0))
+            merged = book_details
+            if incremental is not None:
+                merged = incremental.merge(book_details, complete=not missing_idxs)
+            write_output(outfile, merged, output_format, fsync_every)
+            if incremental is not None:
+                incremental.save(book_details, merged)
+        export_output(merged, options, branch)
+        if previous is not None:
+            write_delta(deltafile, previous, merged, outfile, skipped_idxs)
+        if branch is not None:
+            log.warning("Schulbibliothek %s: %d Datensätze nach %s", branch, len(merged), outfile)
     except BaseException:
-        log.critical("Fehlende Elemente mit Index: %r", missing_idxs)
+        log.critical("Fehlende Elemente mit Index: %r", sorted(missing_idxs))
         raise
+    finally:
+        if writer is not None:
+            writer.close()
+        if journal is not None:
+            journal.close()
 
 
 if __name__ == "__main__":